@@ -1,5 +1,5 @@
-from db import get_connection
-from datetime import datetime
+from db import read_connection, write_connection, fetch_page, date_range, DEFAULT_PAGE_SIZE
+from datetime import datetime, date
 
 DEFAULT_ANNOUNCEMENTS = {
     "title": "ANNOUNCEMENTS",
@@ -40,105 +40,141 @@ DEFAULT_ANNOUNCEMENTS = {
     ]
 }
 
+MONTHS = ('JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC')
+
+def publication_date(day, month, year):
+    """ISO date for an announcement's day/month/year text, or None if invalid.
+
+    Months may be numbers or English names of any case, e.g. "05", "MAY" or
+    "December". Announcements whose date cannot be parsed are dated by when
+    they were created instead.
+    """
+    try:
+        month = str(month).strip()
+        month_number = int(month) if month.isdigit() else MONTHS.index(month[:3].upper()) + 1
+        return date(int(year), month_number, int(day)).isoformat()
+    except (ValueError, TypeError):
+        return None
+
+ANNOUNCEMENT_COLUMNS = ('id', 'title', 'description', 'day', 'month', 'year', 'is_new', 'status', 'created_at', 'updated_at')
+
+def _announcement_dict(announcement):
+    return {
+        "id": announcement[0],
+        "title": announcement[1],
+        "description": announcement[2],
+        "date": {
+            "day": announcement[3],
+            "month": announcement[4],
+            "year": announcement[5]
+        },
+        "isNew": bool(announcement[6]),
+        "status": announcement[7],
+        "created_at": announcement[8],
+        "updated_at": announcement[9]
+    }
+
 def get_all_announcements():
     """Get all announcements or return defaults if none exist"""
-    conn = get_connection()
-    c = conn.cursor()
+    with read_connection() as conn:
+        c = conn.cursor()
     
-    c.execute("SELECT * FROM announcements WHERE status = 'active' ORDER BY year DESC, month DESC, day DESC")
-    announcements = c.fetchall()
+        c.execute("SELECT * FROM announcements WHERE status = 'active' ORDER BY published_on DESC, id DESC")
+        announcements = c.fetchall()
     
-    if announcements:
-        announcements_list = []
-        for announcement in announcements:
-            announcements_list.append({
-                "id": announcement[0],
-                "title": announcement[1],
-                "description": announcement[2],
-                "date": {
-                    "day": announcement[3],
-                    "month": announcement[4],
-                    "year": announcement[5]
-                },
-                "isNew": bool(announcement[6]),
-                "status": announcement[7],
-                "created_at": announcement[8],
-                "updated_at": announcement[9]
-            })
-    else:
-        # Use default announcements
-        announcements_list = []
-        for i, announcement in enumerate(DEFAULT_ANNOUNCEMENTS["announcements"], 1):
-            announcements_list.append({
-                "id": i,
-                "title": announcement["title"],
-                "description": announcement["description"],
-                "date": announcement["date"],
-                "isNew": announcement["isNew"],
-                "status": "active",
-                "created_at": datetime.now().isoformat(),
-                "updated_at": datetime.now().isoformat()
-            })
+        if announcements:
+            announcements_list = [_announcement_dict(announcement) for announcement in announcements]
+        else:
+            # Use default announcements
+            announcements_list = []
+            for i, announcement in enumerate(DEFAULT_ANNOUNCEMENTS["announcements"], 1):
+                announcements_list.append({
+                    "id": i,
+                    "title": announcement["title"],
+                    "description": announcement["description"],
+                    "date": announcement["date"],
+                    "isNew": announcement["isNew"],
+                    "status": "active",
+                    "created_at": datetime.now().isoformat(),
+                    "updated_at": datetime.now().isoformat()
+                })
     
-    conn.close()
-    return {
-        "title": "ANNOUNCEMENTS",
-        "announcements": announcements_list
-    }
+        return {
+            "title": "ANNOUNCEMENTS",
+            "announcements": announcements_list
+        }
+
+def get_announcements_page(limit=DEFAULT_PAGE_SIZE, after=None, year=None, since=None, until=None):
+    """Get one page of active announcements, newest first.
+
+    ``year``, ``since`` and ``until`` filter on the publication date.
+    Returns the announcements and the cursor for the next page, or None
+    after the last one. Unlike ``get_all_announcements`` there are no
+    defaults for an empty table.
+    """
+    if year is not None:
+        since = max(since or date.min, date(year, 1, 1))
+        until = min(until or date.max, date(year, 12, 31))
+    where, params = date_range('published_on', since, until)
+    where.insert(0, "status = 'active'")
+    with read_connection() as conn:
+        rows, next_cursor = fetch_page(
+            conn.cursor(), 'announcements', ANNOUNCEMENT_COLUMNS, ('published_on', 'id'),
+            where, params, limit=limit, after=after
+        )
+    return [_announcement_dict(row) for row in rows], next_cursor
 
 def add_announcement(title, description, day, month, year, is_new=True, status="active"):
     """Add a new announcement"""
-    conn = get_connection()
-    c = conn.cursor()
+    with write_connection() as conn:
+        c = conn.cursor()
     
-    c.execute("""
-        INSERT INTO announcements (
-            title, description, day, month, year, is_new, status
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (title, description, day, month, year, is_new, status))
+        c.execute("""
+            INSERT INTO announcements (
+                title, description, day, month, year, is_new, status, published_on
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, date('now')))
+        """, (title, description, day, month, year, is_new, status, publication_date(day, month, year)))
     
-    announcement_id = c.lastrowid
+        announcement_id = c.lastrowid
     
-    conn.commit()
-    conn.close()
-    return announcement_id
+        conn.commit()
+        return announcement_id
 
 def update_announcement(announcement_id, title, description, day, month, year, is_new, status):
     """Update an existing announcement"""
-    conn = get_connection()
-    c = conn.cursor()
-    now = datetime.now().isoformat()
+    with write_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
     
-    c.execute("""
-        UPDATE announcements 
-        SET title=?, description=?, day=?, month=?, year=?, is_new=?, status=?, updated_at=?
-        WHERE id=?
-    """, (title, description, day, month, year, is_new, status, now, announcement_id))
+        c.execute("""
+            UPDATE announcements 
+            SET title=?, description=?, day=?, month=?, year=?, is_new=?, status=?, updated_at=?,
+                published_on=COALESCE(?, date(created_at))
+            WHERE id=?
+        """, (title, description, day, month, year, is_new, status, now,
+              publication_date(day, month, year), announcement_id))
     
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 def delete_announcement(announcement_id):
     """Delete an announcement"""
-    conn = get_connection()
-    c = conn.cursor()
+    with write_connection() as conn:
+        c = conn.cursor()
     
-    c.execute("DELETE FROM announcements WHERE id=?", (announcement_id,))
+        c.execute("DELETE FROM announcements WHERE id=?", (announcement_id,))
     
-    conn.commit()
-    conn.close()
+        conn.commit()
 
 def toggle_announcement_status(announcement_id, status):
     """Toggle the status of an announcement"""
-    conn = get_connection()
-    c = conn.cursor()
-    now = datetime.now().isoformat()
+    with write_connection() as conn:
+        c = conn.cursor()
+        now = datetime.now().isoformat()
     
-    c.execute("""
-        UPDATE announcements 
-        SET status=?, updated_at=?
-        WHERE id=?
-    """, (status, now, announcement_id))
+        c.execute("""
+            UPDATE announcements 
+            SET status=?, updated_at=?
+            WHERE id=?
+        """, (status, now, announcement_id))
     
-    conn.commit()
-    conn.close() 
\ No newline at end of file
+        conn.commit()
\ No newline at end of file
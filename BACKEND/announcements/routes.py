@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
 from typing import Optional
+from datetime import date
 from .models import (
     get_all_announcements,
+    get_announcements_page,
     add_announcement,
     update_announcement,
     delete_announcement,
     toggle_announcement_status
 )
 from auth.routes import require_auth
+from db import run_in_db, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+from cache import Snapshot, bump_version, snapshot_response
+from responses import FastJSONResponse
 
 router = APIRouter()
 
@@ -31,27 +36,46 @@ class AnnouncementUpdate(AnnouncementBase):
     pass
 
 
+announcements_snapshot = Snapshot(('announcements',), get_all_announcements)
+
 @router.get("")
-async def get_announcements():
-    """Get all announcements"""
-    print("Getting all announcements")
-    return get_all_announcements()
+async def get_announcements(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    year: Optional[int] = Query(None, ge=1, le=9999),
+    since: Optional[date] = None,
+    until: Optional[date] = None
+):
+    """Get all announcements, or one page of them when ``limit``, ``after`` or a filter is given"""
+    if limit is None and after is None and year is None and since is None and until is None:
+        return await snapshot_response(request, announcements_snapshot)
+    announcements, next_cursor = await run_in_db(
+        get_announcements_page, limit or DEFAULT_PAGE_SIZE, after, year, since, until
+    )
+    return FastJSONResponse({
+        "title": "ANNOUNCEMENTS",
+        "announcements": announcements,
+        "next_cursor": next_cursor
+    })
 
 @router.post("")
 async def add_announcement_route(announcement: AnnouncementCreate, current_user = Depends(require_auth)):
     """Add a new announcement"""
-    date = announcement.date
+    date_parts = announcement.date
     
-    add_announcement(
+    await run_in_db(
+        add_announcement,
         announcement.title,
         announcement.description,
-        date.day,
-        date.month,
-        date.year,
+        date_parts.day,
+        date_parts.month,
+        date_parts.year,
         announcement.isNew,
         announcement.status
     )
     
+    bump_version('announcements')
     return {'message': 'Announcement added successfully'}
 
 @router.put("/{announcement_id}")
@@ -61,23 +85,26 @@ async def update_announcement_route(
     current_user = Depends(require_auth)
 ):
     """Update an existing announcement"""
-    date = announcement.date
+    date_parts = announcement.date
     
-    update_announcement(
+    await run_in_db(
+        update_announcement,
         announcement_id,
         announcement.title,
         announcement.description,
-        date.day,
-        date.month,
-        date.year,
+        date_parts.day,
+        date_parts.month,
+        date_parts.year,
         announcement.isNew,
         announcement.status
     )
     
+    bump_version('announcements')
     return {'message': 'Announcement updated successfully'}
 
 @router.delete("/{announcement_id}")
 async def delete_announcement_route(announcement_id: int, current_user = Depends(require_auth)):
     """Delete an announcement"""
-    delete_announcement(announcement_id)
+    await run_in_db(delete_announcement, announcement_id)
+    bump_version('announcements')
     return {'message': 'Announcement deleted successfully'}
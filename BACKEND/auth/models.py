@@ -1,28 +1,30 @@
-from db import get_connection
+from db import read_connection, write_connection, run_in_db, fetch_page, date_range, DEFAULT_PAGE_SIZE
 from datetime import datetime, timedelta
 import hashlib
 import secrets
 import jwt
 import os
-from passlib.context import CryptContext
-import bcrypt
 from typing import Optional, Tuple, Dict, Any, List
+from .session_cache import session_cache, token_key
+from .token_epochs import token_epochs
+from .passwords import hash_password, verify_password, hash_password_async, verify_password_async
+from table_versions import table_versions
 
 # JWT configuration
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', 'your-super-secret-key-keep-it-safe')  # Use the same key as in main.py
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password):
-    """Hash a password using bcrypt"""
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+# 'session' checks every bearer token against the tokens table. 'stateless'
+# issues short-lived access tokens checked against the in-memory epoch map,
+# plus a refresh token stored in the tokens table. Session mode keeps one
+# session per user: logging in ends the others. Stateless mode keeps one per
+# device: logout revokes that device's access token and refresh token only,
+# while deleting a user or changing their role or status bumps the epoch,
+# which ends every session at once.
+AUTH_MODE = os.getenv('AUTH_MODE', 'session')
+ACCESS_TOKEN_MINUTES = int(os.getenv('ACCESS_TOKEN_MINUTES', '15'))
+REFRESH_TOKEN_DAYS = int(os.getenv('REFRESH_TOKEN_DAYS', '14'))
 
 def generate_token(user_id, role):
     """Generate a JWT token for the user"""
@@ -37,32 +39,226 @@ def generate_token(user_id, role):
         token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
         
         # Store token in database
-        conn = get_connection()
+        with write_connection() as conn:
+            c = conn.cursor()
+            
+            # Invalidate any existing tokens for this user
+            c.execute("""
+                UPDATE tokens 
+                SET is_valid = 0 
+                WHERE user_id = ?
+            """, (user_id,))
+            
+            # Insert new token
+            c.execute("""
+                INSERT INTO tokens (user_id, token_hash, expires_at, is_valid)
+                VALUES (?, ?, ?, 1)
+            """, (user_id, token_key(token), expires_at.isoformat()))
+            
+            conn.commit()
+        
+        # Older tokens were just invalidated, so drop their cached sessions
+        session_cache.evict_user(user_id)
+        return token
+    except Exception as e:
+        print(f"Error generating token: {str(e)}")
+        raise Exception("Could not generate token")
+
+def _bump_epoch(c, user_id):
+    """Revoke a user's access tokens by moving their epoch forward"""
+    c.execute("""
+        INSERT INTO token_epochs (user_id, epoch)
+        VALUES (?, 1)
+        ON CONFLICT (user_id) DO UPDATE
+        SET epoch = epoch + 1, updated_at = CURRENT_TIMESTAMP
+    """, (user_id,))
+
+def _epochs_changed(user_id):
+    """Drop a user's cached sessions and rebuild the epoch map"""
+    session_cache.evict_user(user_id)
+    if AUTH_MODE == 'stateless':
+        token_epochs.reload()
+
+def _auth_tables_changed():
+    """Another connection wrote users, token_epochs or revoked_tokens; forget what was derived from them"""
+    session_cache.clear()
+    token_epochs.invalidate()
+
+def _tokens_changed():
+    """A token row was written, possibly revoking a cached session"""
+    # The registry cannot say which row moved, so drop every cached session.
+    # Stateless access tokens are checked against epochs, not this table.
+    if AUTH_MODE != 'stateless':
+        session_cache.clear()
+
+# Writes from other workers only show up here through the version registry
+table_versions.on_change(('users', 'token_epochs', 'revoked_tokens'), _auth_tables_changed)
+table_versions.on_change(('tokens',), _tokens_changed)
+
+def _store_refresh_token(c, user_id):
+    """Store a new refresh token, returning it and its row id"""
+    refresh_token = secrets.token_urlsafe(32)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS)
+    c.execute("""
+        INSERT INTO tokens (user_id, token_hash, expires_at, is_valid)
+        VALUES (?, ?, ?, 1)
+    """, (user_id, token_key(refresh_token), expires_at.isoformat()))
+    return refresh_token, c.lastrowid
+
+def _access_token(user_id, role, epoch, session_id):
+    # ``sid`` is the row of the refresh token issued alongside, so logout can
+    # revoke the pair
+    expires_at = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    payload = {
+        'user_id': user_id,
+        'role': role,
+        'ep': epoch,
+        'jti': secrets.token_urlsafe(16),
+        'sid': session_id,
+        'typ': 'access',
+        'exp': expires_at.timestamp(),
+        'iat': datetime.utcnow().timestamp()
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def generate_token_pair(user_id, role):
+    """Issue a stateless access token and a stored refresh token.
+
+    Unlike ``generate_token`` this leaves the user's sessions on other
+    devices alone; each one ends with its own logout.
+    """
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT epoch FROM token_epochs WHERE user_id = ?", (user_id,))
+            row = c.fetchone()
+            epoch = row[0] if row else 0
+            refresh_token, session_id = _store_refresh_token(c, user_id)
+        
+        return _access_token(user_id, role, epoch, session_id), refresh_token
+    except Exception as e:
+        print(f"Error generating token: {str(e)}")
+        raise Exception("Could not generate token")
+
+def refresh_session(refresh_token):
+    """Rotate a refresh token and issue a new access token.
+
+    Returns (tokens, None) on success or (None, error_message) on failure.
+    """
+    if AUTH_MODE != 'stateless':
+        return None, "Refresh tokens are not enabled"
+    
+    current_time = datetime.utcnow().isoformat()
+    with write_connection() as conn:
         c = conn.cursor()
+        c.execute("""
+            SELECT t.id, u.id, u.role, COALESCE(e.epoch, 0)
+            FROM tokens t
+            JOIN users u ON t.user_id = u.id
+            LEFT JOIN token_epochs e ON e.user_id = u.id
+            WHERE t.token_hash = ? 
+            AND t.is_valid = 1 
+            AND t.expires_at > ?
+            AND u.status = 'active'
+        """, (token_key(refresh_token), current_time))
+        row = c.fetchone()
+        if not row:
+            return None, "Invalid or expired refresh token"
         
-        # Invalidate any existing tokens for this user
+        token_id, user_id, role, epoch = row
+        # Refresh tokens are single-use
+        c.execute("UPDATE tokens SET is_valid = 0 WHERE id = ?", (token_id,))
+        new_refresh_token, session_id = _store_refresh_token(c, user_id)
+    
+    return {
+        'token': _access_token(user_id, role, epoch, session_id),
+        'refresh_token': new_refresh_token
+    }, None
+
+def verify_access_token(token):
+    """Verify a stateless access token without touching the database"""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        print("Token has expired")
+        return None
+    except jwt.InvalidTokenError as e:
+        print(f"Invalid token: {str(e)}")
+        return None
+    
+    if payload.get('typ') != 'access':
+        print("Not an access token")
+        return None
+    
+    # Inactive and deleted users have no epoch, so their tokens fail here too
+    epoch = token_epochs.get(payload.get('user_id'))
+    if epoch is None or epoch != payload.get('ep') or token_epochs.is_revoked(payload.get('jti')):
+        print("Token has been revoked")
+        return None
+    
+    return {
+        'user_id': payload['user_id'],
+        'role': payload['role'],
+        'exp': payload['exp']
+    }
+
+def _token_payload(token):
+    """Read the claims of a signed token, even if it has expired"""
+    try:
+        return jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={'verify_exp': False})
+    except jwt.InvalidTokenError:
+        return None
+
+def revoke_access_token(token):
+    """End one stateless session: its access token and the refresh token issued with it.
+
+    The access token's ``jti`` is listed in ``revoked_tokens`` until the
+    token expires, so every worker rejects it once it has seen the write.
+    The user's sessions on other devices keep working. Returns False if
+    ``token`` is not one of ours.
+    """
+    payload = _token_payload(token)
+    if payload is None or payload.get('user_id') is None:
+        return False
+    user_id = payload['user_id']
+    if payload.get('jti') is None:
+        # Issued before tokens carried an id, so only the epoch can revoke it
+        revoke_user_tokens(user_id)
+        return True
+
+    expires_at = datetime.utcfromtimestamp(payload['exp']).isoformat()
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            INSERT OR IGNORE INTO revoked_tokens (jti, user_id, expires_at)
+            VALUES (?, ?, ?)
+        """, (payload['jti'], user_id, expires_at))
+        c.execute("""
+            UPDATE tokens 
+            SET is_valid = 0 
+            WHERE id = ? AND user_id = ?
+        """, (payload.get('sid'), user_id))
+    session_cache.evict_token(token)
+    token_epochs.reload()
+    return True
+
+def revoke_user_tokens(user_id):
+    """Revoke every access and refresh token a user holds, on every device"""
+    with write_connection() as conn:
+        c = conn.cursor()
         c.execute("""
             UPDATE tokens 
             SET is_valid = 0 
             WHERE user_id = ?
         """, (user_id,))
-        
-        # Insert new token
-        c.execute("""
-            INSERT INTO tokens (user_id, token, expires_at, is_valid)
-            VALUES (?, ?, ?, 1)
-        """, (user_id, token, expires_at.isoformat()))
-        
-        conn.commit()
-        conn.close()
-        
-        return token
-    except Exception as e:
-        print(f"Error generating token: {str(e)}")
-        raise Exception("Could not generate token")
+        _bump_epoch(c, user_id)
+    _epochs_changed(user_id)
 
 def verify_token(token):
     """Verify a JWT token and return user info if valid"""
+    if AUTH_MODE == 'stateless':
+        return verify_access_token(token)
+    
     try:
         # First verify JWT signature and expiration
         try:
@@ -75,23 +271,22 @@ def verify_token(token):
             return None
         
         # Then check if token is valid in database
-        conn = get_connection()
-        c = conn.cursor()
-        
-        current_time = datetime.utcnow().isoformat()
-        
-        c.execute("""
-            SELECT t.user_id, t.expires_at, u.role, u.status
-            FROM tokens t
-            JOIN users u ON t.user_id = u.id
-            WHERE t.token = ? 
-            AND t.is_valid = 1 
-            AND t.expires_at > ?
-            AND u.status = 'active'
-        """, (token, current_time))
-        
-        token_data = c.fetchone()
-        conn.close()
+        with read_connection() as conn:
+            c = conn.cursor()
+            
+            current_time = datetime.utcnow().isoformat()
+            
+            c.execute("""
+                SELECT t.user_id, t.expires_at, u.role, u.status
+                FROM tokens t
+                JOIN users u ON t.user_id = u.id
+                WHERE t.token_hash = ? 
+                AND t.is_valid = 1 
+                AND t.expires_at > ?
+                AND u.status = 'active'
+            """, (token_key(token), current_time))
+            
+            token_data = c.fetchone()
         
         if not token_data:
             print("Token not found in database or invalidated")
@@ -111,81 +306,154 @@ def verify_token(token):
         
     except Exception as e:
         print(f"Error verifying token: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
         return None
 
 def invalidate_token(token):
-    """Invalidate a token in the database"""
+    """Invalidate a token in the database.
+
+    In stateless mode only this device's session ends, through
+    ``revoke_access_token``; ``revoke_user_tokens`` ends all of them.
+    """
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        
-        # Mark token as invalid
-        c.execute("""
-            UPDATE tokens 
-            SET is_valid = 0 
-            WHERE token = ?
-        """, (token,))
+        if AUTH_MODE == 'stateless':
+            return revoke_access_token(token)
         
-        conn.commit()
-        conn.close()
+        with write_connection() as conn:
+            c = conn.cursor()
+            
+            # Mark token as invalid
+            c.execute("""
+                UPDATE tokens 
+                SET is_valid = 0 
+                WHERE token_hash = ?
+            """, (token_key(token),))
+            
+            conn.commit()
+        session_cache.evict_token(token)
         return True
     except Exception as e:
         print(f"Error invalidating token: {str(e)}")
         return False
 
-def create_user(username, email, password, role='user'):
+def purge_dead_tokens(batch_size=500):
+    """Delete invalidated and expired tokens, returning how many were removed.
+
+    Rows are deleted ``batch_size`` at a time, each batch in its own short
+    transaction, so a large backlog never holds the writer for long. The two
+    arms of the UNION use the partial invalid-token index and the
+    ``expires_at`` index respectively. Revoked access tokens that have
+    expired are dropped from ``revoked_tokens`` the same way.
+    """
+    removed = 0
+    while True:
+        current_time = datetime.utcnow().isoformat()
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                DELETE FROM revoked_tokens
+                WHERE jti IN (SELECT jti FROM revoked_tokens WHERE expires_at <= ? LIMIT ?)
+            """, (current_time, batch_size))
+            deleted = c.rowcount
+        if deleted == 0:
+            break
+        removed += deleted
+    while True:
+        current_time = datetime.utcnow().isoformat()
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                DELETE FROM tokens
+                WHERE id IN (
+                    SELECT id FROM tokens WHERE is_valid = 0
+                    UNION ALL
+                    SELECT id FROM tokens WHERE expires_at <= ?
+                    LIMIT ?
+                )
+            """, (current_time, batch_size))
+            deleted = c.rowcount
+        if deleted == 0:
+            return removed
+        removed += deleted
+
+def login_key(value):
+    """Case-folded form of a username or email used for login lookups"""
+    return value.strip().casefold()
+
+def login_keys_for(username, email):
+    """The distinct login keys a user can sign in with"""
+    return {login_key(value) for value in (username, email) if value}
+
+def _store_login_keys(c, user_id, username, email):
+    c.execute("DELETE FROM login_keys WHERE user_id = ?", (user_id,))
+    c.executemany(
+        "INSERT INTO login_keys (login_key, user_id) VALUES (?, ?)",
+        [(key, user_id) for key in login_keys_for(username, email)]
+    )
+
+def _user_exists(username, email):
+    """Check if username or email already exists, ignoring case"""
+    keys = list(login_keys_for(username, email))
+    with read_connection() as conn:
+        c = conn.cursor()
+        c.execute(f"""
+            SELECT 1 FROM login_keys
+            WHERE login_key IN ({', '.join('?' * len(keys))})
+        """, keys)
+        return c.fetchone() is not None
+
+def _insert_user(username, email, password_hash, role):
+    try:
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO users (username, email, password_hash, role)
+                VALUES (?, ?, ?, ?)
+            """, (username, email, password_hash, role))
+            user_id = c.lastrowid
+            _store_login_keys(c, user_id, username, email)
+        return user_id, None
+    except Exception as e:
+        return None, str(e)
+
+async def create_user(username, email, password, role='user'):
     """Create a new user"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Check if username or email already exists
-    c.execute("SELECT id FROM users WHERE username = ? OR email = ?", (username, email))
-    if c.fetchone():
-        conn.close()
+    if await run_in_db(_user_exists, username, email):
         return None, "Username or email already exists"
     
-    # Hash password
-    password_hash = hash_password(password)
+    # Hash password on the bcrypt pool; no connection is held while waiting
+    password_hash = await hash_password_async(password)
     
-    try:
+    return await run_in_db(_insert_user, username, email, password_hash, role)
+
+def _get_login_user(username_or_email):
+    """Get an active user by username or email, ignoring case"""
+    with read_connection() as conn:
+        c = conn.cursor()
         c.execute("""
-            INSERT INTO users (username, email, password_hash, role)
-            VALUES (?, ?, ?, ?)
-        """, (username, email, password_hash, role))
-        user_id = c.lastrowid
-        conn.commit()
-        conn.close()
-        return user_id, None
-    except Exception as e:
-        conn.close()
-        return None, str(e)
+            SELECT u.id, u.username, u.email, u.password_hash, u.role, u.status
+            FROM login_keys k
+            JOIN users u ON u.id = k.user_id
+            WHERE k.login_key = ? AND u.status = 'active'
+        """, (login_key(username_or_email),))
+        return c.fetchone()
 
-def verify_user(username_or_email, password):
+async def verify_user(username_or_email, password):
     """Verify user credentials and return user info if valid"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Get user by username or email
-    c.execute("""
-        SELECT id, username, email, password_hash, role, status
-        FROM users 
-        WHERE (username = ? OR email = ?) AND status = 'active'
-    """, (username_or_email, username_or_email))
-    user = c.fetchone()
+    user = await run_in_db(_get_login_user, username_or_email)
     
     if not user:
-        conn.close()
         return None, "Invalid credentials or inactive account"
     
-    # Verify password
-    if not verify_password(password, user[3]):  # user[3] is stored password_hash
-        conn.close()
+    # Verify password on the bcrypt pool
+    if not await verify_password_async(password, user[3]):  # user[3] is stored password_hash
         return None, "Invalid credentials"
     
     # Generate new token
-    token = generate_token(user[0], user[4])  # user[0] is id, user[4] is role
+    refresh_token = None
+    if AUTH_MODE == 'stateless':
+        token, refresh_token = await run_in_db(generate_token_pair, user[0], user[4])
+    else:
+        token = await run_in_db(generate_token, user[0], user[4])  # user[0] is id, user[4] is role
     
     user_data = {
         'id': user[0],
@@ -194,36 +462,39 @@ def verify_user(username_or_email, password):
         'role': user[4],
         'token': token
     }
+    if refresh_token:
+        user_data['refresh_token'] = refresh_token
     
-    conn.close()
     return user_data, None
 
 def logout_user(token):
-    """Invalidate a user's token"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    # Delete token from database
-    c.execute("DELETE FROM tokens WHERE token = ?", (token,))
+    """Invalidate a user's token; see ``invalidate_token`` for stateless mode"""
+    if AUTH_MODE == 'stateless':
+        revoke_access_token(token)
+        return
     
-    conn.commit()
-    conn.close()
+    with write_connection() as conn:
+        c = conn.cursor()
+        
+        # Delete token from database
+        c.execute("DELETE FROM tokens WHERE token_hash = ?", (token_key(token),))
+        
+        conn.commit()
+    session_cache.evict_token(token)
 
 def get_user_by_id(user_id):
     """Get user info by ID"""
-    conn = get_connection()
-    c = conn.cursor()
-    
     try:
-        c.execute("""
-            SELECT id, username, email, role, status, created_at, updated_at
-            FROM users 
-            WHERE id = ? AND status != 'deleted'
-        """, (user_id,))
-        user = c.fetchone()
+        with read_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT id, username, email, role, status, created_at, updated_at
+                FROM users 
+                WHERE id = ? AND status != 'deleted'
+            """, (user_id,))
+            user = c.fetchone()
         
         if not user:
-            conn.close()
             return None
         
         user_data = {
@@ -236,27 +507,25 @@ def get_user_by_id(user_id):
             'updated_at': user[6] if len(user) > 6 else user[5]  # Fallback to created_at if updated_at is not available
         }
         
-        conn.close()
         return user_data
     except Exception as e:
         print(f"Error in get_user_by_id: {str(e)}")
-        conn.close()
         return None
 
 def get_all_users():
     """Get all non-deleted users"""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        
-        c.execute("""
-            SELECT id, username, email, role, status, created_at, updated_at
-            FROM users 
-            WHERE status != 'deleted'
-            ORDER BY created_at DESC
-        """)
-        
-        users = c.fetchall()
+        with read_connection() as conn:
+            c = conn.cursor()
+            
+            c.execute("""
+                SELECT id, username, email, role, status, created_at, updated_at
+                FROM users 
+                WHERE status != 'deleted'
+                ORDER BY created_at DESC
+            """)
+            
+            users = c.fetchall()
         users_data = []
         
         for user in users:
@@ -271,51 +540,155 @@ def get_all_users():
             }
             users_data.append(user_data)
         
-        conn.close()
         return users_data
     except Exception as e:
         print(f"Error in get_all_users: {str(e)}")
-        if 'conn' in locals():
-            conn.close()
         return None
 
+def get_users_page(limit=DEFAULT_PAGE_SIZE, after=None, status=None, since=None, until=None):
+    """Get one page of users, newest first, and the cursor for the next page.
+
+    Deleted users are left out unless ``status`` asks for them.
+    """
+    where, params = date_range('created_at', since, until)
+    if status is None:
+        where.insert(0, "status != 'deleted'")
+    else:
+        where.insert(0, "status = ?")
+        params.insert(0, status)
+    keys = ('id', 'username', 'email', 'role', 'status', 'created_at', 'updated_at')
+    with read_connection() as conn:
+        rows, next_cursor = fetch_page(conn.cursor(), 'users', keys, ('created_at', 'id'), where, params,
+                                       limit=limit, after=after)
+    return [dict(zip(keys, row)) for row in rows], next_cursor
+
 def soft_delete_user(user_id):
     """Soft delete a user by setting status to deleted and clearing password"""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        
-        # First check if user exists and is not already deleted
-        c.execute("SELECT id FROM users WHERE id = ? AND status != 'deleted'", (user_id,))
-        if not c.fetchone():
-            conn.close()
-            return False, "Invalid Credentials or already deleted"
-        
-        # Update user status to deleted and clear password
-        c.execute("""
-            UPDATE users 
-            SET status = 'deleted',
-                password_hash = '',
-                updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """, (user_id,))
-        
-        # Invalidate all tokens for this user
-        c.execute("""
-            UPDATE tokens 
-            SET is_valid = 0 
-            WHERE user_id = ?
-        """, (user_id,))
-        
-        conn.commit()
-        conn.close()
+        with write_connection() as conn:
+            c = conn.cursor()
+            
+            # First check if user exists and is not already deleted
+            c.execute("SELECT id FROM users WHERE id = ? AND status != 'deleted'", (user_id,))
+            if not c.fetchone():
+                return False, "Invalid Credentials or already deleted"
+            
+            # Update user status to deleted and clear password
+            c.execute("""
+                UPDATE users 
+                SET status = 'deleted',
+                    password_hash = '',
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (user_id,))
+            
+            # Invalidate all tokens for this user
+            c.execute("""
+                UPDATE tokens 
+                SET is_valid = 0 
+                WHERE user_id = ?
+            """, (user_id,))
+            _bump_epoch(c, user_id)
+            
+            conn.commit()
+        _epochs_changed(user_id)
         return True, None
     except Exception as e:
-        if 'conn' in locals():
-            conn.close()
         return False, str(e)
 
-def update_user_details(
+def _apply_user_update(user_id, username, email, role, status, password_hash=None):
+    """Write a user update; ``password_hash`` is already computed"""
+    try:
+        # Connect to database
+        with write_connection() as conn:
+            cur = conn.cursor()
+
+            # Check if user exists
+            cur.execute(
+                "SELECT id, username, email, role, status FROM users WHERE id = ?",
+                (user_id,)
+            )
+            user = cur.fetchone()
+        
+            if not user:
+                return None, "Invalid Credentials"
+
+            # Check for duplicate username
+            cur.execute(
+                "SELECT user_id FROM login_keys WHERE login_key = ? AND user_id != ?",
+                (login_key(username), user_id)
+            )
+            if cur.fetchone():
+                return None, "Username already exists"
+
+            # Check for duplicate email
+            cur.execute(
+                "SELECT user_id FROM login_keys WHERE login_key = ? AND user_id != ?",
+                (login_key(email), user_id)
+            )
+            if cur.fetchone():
+                return None, "Email already exists"
+
+            # Prepare update query and parameters
+            update_fields = []
+            params = []
+
+            # Add basic fields
+            update_fields.extend(["username = ?", "email = ?", "role = ?", "status = ?", "updated_at = CURRENT_TIMESTAMP"])
+            params.extend([username, email, role, status])
+
+            # If password is provided, add its hash to the update
+            if password_hash:
+                update_fields.append("password_hash = ?")
+                params.append(password_hash)
+
+            # Add user_id to params
+            params.append(user_id)
+
+            # Construct and execute update query
+            query = f"""
+                UPDATE users 
+                SET {', '.join(update_fields)}
+                WHERE id = ?
+                RETURNING id, username, email, role, status, created_at, updated_at
+            """
+        
+            cur.execute(query, params)
+            updated_user = cur.fetchone()
+            if updated_user:
+                _store_login_keys(cur, user_id, username, email)
+
+            # Role and status changes revoke the user's outstanding tokens
+            revoke = updated_user and (role != user[3] or status != user[4])
+            if revoke:
+                _bump_epoch(cur, user_id)
+            conn.commit()
+            if revoke:
+                _epochs_changed(user_id)
+            else:
+                session_cache.evict_user(user_id)
+
+            if not updated_user:
+                return None, "Failed to update user"
+
+            # Convert to dictionary
+            user_dict = {
+                'id': str(updated_user[0]),
+                'username': updated_user[1],
+                'email': updated_user[2],
+                'role': updated_user[3],
+                'status': updated_user[4],
+                'createdAt': updated_user[5],  # Already a string from SQLite
+                'updatedAt': updated_user[6] if len(updated_user) > 6 else updated_user[5]  # Use created_at as fallback
+            }
+
+            return user_dict, None
+
+    except Exception as e:
+        print(f"Error updating user: {str(e)}")
+        return None, f"Database error: {str(e)}"
+
+async def update_user_details(
     user_id: str,
     username: str,
     email: str,
@@ -327,87 +700,7 @@ def update_user_details(
     Update user details including optional password change.
     Returns (updated_user, None) on success or (None, error_message) on failure
     """
-    try:
-        # Connect to database
-        conn = get_connection()
-        cur = conn.cursor()
-
-        # Check if user exists
-        cur.execute(
-            "SELECT id, username, email, role, status FROM users WHERE id = ?",
-            (user_id,)
-        )
-        user = cur.fetchone()
-        
-        if not user:
-            return None, "Invalid Credentials"
-
-        # Check for duplicate username
-        cur.execute(
-            "SELECT id FROM users WHERE username = ? AND id != ?",
-            (username, user_id)
-        )
-        if cur.fetchone():
-            return None, "Username already exists"
-
-        # Check for duplicate email
-        cur.execute(
-            "SELECT id FROM users WHERE email = ? AND id != ?",
-            (email, user_id)
-        )
-        if cur.fetchone():
-            return None, "Email already exists"
-
-        # Prepare update query and parameters
-        update_fields = []
-        params = []
-
-        # Add basic fields
-        update_fields.extend(["username = ?", "email = ?", "role = ?", "status = ?", "updated_at = CURRENT_TIMESTAMP"])
-        params.extend([username, email, role, status])
-
-        # If password is provided, hash it and add to update
-        if password:
-            password_hash = hash_password(password)
-            update_fields.append("password_hash = ?")
-            params.append(password_hash)
-
-        # Add user_id to params
-        params.append(user_id)
-
-        # Construct and execute update query
-        query = f"""
-            UPDATE users 
-            SET {', '.join(update_fields)}
-            WHERE id = ?
-            RETURNING id, username, email, role, status, created_at, updated_at
-        """
-        
-        cur.execute(query, params)
-        updated_user = cur.fetchone()
-        conn.commit()
+    # Hash any new password before taking the writer connection
+    password_hash = await hash_password_async(password) if password else None
 
-        if not updated_user:
-            return None, "Failed to update user"
-
-        # Convert to dictionary
-        user_dict = {
-            'id': str(updated_user[0]),
-            'username': updated_user[1],
-            'email': updated_user[2],
-            'role': updated_user[3],
-            'status': updated_user[4],
-            'createdAt': updated_user[5],  # Already a string from SQLite
-            'updatedAt': updated_user[6] if len(updated_user) > 6 else updated_user[5]  # Use created_at as fallback
-        }
-
-        return user_dict, None
-
-    except Exception as e:
-        print(f"Error updating user: {str(e)}")
-        return None, f"Database error: {str(e)}"
-    finally:
-        if 'cur' in locals():
-            cur.close()
-        if 'conn' in locals():
-            conn.close() 
\ No newline at end of file
+    return await run_in_db(_apply_user_update, user_id, username, email, role, status, password_hash)
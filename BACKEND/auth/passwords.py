@@ -0,0 +1,104 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+# bcrypt worker pool configuration. bcrypt releases the GIL while hashing, so
+# threads give real parallelism without blocking the event loop.
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', '2'))
+BCRYPT_MAX_QUEUE = int(os.getenv('BCRYPT_MAX_QUEUE', '64'))
+
+# Password hashing configuration
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class PasswordQueueFull(Exception):
+    """Raised when too many password operations are already waiting"""
+
+class PasswordWorkerPool:
+    """Bounded thread pool for bcrypt hashing and verification.
+
+    At most ``workers`` hashes run at once; up to ``max_queue`` more may wait
+    before new requests are rejected with ``PasswordQueueFull``.
+    """
+
+    def __init__(self, workers=BCRYPT_WORKERS, max_queue=BCRYPT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.peak_queue_depth = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            return self._executor
+
+    def _run(self, func, *args):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on the pool and await its result"""
+        executor = self._get_executor()
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PasswordQueueFull("Password hashing queue is full")
+            self.queued += 1
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queued)
+        try:
+            future = executor.submit(self._run, func, *args)
+        except Exception:
+            with self._lock:
+                self.queued -= 1
+            raise
+        return await asyncio.wrap_future(future)
+
+    def stats(self):
+        """Return a snapshot of queue depth and throughput counters"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'peak_queue_depth': self.peak_queue_depth
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+password_pool = PasswordWorkerPool()
+
+def hash_password(password):
+    """Hash a password using bcrypt"""
+    return pwd_context.hash(password)
+
+def verify_password(plain_password, hashed_password):
+    """Verify a password against its hash"""
+    return pwd_context.verify(plain_password, hashed_password)
+
+async def hash_password_async(password):
+    """Hash a password on the bcrypt worker pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verify a password on the bcrypt worker pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from typing import Optional, List
+from datetime import date
 from pydantic import BaseModel
 from .models import (
     create_user,
@@ -10,9 +11,18 @@ from .models import (
     invalidate_token,
     soft_delete_user,
     get_all_users,
-    update_user_details
+    get_users_page,
+    update_user_details,
+    refresh_session,
+    AUTH_MODE
 )
+from .session_cache import session_cache
+from .token_epochs import token_epochs
+from .passwords import PasswordQueueFull
 from functools import wraps
+from cache import bump_version
+from table_versions import table_versions
+from db import run_in_db, InvalidCursor, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
 
 router = APIRouter()
 
@@ -26,6 +36,9 @@ class UserLogin(BaseModel):
     username_or_email: str
     password: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class UserUpdate(BaseModel):
     id: str
     username: str
@@ -42,14 +55,24 @@ async def get_current_user(authorization: Optional[str] = Header(None)):
         raise HTTPException(status_code=401, detail='No authorization token provided')
     
     token = authorization.split(' ')[1]
-    payload = verify_token(token)
-    if not payload:
-        raise HTTPException(status_code=401, detail='Invalid or expired token')
-    
-    user = get_user_by_id(payload['user_id'])
-    if not user:
-        raise HTTPException(status_code=401, detail='Invalid Credentials')
-    return {"user": user, "role": payload['role'], "token": token}
+    # Drops cached sessions and epochs if another worker changed a user
+    table_versions.check()
+    session = session_cache.get(token)
+    if session is None:
+        if AUTH_MODE == 'stateless' and token_epochs.loaded:
+            # Signature and epoch checks are in-memory, so skip the executor
+            payload = verify_token(token)
+        else:
+            payload = await run_in_db(verify_token, token)
+        if not payload:
+            raise HTTPException(status_code=401, detail='Invalid or expired token')
+        
+        user = await run_in_db(get_user_by_id, payload['user_id'])
+        if not user:
+            raise HTTPException(status_code=401, detail='Invalid Credentials')
+        session = {"user": user, "role": payload['role']}
+        session_cache.set(token, user['id'], session, payload['exp'])
+    return {"user": session["user"], "role": session["role"], "token": token}
 
 # Add this for compatibility with other routes
 async def require_auth(authorization: Optional[str] = Header(None)):
@@ -67,7 +90,7 @@ async def signup(user: UserCreate, authorization: Optional[str] = Header(None)):
         current_user = await get_current_user(authorization)
         await require_admin(current_user)
     
-    user_id, error = create_user(
+    user_id, error = await create_user(
         user.username,
         user.email,
         user.password,
@@ -77,6 +100,7 @@ async def signup(user: UserCreate, authorization: Optional[str] = Header(None)):
     if error:
         raise HTTPException(status_code=400, detail=error)
     
+    bump_version('users')
     return {
         'message': 'User created successfully',
         'user_id': user_id
@@ -88,7 +112,7 @@ async def login(user: UserLogin):
     Authenticate user and return token
     """
     try:
-        user_data, error = verify_user(
+        user_data, error = await verify_user(
             user.username_or_email,
             user.password
         )
@@ -99,7 +123,7 @@ async def login(user: UserLogin):
         if not user_data:
             raise HTTPException(status_code=401, detail="Invalid Credentials")
         
-        return {
+        response = {
             'message': 'Login successful',
             'user': {
                 'id': user_data['id'],
@@ -109,20 +133,36 @@ async def login(user: UserLogin):
                 'token': user_data['token']
             }
         }
+        if 'refresh_token' in user_data:
+            response['user']['refresh_token'] = user_data['refresh_token']
+        return response
     except Exception as e:
         print(f"Login error: {str(e)}")
-        if isinstance(e, HTTPException):
+        if isinstance(e, (HTTPException, PasswordQueueFull)):
             raise e
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/refresh")
+async def refresh(request: RefreshRequest):
+    """
+    Exchange a refresh token for a new access token (stateless auth mode only)
+    """
+    tokens, error = await run_in_db(refresh_session, request.refresh_token)
+    if error:
+        raise HTTPException(status_code=401, detail=error)
+    return tokens
+
 @router.post("/logout")
 async def logout(current_user = Depends(get_current_user)):
     """
-    Logout user and invalidate their token
+    Logout user and invalidate their token.
+
+    In stateless auth mode the access token stops working at once and the
+    refresh token issued with it is revoked too. Other devices stay signed in.
     """
     try:
         # Invalidate the current token
-        invalidate_token(current_user["token"])
+        await run_in_db(invalidate_token, current_user["token"])
         return {'message': 'Logout successful'}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -154,10 +194,11 @@ async def delete_user(user_id: int, current_user = Depends(require_admin)):
         if str(user_id) == str(current_user["user"]["id"]):
             raise HTTPException(status_code=400, detail="Cannot delete your own account")
             
-        success, error = soft_delete_user(user_id)
+        success, error = await run_in_db(soft_delete_user, user_id)
         if not success:
             raise HTTPException(status_code=404, detail=error)
             
+        bump_version('users')
         return {'message': 'User deleted successfully'}
     except HTTPException as e:
         raise e
@@ -165,13 +206,27 @@ async def delete_user(user_id: int, current_user = Depends(require_admin)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/users")
-async def list_users(current_user = Depends(require_admin)):
+async def list_users(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    current_user = Depends(require_admin)
+):
     """
-    Get all non-deleted users.
+    Get all non-deleted users, or one page of users when ``limit``, ``after``
+    or a filter is given.
     Only admins can access this endpoint.
     """
     try:
-        users = get_all_users()
+        if limit is not None or after is not None or status is not None or since is not None or until is not None:
+            users, next_cursor = await run_in_db(
+                get_users_page, limit or DEFAULT_PAGE_SIZE, after, status, since, until
+            )
+            return {'users': users, 'next_cursor': next_cursor}
+
+        users = await run_in_db(get_all_users)
         if users is None:
             raise HTTPException(status_code=500, detail="Failed to fetch users")
             
@@ -179,7 +234,7 @@ async def list_users(current_user = Depends(require_admin)):
             'users': users,
             'total': len(users)
         }
-    except HTTPException as e:
+    except (HTTPException, InvalidCursor) as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -197,7 +252,7 @@ async def update_users(request: UsersUpdateRequest, current_user = Depends(requi
             if str(user_update.id) == str(current_user["user"]["id"]) and user_update.role != current_user["role"]:
                 raise HTTPException(status_code=400, detail="Cannot change your own role")
             
-            success, error = update_user_details(
+            success, error = await update_user_details(
                 user_id=user_update.id,
                 username=user_update.username,
                 email=user_update.email,
@@ -210,12 +265,13 @@ async def update_users(request: UsersUpdateRequest, current_user = Depends(requi
                 raise HTTPException(status_code=400, detail=error)
             
             updated_users.append(success)
+            bump_version('users')
             
         return {
             'message': 'Users updated successfully',
             'users': updated_users
         }
-    except HTTPException as e:
+    except (HTTPException, PasswordQueueFull) as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -0,0 +1,84 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Session cache configuration
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '1024'))
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '60'))  # seconds
+
+def token_key(token):
+    """Fixed-width cache key for a bearer token"""
+    return hashlib.sha256(token.encode('utf-8')).digest()
+
+class SessionCache:
+    """Bounded LRU of resolved sessions keyed by token hash.
+
+    Each entry holds the user record and role that ``get_current_user`` would
+    otherwise load from the database. Entries expire after ``ttl`` seconds or
+    when the token itself expires, whichever comes first, and are evicted
+    explicitly when a token is invalidated or its user changes.
+    """
+
+    def __init__(self, max_size=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, user_id, session)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        """Return the cached session for ``token`` or None"""
+        key = token_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, token, user_id, session, token_expires_at=None):
+        """Cache a resolved session until the TTL or the token's expiry"""
+        expires_at = time.time() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        key = token_key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, str(user_id), session)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict_token(self, token):
+        """Forget the session for one token"""
+        with self._lock:
+            self._entries.pop(token_key(token), None)
+
+    def evict_user(self, user_id):
+        """Forget every session belonging to a user"""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return a snapshot of hit and miss counters"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+session_cache = SessionCache()
@@ -0,0 +1,74 @@
+import itertools
+import threading
+from datetime import datetime
+from db import read_connection
+
+class TokenEpochs:
+    """In-memory map of active user id -> token epoch.
+
+    Stateless access tokens carry the epoch their user had when they were
+    issued. A token is accepted only while its user is active and that epoch
+    still matches, so bumping a user's epoch in ``token_epochs`` revokes every
+    access token they hold. Single tokens revoked by logout are listed by
+    ``jti`` in ``revoked_tokens`` until they expire, and that set is loaded
+    alongside. Both are rebuilt from the database after each change; a reload
+    that started earlier never replaces a newer one.
+    """
+
+    def __init__(self):
+        self._epochs = None
+        self._revoked = frozenset()
+        self._generation = 0
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def reload(self):
+        """Rebuild the map from ``users`` and ``token_epochs``, and the revoked set"""
+        with self._lock:
+            generation = next(self._sequence)
+        with read_connection() as conn:
+            rows = conn.execute("""
+                SELECT u.id, COALESCE(e.epoch, 0)
+                FROM users u
+                LEFT JOIN token_epochs e ON e.user_id = u.id
+                WHERE u.status = 'active'
+            """).fetchall()
+            revoked = conn.execute(
+                "SELECT jti FROM revoked_tokens WHERE expires_at > ?", (datetime.utcnow().isoformat(),)
+            ).fetchall()
+        epochs = dict(rows)
+        with self._lock:
+            if generation > self._generation:
+                self._revoked = frozenset(row[0] for row in revoked)
+                self._epochs = epochs
+                self._generation = generation
+                self.reloads += 1
+
+    def get(self, user_id):
+        """Return the current epoch for an active user, or None"""
+        epochs = self._epochs
+        if epochs is None:
+            self.reload()
+            epochs = self._epochs
+        return epochs.get(user_id)
+
+    def is_revoked(self, jti):
+        """Whether the access token with this ``jti`` was revoked on its own"""
+        if self._epochs is None:
+            self.reload()
+        return jti in self._revoked
+
+    def invalidate(self):
+        """Forget the map so the next lookup rebuilds it"""
+        with self._lock:
+            self._epochs = None
+
+    @property
+    def loaded(self):
+        return self._epochs is not None
+
+    def __len__(self):
+        return len(self._epochs or ())
+
+token_epochs = TokenEpochs()
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from db import run_in_db
+from .models import purge_dead_tokens
+
+# Expired-token reaper configuration
+TOKEN_REAPER_INTERVAL = float(os.getenv('TOKEN_REAPER_INTERVAL', '3600'))  # seconds
+TOKEN_REAPER_BATCH_SIZE = int(os.getenv('TOKEN_REAPER_BATCH_SIZE', '500'))
+
+logger = logging.getLogger(__name__)
+
+class TokenReaper:
+    """Background task that deletes invalidated and expired tokens.
+
+    Runs once on start and then every ``interval`` seconds on the DB executor,
+    removing dead rows ``batch_size`` at a time. Each run logs how many rows
+    it reclaimed and the totals are kept for ``stats()``.
+    """
+
+    def __init__(self, interval=TOKEN_REAPER_INTERVAL, batch_size=TOKEN_REAPER_BATCH_SIZE):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.reclaimed = 0
+        self.last_reclaimed = 0
+        self.last_run_at = None
+
+    async def run_once(self):
+        """Purge dead tokens now and return how many rows were deleted"""
+        removed = await run_in_db(purge_dead_tokens, self.batch_size)
+        with self._lock:
+            self.runs += 1
+            self.reclaimed += removed
+            self.last_reclaimed = removed
+            self.last_run_at = time.time()
+        logger.info(f"Token reaper reclaimed {removed} dead token rows")
+        return removed
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Token reaper failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Schedule the reaper on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Cancel the reaper and wait for it to finish"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        """Return a snapshot of reaper activity"""
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'runs': self.runs,
+                'reclaimed': self.reclaimed,
+                'last_reclaimed': self.last_reclaimed,
+                'last_run_at': self.last_run_at
+            }
+
+token_reaper = TokenReaper()
@@ -0,0 +1,310 @@
+#!/bin/python3
+"""
+Online database backups.
+
+Snapshots are taken with the SQLite backup API a few pages at a time, so
+writers are only ever blocked for one step. The backup API writes a
+database file, so each snapshot lands in a scratch file inside
+``BACKUP_DIR`` and is then gzipped next to it; the directory needs free
+space for the uncompressed snapshot plus its compressed copy while a
+backup runs. Old snapshots are pruned by count and age. Only the
+``.db.gz`` files this module writes are listed and pruned; older
+uncompressed ``.db`` copies are left alone but can still be verified and
+restored by path. Usage from the BACKEND directory:
+
+    python backups.py create
+    python backups.py list
+    python backups.py verify <backup>
+    python backups.py restore <backup> --offline
+    python backups.py prune
+
+Restoring overwrites the live database, so stop the server first and pass
+``--offline`` to confirm.
+"""
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from db import DB_PATH, BACKUP_DIR, TABLE_SCHEMAS, get_connection, pools_open, file_lock
+
+# Backup configuration
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+BACKUP_STEP_SLEEP = float(os.getenv('BACKUP_STEP_SLEEP', '0.01'))  # seconds between steps
+BACKUP_INTERVAL = float(os.getenv('BACKUP_INTERVAL', str(24 * 3600)))  # seconds, 0 disables
+BACKUP_RETENTION = int(os.getenv('BACKUP_RETENTION', '14'))  # newest backups kept
+BACKUP_MAX_AGE_DAYS = float(os.getenv('BACKUP_MAX_AGE_DAYS', '90'))  # 0 keeps any age
+BACKUP_COMPRESSION_LEVEL = int(os.getenv('BACKUP_COMPRESSION_LEVEL', '6'))
+BACKUP_PREFIX = 'clcorgtz_backup_'
+# Held by the one process running scheduled backups
+BACKUP_LOCK_NAME = '.scheduler.lock'
+# How often the other processes check whether that one has exited
+BACKUP_LOCK_RETRY = float(os.getenv('BACKUP_LOCK_RETRY', '300'))  # seconds
+# Tables a snapshot must contain to be restored
+REQUIRED_TABLES = ('schema_versions', 'users')
+
+logger = logging.getLogger(__name__)
+
+class BackupError(Exception):
+    """Raised when a backup cannot be created, verified or restored"""
+
+def list_backups(backup_dir=BACKUP_DIR):
+    """Return the compressed backups made by ``create_backup``, oldest first"""
+    if not backup_dir.exists():
+        return []
+    # Names embed the timestamp, so they sort chronologically
+    return sorted(backup_dir.glob(f'{BACKUP_PREFIX}*.db.gz'))
+
+def _snapshot(target, pages=BACKUP_PAGES_PER_STEP, sleep=BACKUP_STEP_SLEEP):
+    """Copy the live database into ``target`` a few pages per step"""
+    source = get_connection()
+    dest = sqlite3.connect(str(target))
+    try:
+        source.backup(dest, pages=pages, sleep=sleep)
+    finally:
+        dest.close()
+        source.close()
+
+def create_backup(backup_dir=BACKUP_DIR):
+    """Take a compressed snapshot of the database and return its path"""
+    if not DB_PATH.exists():
+        raise BackupError(f"No database at {DB_PATH}")
+    backup_dir.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    backup_path = backup_dir / f'{BACKUP_PREFIX}{timestamp}.db.gz'
+    start = time.monotonic()
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+        snapshot = Path(tmp) / 'snapshot.db'
+        _snapshot(snapshot)
+        partial = Path(tmp) / backup_path.name
+        with open(snapshot, 'rb') as src, gzip.open(partial, 'wb', compresslevel=BACKUP_COMPRESSION_LEVEL) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        size = snapshot.stat().st_size
+        os.replace(partial, backup_path)
+
+    logger.info(f"Database backed up to {backup_path} "
+                f"({size} -> {backup_path.stat().st_size} bytes in {time.monotonic() - start:.2f}s)")
+    return backup_path
+
+def prune_backups(retention=BACKUP_RETENTION, max_age_days=BACKUP_MAX_AGE_DAYS, backup_dir=BACKUP_DIR):
+    """Delete backups beyond the newest ``retention`` or older than ``max_age_days``.
+
+    The newest backup is always kept. Returns the deleted paths.
+    """
+    backups = list_backups(backup_dir)
+    keep = set(backups[-max(retention, 1):])
+    cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+    removed = []
+    for path in backups[:-1]:
+        if path not in keep or (cutoff is not None and path.stat().st_mtime < cutoff):
+            path.unlink()
+            removed.append(path)
+    if removed:
+        logger.info(f"Pruned {len(removed)} old backups")
+    return removed
+
+def _extract(backup_path, target):
+    """Write the uncompressed database from a backup to ``target``"""
+    opener = gzip.open if backup_path.suffix == '.gz' else open
+    try:
+        with opener(backup_path, 'rb') as src, open(target, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    except (OSError, EOFError) as e:
+        # gzip raises these for truncated files and CRC mismatches
+        raise BackupError(f"Could not read {backup_path}: {e}")
+
+def _check_database(path):
+    conn = sqlite3.connect(str(path))
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        if result != 'ok':
+            raise BackupError(f"Integrity check failed: {result}")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"Not a valid database: {e}")
+    finally:
+        conn.close()
+    missing = [table for table in REQUIRED_TABLES if table not in tables]
+    if missing:
+        raise BackupError(f"Backup is missing tables: {', '.join(missing)}")
+    return len(tables & set(TABLE_SCHEMAS))
+
+def verify_backup(backup_path):
+    """Decompress a backup to a scratch file and check it; raise BackupError if bad"""
+    backup_path = Path(backup_path)
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = Path(tmp) / 'verify.db'
+        _extract(backup_path, snapshot)
+        return _check_database(snapshot)
+
+def restore_backup(backup_path, offline=False, pages=BACKUP_PAGES_PER_STEP):
+    """Verify a backup and copy it over the live database.
+
+    Pooled connections in a running server would keep serving cached
+    content and schema state from before the restore, so the server must be
+    stopped: callers confirm that with ``offline=True``, and the restore is
+    refused outright in a process that has opened the pools. A fresh backup
+    of the current database is taken first. The copy goes through the
+    backup API, so the WAL stays consistent.
+    """
+    if not offline:
+        raise BackupError("Restoring overwrites the live database; stop the server and confirm with --offline")
+    if pools_open():
+        raise BackupError("Cannot restore while this process is serving the database")
+    backup_path = Path(backup_path)
+    with tempfile.TemporaryDirectory(dir=DB_PATH.parent) as tmp:
+        snapshot = Path(tmp) / 'restore.db'
+        _extract(backup_path, snapshot)
+        _check_database(snapshot)
+
+        safety = create_backup() if DB_PATH.exists() else None
+        source = sqlite3.connect(str(snapshot))
+        dest = get_connection()
+        try:
+            source.backup(dest, pages=pages)
+        finally:
+            dest.close()
+            source.close()
+
+    _check_database(DB_PATH)
+    logger.info(f"Restored {DB_PATH} from {backup_path}")
+    return safety
+
+class BackupScheduler:
+    """Background task that takes a backup every ``interval`` seconds.
+
+    Every worker process starts one, but only the process holding a lock
+    file in ``BACKUP_DIR`` takes backups; the others check every
+    ``BACKUP_LOCK_RETRY`` seconds and take over if it exits. A backup is
+    taken straight away only when the newest one, from any process, is
+    already older than ``interval``. Each run prunes old backups afterwards.
+    Backups run on a plain worker thread rather than the DB executor, since
+    the stepped copy can take a while on a large database.
+    """
+
+    def __init__(self, interval=BACKUP_INTERVAL):
+        self.interval = interval
+        self._task = None
+        self._lock = threading.Lock()
+        self.active = False
+        self.runs = 0
+        self.failures = 0
+        self.last_backup = None
+
+    def _due_in(self):
+        backups = list_backups()
+        if not backups:
+            return 0
+        return max(0, backups[-1].stat().st_mtime + self.interval - time.time())
+
+    def _run(self):
+        path = create_backup()
+        prune_backups()
+        return path
+
+    async def run_once(self):
+        """Take and prune backups now, returning the new backup's path"""
+        path = await asyncio.to_thread(self._run)
+        with self._lock:
+            self.runs += 1
+            self.last_backup = str(path)
+        return path
+
+    async def _loop(self):
+        while True:
+            try:
+                BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+                with file_lock(BACKUP_DIR / BACKUP_LOCK_NAME, blocking=False) as held:
+                    if held:
+                        self.active = True
+                        try:
+                            await self._run_scheduled()
+                        finally:
+                            self.active = False
+            except OSError as e:
+                with self._lock:
+                    self.failures += 1
+                logger.error(f"Scheduled backups could not start: {str(e)}")
+            await asyncio.sleep(min(self.interval, BACKUP_LOCK_RETRY))
+
+    async def _run_scheduled(self):
+        await asyncio.sleep(self._due_in())
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                with self._lock:
+                    self.failures += 1
+                logger.error(f"Scheduled backup failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Schedule backups on the running event loop unless disabled"""
+        if self.interval <= 0:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Cancel the scheduler and wait for it to finish"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        """Return a snapshot of scheduler activity"""
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'active': self.active,
+                'runs': self.runs,
+                'failures': self.failures,
+                'last_backup': self.last_backup
+            }
+
+backup_scheduler = BackupScheduler()
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    command = argv[1] if len(argv) > 1 else 'create'
+    try:
+        if command == 'create':
+            create_backup()
+            prune_backups()
+        elif command == 'list':
+            for path in list_backups():
+                print(f"{path.name}  {path.stat().st_size} bytes")
+        elif command == 'verify' and len(argv) == 3:
+            tables = verify_backup(argv[2])
+            print(f"{argv[2]}: ok ({tables} tables)")
+        elif command == 'restore' and len(argv) in (3, 4) and argv[3:] in ([], ['--offline']):
+            safety = restore_backup(argv[2], offline=argv[3:] == ['--offline'])
+            if safety:
+                print(f"Previous database saved to {safety}")
+        elif command == 'prune':
+            prune_backups()
+        else:
+            print(__doc__)
+            return 2
+    except BackupError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,145 @@
+#!/bin/python3
+"""
+Token verification and login lookup at 1M token rows.
+
+Compares the former layout (full JWT text under a UNIQUE index, login by
+``username = ? OR email = ?``) with digest-keyed tokens and the case-folded
+``login_keys`` index. The digest side runs the real ``verify_token`` and
+``_get_login_user``; both sides also time the bare lookup query. Run from the
+BACKEND directory:
+
+    python benchmarks/bench_auth_lookup.py
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+TOKENS = 1_000_000
+USERS = 10_000
+LOOKUPS = 20_000
+BATCH = 50_000
+
+LEGACY_TOKENS = '''
+    CREATE TABLE tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        token TEXT NOT NULL UNIQUE,
+        expires_at TIMESTAMP NOT NULL,
+        is_valid INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+def issue_tokens():
+    """One real JWT per user for lookups, padded out with JWT-sized filler"""
+    import jwt
+    from auth.models import JWT_SECRET, JWT_ALGORITHM
+    expires_at = datetime.utcnow() + timedelta(hours=24)
+    live = [
+        jwt.encode({'user_id': user_id, 'role': 'user', 'exp': expires_at.timestamp(), 'iat': time.time()},
+                   JWT_SECRET, algorithm=JWT_ALGORITHM)
+        for user_id in range(1, USERS + 1)
+    ]
+    width = len(live[0])
+    rng = random.Random(1)
+    alphabet = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_.'
+    filler = (''.join(rng.choices(alphabet, k=width)) for _ in range(TOKENS - USERS))
+    return live, filler, expires_at.isoformat()
+
+def populate(conn, legacy, live, filler, expires_at):
+    import db
+    from auth.models import login_keys_for
+    from auth.session_cache import token_key
+
+    conn.execute(db.TABLE_SCHEMAS['users'])
+    conn.execute(LEGACY_TOKENS if legacy else db.TABLE_SCHEMAS['tokens'])
+    if not legacy:
+        conn.execute(db.TABLE_SCHEMAS['login_keys'])
+    conn.executemany(
+        "INSERT INTO users (id, username, email, password_hash, status) VALUES (?, ?, ?, 'x', 'active')",
+        [(i, f"user{i}", f"user{i}@example.com") for i in range(1, USERS + 1)]
+    )
+    if not legacy:
+        conn.executemany(
+            "INSERT INTO login_keys (login_key, user_id) VALUES (?, ?)",
+            [(key, i) for i in range(1, USERS + 1) for key in login_keys_for(f"user{i}", f"user{i}@example.com")]
+        )
+
+    column = 'token' if legacy else 'token_hash'
+    encode = (lambda token: token) if legacy else token_key
+    insert = f"INSERT INTO tokens (user_id, {column}, expires_at, is_valid) VALUES (?, ?, ?, ?)"
+    conn.executemany(insert, [(i + 1, encode(token), expires_at, 1) for i, token in enumerate(live)])
+    remaining = TOKENS - USERS
+    while remaining:
+        batch = [(random.randint(1, USERS), encode(next(filler)), expires_at, 0) for _ in range(min(BATCH, remaining))]
+        conn.executemany(insert, batch)
+        remaining -= len(batch)
+    conn.execute(f"CREATE INDEX idx_tokens_user_id ON tokens (user_id)")
+    conn.commit()
+
+def timed(label, func, args):
+    start = time.perf_counter()
+    for arg in args:
+        func(arg)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {elapsed / len(args) * 1e6:>8.1f} us/op")
+
+def main():
+    tmp = tempfile.mkdtemp()
+    print(f"Issuing {USERS} JWTs and {TOKENS - USERS} filler tokens...")
+    live, _, expires_at = issue_tokens()
+    rng = random.Random(2)
+    probe_tokens = [live[rng.randrange(USERS)] for _ in range(LOOKUPS)]
+    probe_logins = [rng.choice((f"user{i}", f"USER{i}@example.com")) for i in
+                    (rng.randint(1, USERS) for _ in range(LOOKUPS))]
+
+    for legacy in (True, False):
+        db_path = Path(tmp) / f"auth_{'legacy' if legacy else 'digest'}.db"
+        os.environ['DB_PATH'] = str(db_path)
+        for module in ('db', 'auth.models', 'auth.session_cache', 'auth.token_epochs'):
+            sys.modules.pop(module, None)
+        import db
+        db.DB_PATH = db_path
+
+        _, filler, _ = issue_tokens()
+        conn = sqlite3.connect(str(db_path))
+        populate(conn, legacy, live, filler, expires_at)
+        conn.close()
+        size = db_path.stat().st_size / 2 ** 20
+        print(f"{'legacy text tokens' if legacy else 'digest tokens + login_keys'}: {size:.0f} MiB")
+
+        from auth.models import verify_token, _get_login_user, login_key
+        from auth.session_cache import token_key
+        with db.read_connection() as conn:
+            now = datetime.utcnow().isoformat()
+            if legacy:
+                token_query = "SELECT user_id FROM tokens WHERE token = ? AND is_valid = 1 AND expires_at > ?"
+                timed("token lookup (query only)", lambda t: conn.execute(token_query, (t, now)).fetchone(), probe_tokens)
+                login_query = """
+                    SELECT id FROM users
+                    WHERE (username = ? OR email = ?) AND status = 'active'
+                """
+                # The old query was case-sensitive, so probe with the stored casing
+                exact = [value.lower() for value in probe_logins]
+                timed("login lookup (query only)", lambda v: conn.execute(login_query, (v, v)).fetchone(), exact)
+            else:
+                token_query = "SELECT user_id FROM tokens WHERE token_hash = ? AND is_valid = 1 AND expires_at > ?"
+                timed("token lookup (query only)", lambda t: conn.execute(token_query, (token_key(t), now)).fetchone(), probe_tokens)
+                timed("verify_token (jwt + join)", verify_token, probe_tokens)
+                login_query = """
+                    SELECT u.id FROM login_keys k JOIN users u ON u.id = k.user_id
+                    WHERE k.login_key = ? AND u.status = 'active'
+                """
+                timed("login lookup (query only)", lambda v: conn.execute(login_query, (login_key(v),)).fetchone(), probe_logins)
+                timed("_get_login_user", _get_login_user, probe_logins)
+        db.close_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/bin/python3
+"""
+Route throughput with sqlite called inline on the event loop vs on the DB executor.
+
+Drives the ASGI app in-process (one event loop, like a single uvicorn
+worker) with 1, 10 and 100 concurrent clients hammering ``GET /hero/all``,
+an uncached list route. A side probe times ``GET /status``, which touches no
+database, to show how long unrelated requests wait behind sqlite. Run from
+the BACKEND directory:
+
+    python benchmarks/bench_db_executor.py
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('DB_PATH', str(Path(tempfile.mkdtemp()) / 'bench.db'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import main
+import db
+import hero.routes
+
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+HEROES = 300
+OPTIONS_PER_HERO = 4
+DURATION = 3.0
+CONCURRENCY = (1, 10, 100)
+PROBE_INTERVAL = 0.01
+
+def seed():
+    with db.write_connection() as conn:
+        c = conn.cursor()
+        for i in range(HEROES):
+            c.execute("""
+                INSERT INTO hero (headline, subheadline, ctaText, userMessage, botResponse, userName, status)
+                VALUES (?, 's', 'c', 'u', 'b', 'n', 'active')
+            """, (f'headline {i}',))
+            hero_id = c.lastrowid
+            c.executemany(
+                "INSERT INTO hero_options (hero_id, text, icon) VALUES (?, ?, ?)",
+                [(hero_id, f'option {j}', 'icon') for j in range(OPTIONS_PER_HERO)]
+            )
+
+async def run_inline(func, *args, **kwargs):
+    """The previous behaviour: call the model function on the event loop"""
+    return func(*args, **kwargs)
+
+async def client_loop(client, deadline, latencies):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get('/hero/all')
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+async def probe(client, stop, samples):
+    """Issue GET /status every PROBE_INTERVAL, timing from when it was due"""
+    due = time.perf_counter()
+    while True:
+        await client.get('/status')
+        # Measuring from the due time includes any time the event loop was
+        # too busy to even start the request
+        samples.append((time.perf_counter() - due) * 1000)
+        if stop.is_set():
+            return
+        due = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+
+def p95(samples):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+async def measure(client, label, clients):
+    latencies, probes = [], []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(client, stop, probes))
+    deadline = time.perf_counter() + DURATION
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop(client, deadline, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+    print(f"{label:<9} clients={clients:<4} {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50={statistics.median(latencies):8.2f} ms p95={p95(latencies):8.2f} ms  "
+          f"/status n={len(probes):<4} p95={p95(probes):8.2f} ms max={max(probes):8.2f} ms")
+
+async def main_async():
+    seed()
+    transport = httpx.ASGITransport(app=main.app)
+    limits = httpx.Limits(max_connections=None)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', limits=limits) as client:
+        await client.get('/hero/all')
+        for clients in CONCURRENCY:
+            hero.routes.run_in_db = run_inline
+            await measure(client, 'inline', clients)
+            hero.routes.run_in_db = db.run_in_db
+            await measure(client, 'executor', clients)
+    db.shutdown_db_executor()
+    print(f"executor workers={db.DB_EXECUTOR_WORKERS}, read pool: {db.pool_stats()['read']}")
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
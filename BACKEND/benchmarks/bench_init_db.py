@@ -0,0 +1,57 @@
+#!/bin/python3
+"""
+Cold-start cost of ``db.init_db``.
+
+Each run starts a fresh interpreter, the way the desktop launcher and a
+container entrypoint do, and reports the time spent in ``init_db`` and the
+whole process wall time. Covers a brand-new database file and a restart
+against an already-initialized one. Run from the BACKEND directory:
+
+    python benchmarks/bench_init_db.py
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+RUNS = 10
+
+CHILD = """
+import contextlib, io, time
+import db
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    db.init_db()
+print((time.perf_counter() - start) * 1000)
+"""
+
+def launch(db_path):
+    env = dict(os.environ, DB_PATH=str(db_path))
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', CHILD], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1]), (time.perf_counter() - start) * 1000
+
+def report(label, samples):
+    init = [s[0] for s in samples]
+    wall = [s[1] for s in samples]
+    print(f"{label:<16} init_db p50={statistics.median(init):7.1f} ms max={max(init):7.1f} ms   "
+          f"process p50={statistics.median(wall):7.1f} ms")
+
+def main():
+    tmp = Path(tempfile.mkdtemp())
+    fresh = []
+    for i in range(RUNS):
+        fresh.append(launch(tmp / f"fresh_{i}.db"))
+    report("fresh database", fresh)
+
+    existing = tmp / "existing.db"
+    launch(existing)
+    report("restart", [launch(existing) for _ in range(RUNS)])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/bin/python3
+"""
+Encoding cost of the ``/webpages`` payload.
+
+Seeds a scratch database with long-form announcements, services and
+testimonials, builds the ``web_data`` document once, then times:
+
+- FastAPI's path for a returned dict: ``jsonable_encoder`` + ``json.dumps``
+- ``json.dumps`` alone, as snapshots used to encode
+- ``jsonable_encoder`` + orjson, a dict returned under ``FastJSONResponse``
+- orjson alone, as snapshots and ``FastJSONResponse`` now encode
+
+Run from the BACKEND directory:
+
+    python benchmarks/bench_json.py
+"""
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+ANNOUNCEMENTS = 200
+SERVICES = 20
+TESTIMONIALS = 100
+RUNS = 200
+
+WORDS = ('legal aid clinic court land registration advocate inheritance contract family '
+         'mining council training chatbot district rights employment dispute Tanzania').split()
+
+def text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def seed(db, rng):
+    with db.write_connection() as conn:
+        conn.executemany(
+            "INSERT INTO announcements (title, description, day, month, year, status) VALUES (?, ?, '05', 'MAY', '2025', 'active')",
+            [(text(rng, 12), text(rng, rng.randint(400, 1500))) for _ in range(ANNOUNCEMENTS)]
+        )
+        conn.executemany(
+            "INSERT INTO services (title, description, status) VALUES (?, ?, 'active')",
+            [(text(rng, 4), text(rng, 120)) for _ in range(SERVICES)]
+        )
+        conn.executemany(
+            "INSERT INTO offerings (service_id, text) VALUES (?, ?)",
+            [(rng.randint(1, SERVICES), text(rng, 10)) for _ in range(SERVICES * 5)]
+        )
+        conn.executemany(
+            "INSERT INTO testimonials (name, location, text, status) VALUES (?, 'Dar es Salaam', ?, 'active')",
+            [(text(rng, 2), text(rng, 80)) for _ in range(TESTIMONIALS)]
+        )
+        conn.commit()
+
+def stdlib_dumps(payload):
+    # What starlette's JSONResponse.render does
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def timed(label, func, payload):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        func(payload)
+        samples.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<34} p50={statistics.median(samples):7.3f} ms  min={min(samples):7.3f} ms")
+
+def main():
+    os.environ['DB_PATH'] = str(Path(tempfile.mkdtemp()) / 'json.db')
+    import db
+    from fastapi.encoders import jsonable_encoder
+    from responses import encode_json
+    from webpages.routes import build_web_data
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.init_db()
+        seed(db, random.Random(1))
+        payload = build_web_data()
+
+    body = encode_json(payload)
+    assert json.loads(body) == json.loads(stdlib_dumps(jsonable_encoder(payload)))
+    print(f"web_data payload: {len(body) / 1024:.0f} KiB")
+
+    timed("jsonable_encoder + json.dumps", lambda p: stdlib_dumps(jsonable_encoder(p)), payload)
+    timed("json.dumps", stdlib_dumps, payload)
+    timed("jsonable_encoder + orjson", lambda p: encode_json(jsonable_encoder(p)), payload)
+    timed("orjson", encode_json, payload)
+    db.close_pool()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/bin/python3
+"""
+Fan-out cost of ``/live`` with many idle clients.
+
+Starts the app under uvicorn in a separate process against a scratch
+database, opens ``connections`` idle WebSocket or SSE clients, then commits
+testimonials from another SQLite connection, the way a write on another
+worker would. For each transport it reports the server's resident memory
+per connection, its CPU use while the clients sit idle, and for every
+write the server CPU time spent fanning it out, how long it took to reach
+the first client and how much longer the last one. Clients run in this process, so on a small machine they compete
+with the server for CPU and the spread is an upper bound. Run from the
+BACKEND directory:
+
+    python benchmarks/bench_live.py [connections]
+
+Each side needs a file descriptor per connection; raise ``ulimit -n`` first
+for large runs.
+"""
+import asyncio
+import os
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import websockets
+
+BACKEND = Path(__file__).resolve().parent.parent
+PORT = 8766
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+CONNECT_BATCH = 250
+WRITES = 10
+IDLE_SECONDS = 5
+
+def rss_kib(pid):
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+def cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def start_server(db_path):
+    env = dict(os.environ, DB_PATH=str(db_path), BACKUP_INTERVAL='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(PORT), '--log-level', 'error',
+         '--backlog', '4096', '--ws-per-message-deflate', 'false'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            with socket_connection():
+                return server
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+class socket_connection:
+    def __enter__(self):
+        import socket
+        self.sock = socket.create_connection(('127.0.0.1', PORT), timeout=1)
+        return self.sock
+
+    def __exit__(self, *exc):
+        self.sock.close()
+
+class Clients:
+    """Records when each client sees each testimonials version"""
+
+    def __init__(self):
+        self.received = {}
+        self.ready = 0
+
+    def seen(self, version):
+        self.received.setdefault(version, []).append(time.perf_counter())
+
+    async def sse(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', PORT)
+        writer.write(b'GET /live/events HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+        await writer.drain()
+        await reader.readuntil(b'\r\n\r\n')
+        self.ready += 1
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            if line.startswith(b'data: {"section":"testimonials"'):
+                self.seen(int(line.rsplit(b':', 1)[1].rstrip(b'}\n')))
+
+    async def ws(self):
+        async with websockets.connect(f'ws://127.0.0.1:{PORT}/live', ping_interval=None,
+                                      max_queue=None) as socket:
+            self.ready += 1
+            async for message in socket:
+                if message.startswith('{"section":"testimonials"'):
+                    self.seen(int(message.rsplit(':', 1)[1].rstrip('}')))
+
+async def run(transport, db_path):
+    server = start_server(db_path)
+    try:
+        base_rss = rss_kib(server.pid)
+        clients = Clients()
+        connect = getattr(clients, transport)
+        tasks = []
+        for start in range(0, CONNECTIONS, CONNECT_BATCH):
+            tasks += [asyncio.create_task(connect()) for _ in range(min(CONNECT_BATCH, CONNECTIONS - start))]
+            while clients.ready < len(tasks):
+                await asyncio.sleep(0.01)
+        # Let the initial events drain before measuring
+        await asyncio.sleep(1)
+        rss = rss_kib(server.pid)
+
+        cpu = cpu_seconds(server.pid)
+        await asyncio.sleep(IDLE_SECONDS)
+        idle_cpu = (cpu_seconds(server.pid) - cpu) / IDLE_SECONDS * 100
+
+        db = sqlite3.connect(str(db_path))
+        first, last = [], []
+        cpu = cpu_seconds(server.pid)
+        start = time.perf_counter()
+        for version in range(1, WRITES + 1):
+            db.execute("INSERT INTO testimonials (name, text, status) VALUES ('bench', 'bench', 'active')")
+            db.commit()
+            committed = time.perf_counter()
+            while len(clients.received.get(version, ())) < CONNECTIONS:
+                await asyncio.sleep(0.005)
+            times = clients.received[version]
+            first.append((min(times) - committed) * 1000)
+            last.append((max(times) - committed) * 1000)
+        # CPU the server spent per write, net of what it uses while idle
+        busy_cpu = cpu_seconds(server.pid) - cpu - idle_cpu / 100 * (time.perf_counter() - start)
+        db.close()
+
+        print(f"{transport.upper():<4} {CONNECTIONS} clients  rss +{(rss - base_rss) / 1024:.0f} MiB "
+              f"({(rss - base_rss) / CONNECTIONS:.1f} KiB/conn)  idle cpu {idle_cpu:.1f}%  "
+              f"server cpu per write {busy_cpu / WRITES * 1000:.0f} ms")
+        spread = [b - a for a, b in zip(first, last)]
+        print(f"     commit -> first client p50={statistics.median(first):6.1f} ms  "
+              f"first -> last client p50={statistics.median(spread):6.1f} ms max={max(spread):6.1f} ms")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    tmp = Path(tempfile.mkdtemp())
+    for transport in ('ws', 'sse'):
+        asyncio.run(run(transport, tmp / f'live_{transport}.db'))
+
+if __name__ == '__main__':
+    main()
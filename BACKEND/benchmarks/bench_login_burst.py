@@ -0,0 +1,85 @@
+#!/bin/python3
+"""
+Public GET latency while a burst of logins is in flight.
+
+Drives the ASGI app in-process (one event loop, like a single uvicorn
+worker) and samples ``GET /hero`` latency in three phases: idle, during a
+login burst with bcrypt run inline on the event loop (the previous
+behaviour), and during the same burst with bcrypt on the worker pool.
+Run from the BACKEND directory:
+
+    python benchmarks/bench_login_burst.py
+"""
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault('DB_PATH', str(Path(tempfile.mkdtemp()) / 'bench.db'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+import main
+import auth.models
+
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+LOGINS = 40
+SAMPLE_INTERVAL = 0.005
+
+async def sample_latency(client, stop):
+    """Issue GET /hero every SAMPLE_INTERVAL, timing from when it was due"""
+    samples = []
+    due = time.perf_counter()
+    while True:
+        await client.get('/hero')
+        # Measuring from the due time includes any time the event loop was
+        # too busy to even start the request
+        samples.append((time.perf_counter() - due) * 1000)
+        if stop.is_set():
+            return samples
+        due = time.perf_counter() + SAMPLE_INTERVAL
+        await asyncio.sleep(SAMPLE_INTERVAL)
+
+async def login(client):
+    await client.post('/auth/login', json={'username_or_email': 'admin', 'password': 'admin'})
+
+async def phase(client, label, burst):
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_latency(client, stop))
+    start = time.perf_counter()
+    if burst:
+        await asyncio.gather(*(login(client) for _ in range(LOGINS)))
+    else:
+        await asyncio.sleep(1)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    samples = await sampler
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{label:<22} GET /hero samples={len(samples):<4} p50={statistics.median(samples):7.2f} ms "
+          f"p95={p95:7.2f} ms max={samples[-1]:7.2f} ms  phase={elapsed:.2f}s")
+
+async def main_async():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        await client.get('/hero')
+        await phase(client, 'idle', burst=False)
+
+        pooled = auth.models.verify_password_async
+
+        async def inline(plain_password, hashed_password):
+            return auth.models.verify_password(plain_password, hashed_password)
+
+        auth.models.verify_password_async = inline
+        await phase(client, 'logins, bcrypt inline', burst=True)
+        auth.models.verify_password_async = pooled
+        await phase(client, 'logins, bcrypt pool', burst=True)
+        print(f"bcrypt pool: {main.password_pool.stats()}")
+
+if __name__ == '__main__':
+    asyncio.run(main_async())
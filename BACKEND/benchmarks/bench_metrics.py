@@ -0,0 +1,111 @@
+#!/bin/python3
+"""
+Per-request cost of metrics recording.
+
+Drives a bare ASGI app directly, without a server, with and without
+``MetricsMiddleware`` in front of it, then times ``run_in_db`` with and
+without a request in progress, and a fetched point query on a plain
+connection against one from the instrumented pool inside a DB call. Each
+difference is what the metrics add to every request, DB call or
+statement. Run from the BACKEND directory:
+
+    python benchmarks/bench_metrics.py
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+REQUESTS = 50000
+DB_CALLS = 5000
+QUERIES = 50000
+ROUNDS = 5
+
+class Route:
+    path = '/bench/{item_id}'
+
+async def bare_app(scope, receive, send):
+    scope['route'] = Route
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'ok'})
+
+async def receive():
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+async def send(message):
+    pass
+
+async def time_requests(app):
+    scope = {'type': 'http', 'method': 'GET', 'path': '/bench/1'}
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / REQUESTS * 1e6
+
+async def time_db_calls(run_in_db, func):
+    start = time.perf_counter()
+    for _ in range(DB_CALLS):
+        await run_in_db(func)
+    return (time.perf_counter() - start) / DB_CALLS * 1e6
+
+def time_queries(conn):
+    start = time.perf_counter()
+    for i in range(QUERIES):
+        conn.execute("SELECT id FROM services WHERE id = ?", (i % 10,)).fetchone()
+    return (time.perf_counter() - start) / QUERIES * 1e6
+
+def report(label, plain, measured):
+    base, cost = statistics.median(plain), statistics.median(measured)
+    print(f"  {label:<28} plain p50={base:7.2f} us  instrumented p50={cost:7.2f} us  (+{cost - base:5.2f} us)")
+
+async def run():
+    import db
+    import metrics
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.init_db()
+    middleware = metrics.MetricsMiddleware(bare_app)
+    plain, measured = [], []
+    for _ in range(ROUNDS):
+        plain.append(await time_requests(bare_app))
+        measured.append(await time_requests(middleware))
+    report('request', plain, measured)
+
+    def query():
+        with db.read_connection() as conn:
+            conn.execute("SELECT 1").fetchone()
+
+    plain, measured = [], []
+    for _ in range(ROUNDS):
+        plain.append(await time_db_calls(db.run_in_db, query))
+        token = metrics._request.set(metrics.RequestStats())
+        measured.append(await time_db_calls(db.run_in_db, query))
+        metrics._request.reset(token)
+    report('run_in_db call', plain, measured)
+
+    raw = db.apply_pragmas(sqlite3.connect(str(db.DB_PATH)))
+    with db.read_connection() as pooled:
+        plain = [time_queries(raw) for _ in range(ROUNDS)]
+        # As inside run_in_db, so each statement is also added to the call's totals
+        token = metrics._db_call.set(metrics.DbCall())
+        measured = [time_queries(pooled) for _ in range(ROUNDS)]
+        metrics._db_call.reset(token)
+    report('statement', plain, measured)
+    raw.close()
+    db.shutdown_db_executor()
+    db.close_pool()
+
+def main():
+    os.environ['DB_PATH'] = str(Path(tempfile.mkdtemp()) / 'metrics.db')
+    asyncio.run(run())
+
+if __name__ == '__main__':
+    main()
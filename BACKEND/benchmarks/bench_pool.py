@@ -0,0 +1,70 @@
+#!/bin/python3
+"""
+Connection-setup overhead: fresh ``sqlite3.connect`` per call vs ``db.ConnectionPool``.
+
+Each worker thread runs the same small read (the shape of ``get_hero``) many
+times. Run from the BACKEND directory:
+
+    python benchmarks/bench_pool.py
+"""
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import db
+
+OPS_PER_WORKER = 2000
+CONCURRENCY = (1, 8, 32)
+
+def prepare(db_path):
+    conn = sqlite3.connect(str(db_path))
+    conn.execute(db.TABLE_SCHEMAS['hero'])
+    conn.execute("""
+        INSERT INTO hero (headline, subheadline, ctaText, userMessage, botResponse, userName, status)
+        VALUES ('h', 's', 'c', 'u', 'b', 'n', 'active')
+    """)
+    conn.commit()
+    conn.close()
+
+def query(conn):
+    conn.execute("SELECT * FROM hero WHERE status = 'active' ORDER BY id DESC LIMIT 1").fetchone()
+
+def fresh_worker(db_path):
+    for _ in range(OPS_PER_WORKER):
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("PRAGMA foreign_keys = ON")
+        query(conn)
+        conn.close()
+
+def pooled_worker(pool):
+    for _ in range(OPS_PER_WORKER):
+        with pool.connection() as conn:
+            query(conn)
+
+def run(label, worker, arg, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker, arg) for _ in range(workers)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    ops = OPS_PER_WORKER * workers
+    print(f"{label:<8} workers={workers:<3} ops={ops:<6} {ops / elapsed:>10.0f} ops/s  {elapsed / ops * 1e6:>8.1f} us/op")
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / 'bench.db'
+        prepare(db_path)
+        for workers in CONCURRENCY:
+            run('fresh', fresh_worker, db_path, workers)
+            pool = db.ConnectionPool(db_path, max_size=db.POOL_SIZE)
+            run('pooled', pooled_worker, pool, workers)
+            print(f"         pool stats: {pool.stats()}")
+            pool.close()
+
+if __name__ == '__main__':
+    main()
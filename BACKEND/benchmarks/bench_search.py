@@ -0,0 +1,99 @@
+#!/bin/python3
+"""
+Full-text search latency on a synthetic 100k-document corpus.
+
+Builds a fresh database through ``db.init_db``, loads announcements,
+services, offerings and testimonials through the normal tables so the
+triggers fill ``search_index``, then times ``search.models.search`` for
+common, rare, multi-word, prefix and type-filtered queries. Run from the
+BACKEND directory:
+
+    python benchmarks/bench_search.py
+"""
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DOCUMENTS = 100_000
+QUERIES = 200
+BATCH = 10_000
+
+COMMON = ['legal', 'court', 'land', 'contract', 'family', 'rights', 'registration', 'advocate',
+          'employment', 'inheritance', 'mining', 'license', 'dispute', 'council', 'training']
+# Pseudo-words, so prefixes of rare words are about as selective as real ones
+_letters = random.Random(0)
+RARE = sorted({''.join(_letters.choices('abcdefghijklmnopqrstuvwxyz', k=_letters.randint(5, 10)))
+               for _ in range(5_000)})
+
+def words(rng, count):
+    """Mostly common words with a long tail of rare ones"""
+    return ' '.join(rng.choice(COMMON) if rng.random() < 0.3 else rng.choice(RARE) for _ in range(count))
+
+def populate(db, rng):
+    # Split roughly like the real site: articles dominate
+    counts = {'announcements': 60_000, 'services': 5_000, 'offerings': 20_000, 'testimonials': 15_000}
+    assert sum(counts.values()) == DOCUMENTS
+    with db.write_connection() as conn:
+        c = conn.cursor()
+        for start in range(0, counts['announcements'], BATCH):
+            c.executemany(
+                "INSERT INTO announcements (title, description, day, month, year, status) VALUES (?, ?, '01', 'MAY', '2025', 'active')",
+                [(words(rng, 8), words(rng, rng.randint(150, 600))) for _ in range(min(BATCH, counts['announcements'] - start))]
+            )
+            conn.commit()
+        c.executemany(
+            "INSERT INTO services (title, description, status) VALUES (?, ?, 'active')",
+            [(words(rng, 4), words(rng, 80)) for _ in range(counts['services'])]
+        )
+        c.executemany(
+            "INSERT INTO offerings (service_id, text) VALUES (?, ?)",
+            [(rng.randint(1, counts['services']), words(rng, 12)) for _ in range(counts['offerings'])]
+        )
+        c.executemany(
+            "INSERT INTO testimonials (name, location, text, status) VALUES (?, 'Dar es Salaam', ?, 'active')",
+            [(words(rng, 2), words(rng, 60)) for _ in range(counts['testimonials'])]
+        )
+        conn.commit()
+
+def timed(label, search, queries, **kwargs):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query, **kwargs)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f"  {label:<28} p50={statistics.median(samples):7.2f} ms  "
+          f"p95={samples[int(len(samples) * 0.95)]:7.2f} ms  max={samples[-1]:7.2f} ms")
+
+def main():
+    db_path = Path(tempfile.mkdtemp()) / 'search.db'
+    os.environ['DB_PATH'] = str(db_path)
+    import db
+    from search.models import search
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.init_db()
+
+    rng = random.Random(1)
+    start = time.perf_counter()
+    populate(db, rng)
+    print(f"Indexed {DOCUMENTS} documents in {time.perf_counter() - start:.1f}s "
+          f"({db_path.stat().st_size / 2 ** 20:.0f} MiB database)")
+
+    timed("common word", search, [rng.choice(COMMON) for _ in range(QUERIES)])
+    timed("rare word", search, [rng.choice(RARE) for _ in range(QUERIES)])
+    timed("two words", search, [f"{rng.choice(COMMON)} {rng.choice(RARE)}" for _ in range(QUERIES)])
+    timed("prefix (3 chars)", search, [rng.choice(COMMON)[:3] + '*' for _ in range(QUERIES)])
+    timed("prefix (rare, 4 chars)", search, [rng.choice(RARE)[:4] + '*' for _ in range(QUERIES)])
+    timed("rare word, services only", search, [rng.choice(RARE) for _ in range(QUERIES)], types=['service'])
+    db.close_pool()
+
+if __name__ == '__main__':
+    main()
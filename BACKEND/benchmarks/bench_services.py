@@ -0,0 +1,91 @@
+#!/bin/python3
+"""
+Query count and latency of ``service.models.get_all_services``.
+
+Compares the former one-query-per-service loop with the batched fetch at
+10, 1k and 10k active services (3 offerings each). Run from the BACKEND
+directory:
+
+    python benchmarks/bench_services.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+SIZES = (10, 1000, 10000)
+OFFERINGS_PER_SERVICE = 3
+REPEAT = 5
+
+def n_plus_one():
+    """The pre-batching implementation, kept here for comparison"""
+    import db
+    with db.read_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT * FROM services WHERE status = 'active'")
+        packages = []
+        for service in c.fetchall():
+            c.execute("SELECT id, text FROM offerings WHERE service_id=?", (service[0],))
+            packages.append({"id": service[0], "offerings": [{"id": r[0], "text": r[1]} for r in c.fetchall()]})
+        return packages
+
+def populate(db_path, size, with_index):
+    import db
+    conn = sqlite3.connect(str(db_path))
+    conn.execute(db.TABLE_SCHEMAS['services'])
+    conn.execute(db.TABLE_SCHEMAS['offerings'])
+    if with_index:
+        conn.execute(db.INDEX_SCHEMAS['idx_offerings_service_id'])
+    for i in range(size):
+        cur = conn.execute(
+            "INSERT INTO services (title, description, status) VALUES (?, ?, 'active')",
+            (f"Service {i}", "description " * 20)
+        )
+        conn.executemany(
+            "INSERT INTO offerings (service_id, text) VALUES (?, ?)",
+            [(cur.lastrowid, f"Offering {j}") for j in range(OFFERINGS_PER_SERVICE)]
+        )
+    conn.commit()
+    conn.close()
+
+def measure(func):
+    import db
+    statements = []
+    # Holding the connection makes the nested read_connection() calls reuse it
+    with db.read_connection() as conn:
+        conn.set_trace_callback(statements.append)
+        func()
+        queries = len(statements)
+        conn.set_trace_callback(None)
+
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            func()
+        elapsed = (time.perf_counter() - start) / REPEAT
+    return queries, elapsed
+
+def main():
+    tmp = tempfile.mkdtemp()
+    for size in SIZES:
+        for with_index in (False, True):
+            db_path = Path(tmp) / f"services_{size}_{int(with_index)}.db"
+            os.environ['DB_PATH'] = str(db_path)
+            for module in ('db', 'service.models'):
+                sys.modules.pop(module, None)
+            import db
+            db.DB_PATH = db_path
+            populate(db_path, size, with_index)
+            from service.models import get_all_services
+
+            index = "indexed" if with_index else "no index"
+            for label, func in (('n+1', n_plus_one), ('batched', get_all_services)):
+                queries, elapsed = measure(func)
+                print(f"services={size:<6} {index:<9} {label:<8} queries={queries:<6} {elapsed * 1000:>9.2f} ms")
+            db.close_pool()
+
+if __name__ == '__main__':
+    main()
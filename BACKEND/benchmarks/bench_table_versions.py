@@ -0,0 +1,78 @@
+#!/bin/python3
+"""
+Cost of cross-worker change detection.
+
+Times ``table_versions.check`` when nothing has committed (the
+``PRAGMA data_version`` probe every cached request pays) and right after a
+commit from another connection (probe plus registry reload), and the extra
+time the ``versions_*`` triggers add to a batch of inserts. Run from the
+BACKEND directory:
+
+    python benchmarks/bench_table_versions.py
+"""
+import contextlib
+import io
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+PROBES = 100000
+RELOADS = 2000
+INSERTS = 5000
+
+def report(label, samples, unit='us'):
+    print(f"  {label:<38} p50={statistics.median(samples):8.2f} {unit}  max={max(samples):8.2f} {unit}")
+
+def main():
+    os.environ['DB_PATH'] = str(Path(tempfile.mkdtemp()) / 'versions.db')
+    import db
+    from table_versions import TableVersions
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        db.init_db()
+    watcher = TableVersions(db.DB_PATH)
+    other = db.apply_pragmas(sqlite3.connect(str(db.DB_PATH)))
+    watcher.check()
+
+    samples = []
+    for _ in range(PROBES):
+        start = time.perf_counter()
+        watcher.check()
+        samples.append((time.perf_counter() - start) * 1e6)
+    report("check, nothing committed", samples)
+
+    samples = []
+    for i in range(RELOADS):
+        other.execute("INSERT INTO table_versions (table_name, version) VALUES ('testimonials', ?) "
+                      "ON CONFLICT (table_name) DO UPDATE SET version = excluded.version", (i,))
+        other.commit()
+        start = time.perf_counter()
+        watcher.check()
+        samples.append((time.perf_counter() - start) * 1e6)
+    report("check after a foreign commit", samples)
+
+    rows = [('name', 'Dar es Salaam', 'text', 'active')] * INSERTS
+    for label, drop in (("insert batch with triggers", False), ("insert batch without triggers", True)):
+        if drop:
+            for event in ('insert', 'update', 'delete'):
+                other.execute(f"DROP TRIGGER versions_testimonials_{event}")
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            other.executemany("INSERT INTO testimonials (name, location, text, status) VALUES (?, ?, ?, ?)", rows)
+            other.commit()
+            samples.append((time.perf_counter() - start) * 1000)
+        report(f"{label} ({INSERTS})", samples, 'ms')
+
+    watcher.close()
+    other.close()
+    db.close_pool()
+
+if __name__ == '__main__':
+    main()
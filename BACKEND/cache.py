@@ -0,0 +1,217 @@
+import os
+import asyncio
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from db import run_in_db
+from responses import encode_json
+from compression import compress, negotiate_encoding
+from table_versions import table_versions
+
+# Cache-Control sent with every public content response. The default makes
+# browsers revalidate each time, which is cheap now that unchanged content
+# answers with an empty 304.
+CONTENT_CACHE_CONTROL = os.getenv('CONTENT_CACHE_CONTROL', 'no-cache')
+
+# Content sections that write routes report changes for, and the tables each
+# one is read from
+SECTION_TABLES = {
+    'hero': ('hero', 'hero_options'),
+    'services': ('services', 'offerings'),
+    'testimonials': ('testimonials',),
+    'announcements': ('announcements',),
+    'how': ('how', 'how_steps'),
+    'company': ('about_us', 'contact_us', 'contact_items', 'useful_links', 'useful_link_items', 'social_links'),
+    'users': ('users',),
+}
+SECTIONS = tuple(SECTION_TABLES)
+
+# ``variants`` holds the compressed copies of ``body`` made so far, by
+# encoding. ``changed_at`` is the Unix time of the last write to the
+# snapshot's tables, or None if none was recorded. ``status`` is 404 when the
+# builder found nothing, and ``body`` is then the error detail.
+SnapshotEntry = namedtuple('SnapshotEntry', ['versions', 'body', 'etag', 'changed_at', 'variants', 'status'])
+
+def bump_version(*sections):
+    """Mark one or more sections as changed by a write that just committed.
+
+    Triggers already count every write in ``table_versions`` and any commit
+    is seen by the next probe. This drops the stored payload of every
+    snapshot built from one of ``sections``, so its next request rebuilds
+    without waiting for that probe, and has the registry re-read. Snapshots
+    of other sections are left alone.
+    """
+    unknown = set(sections) - SECTION_TABLES.keys()
+    if unknown:
+        raise ValueError(f"Unknown sections: {', '.join(sorted(unknown))}")
+    for snapshot in SNAPSHOTS:
+        if not snapshot.sections_set.isdisjoint(sections):
+            snapshot.invalidate()
+    table_versions.invalidate()
+
+def get_versions(sections):
+    """Return the current version tuple for the tables behind the given sections"""
+    return table_versions.get([table for section in sections for table in SECTION_TABLES[section]])
+
+# Every Snapshot created, for the /metrics endpoint
+SNAPSHOTS = []
+
+class Snapshot:
+    """A JSON payload built from one or more sections and kept as bytes.
+
+    The builder only runs again after one of the tables behind ``sections``
+    has been written, by this worker or any other; every other call returns
+    the same pre-encoded body along with its ETag and Last-Modified values.
+    Compressed variants are made the first time a client asks for them and
+    kept until the next rebuild. With ``not_found`` set, a builder returning
+    None is stored as a 404 with that detail, so a missing document is not
+    looked up again on every request either.
+    """
+
+    def __init__(self, sections, builder, not_found=None):
+        self.sections = tuple(sections)
+        self.sections_set = frozenset(self.sections)
+        self.tables = tuple(table for section in self.sections for table in SECTION_TABLES[section])
+        self.builder = builder
+        self.not_found = not_found
+        self.name = builder.__name__
+        self._lock = threading.Lock()
+        self._compress_lock = threading.Lock()
+        self._entry = None
+        # Requests served from the stored entry; only counted on the event loop
+        self.hits = 0
+        self.rebuilds = 0
+        SNAPSHOTS.append(self)
+
+    def current(self):
+        """Return the stored entry if none of its sections changed, else None"""
+        entry = self._entry
+        if entry is not None and entry.versions == table_versions.get(self.tables):
+            return entry
+        return None
+
+    def get(self):
+        """Return the current ``SnapshotEntry``, rebuilding it if a section changed"""
+        entry = self.current()
+        if entry is not None:
+            return entry
+
+        with self._lock:
+            versions = table_versions.get(self.tables)
+            entry = self._entry
+            if entry is not None and entry.versions == versions:
+                return entry
+            # Versions are read before building, so a write that lands while
+            # the builder runs leaves this snapshot stale and forces a rebuild.
+            data = self.builder()
+            status = 200
+            if data is None and self.not_found is not None:
+                data, status = {'detail': self.not_found}, 404
+            body = encode_json(data)
+            etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+            # Read after the versions, so it is never older than the content
+            changed_at = table_versions.changed_at(self.tables)
+            self._entry = SnapshotEntry(versions, body, etag, changed_at, {}, status)
+            self.rebuilds += 1
+            return self._entry
+
+    def variant(self, entry, encoding):
+        """Return ``entry``'s body compressed with ``encoding``, compressing it only once"""
+        body = entry.variants.get(encoding)
+        if body is None:
+            with self._compress_lock:
+                body = entry.variants.get(encoding)
+                if body is None:
+                    body = compress(entry.body, encoding)
+                    entry.variants[encoding] = body
+        return body
+
+    def invalidate(self):
+        """Drop the stored payload so the next call rebuilds it"""
+        # No lock: this runs on the event loop and _lock is held while the
+        # builder runs. A build in flight keys its entry on versions read
+        # before the write, so it is rebuilt again on the next call anyway.
+        self._entry = None
+
+    def stats(self):
+        """Return how often the snapshot was served as is and rebuilt"""
+        # No lock: _lock is held while the builder runs
+        return {'hits': self.hits, 'rebuilds': self.rebuilds}
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def _not_modified_since(if_modified_since, modified):
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return modified <= since
+
+async def snapshot_response(request: Request, snapshot: Snapshot):
+    """Serve a snapshot, answering conditional requests with 304 Not Modified.
+
+    The body is sent brotli or gzip compressed when the client accepts it and
+    it is large enough. Each encoding is a separate representation with its
+    own ETag.
+
+    Last-Modified is the time of the last write to the snapshot's tables. It
+    has one-second resolution, so it is only sent, and If-Modified-Since
+    only honoured, once the clock has moved past the second of that write;
+    until then a later write in the same second could not be told apart.
+    The ETag always works.
+    """
+    entry = snapshot.current()
+    if entry is None:
+        # Rebuilding queries the database, so do it off the event loop
+        entry = await run_in_db(snapshot.get)
+    else:
+        snapshot.hits += 1
+    if entry.status != 200:
+        return Response(content=entry.body, status_code=entry.status, media_type="application/json",
+                        headers={'Cache-Control': CONTENT_CACHE_CONTROL})
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'), len(entry.body))
+    etag = entry.etag if encoding is None else f'{entry.etag[:-1]}-{encoding}"'
+    headers = {
+        'ETag': etag,
+        'Cache-Control': CONTENT_CACHE_CONTROL,
+        'Vary': 'Accept-Encoding',
+    }
+    modified = None
+    if entry.changed_at is not None and int(entry.changed_at) < int(time.time()):
+        modified = datetime.fromtimestamp(int(entry.changed_at), timezone.utc)
+        headers['Last-Modified'] = format_datetime(modified, usegmt=True)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get('if-modified-since')
+        not_modified = bool(if_modified_since and modified and _not_modified_since(if_modified_since, modified))
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    body = entry.variants.get(encoding)
+    if body is None:
+        # Compressing a large document takes a while; keep it off the event loop
+        body = await asyncio.to_thread(snapshot.variant, entry, encoding)
+    headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from db import run_in_db
+from .models import compact_change_log, CHANGE_LOG_TOMBSTONE_DAYS
+
+# Change log compaction configuration
+CHANGE_LOG_COMPACT_INTERVAL = float(os.getenv('CHANGE_LOG_COMPACT_INTERVAL', '3600'))  # seconds
+CHANGE_LOG_BATCH_SIZE = int(os.getenv('CHANGE_LOG_BATCH_SIZE', '1000'))
+
+logger = logging.getLogger(__name__)
+
+class ChangeLogCompactor:
+    """Background task that compacts the change log.
+
+    Runs once on start and then every ``interval`` seconds on the DB executor,
+    dropping superseded entries ``batch_size`` at a time and delete entries
+    older than ``tombstone_days``. Totals are kept for ``stats()``.
+    """
+
+    def __init__(self, interval=CHANGE_LOG_COMPACT_INTERVAL, tombstone_days=CHANGE_LOG_TOMBSTONE_DAYS,
+                 batch_size=CHANGE_LOG_BATCH_SIZE):
+        self.interval = interval
+        self.tombstone_days = tombstone_days
+        self.batch_size = batch_size
+        self._task = None
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.superseded = 0
+        self.expired = 0
+        self.last_run_at = None
+
+    async def run_once(self):
+        """Compact the change log now and return (superseded, expired)"""
+        superseded, expired = await run_in_db(compact_change_log, self.tombstone_days, self.batch_size)
+        with self._lock:
+            self.runs += 1
+            self.superseded += superseded
+            self.expired += expired
+            self.last_run_at = time.time()
+        logger.info(f"Change log compaction removed {superseded} superseded and {expired} expired entries")
+        return superseded, expired
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Change log compaction failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Schedule compaction on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Cancel compaction and wait for it to finish"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        """Return a snapshot of compaction activity"""
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'runs': self.runs,
+                'superseded': self.superseded,
+                'expired': self.expired,
+                'last_run_at': self.last_run_at
+            }
+
+change_log_compactor = ChangeLogCompactor()
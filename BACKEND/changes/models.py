@@ -0,0 +1,148 @@
+import os
+from collections import defaultdict
+from db import read_connection, write_connection, CHANGE_SOURCES
+
+# Change feed configuration
+CHANGES_PAGE_SIZE = int(os.getenv('CHANGES_PAGE_SIZE', '500'))
+CHANGES_MAX_PAGE_SIZE = int(os.getenv('CHANGES_MAX_PAGE_SIZE', '5000'))
+CHANGE_LOG_TOMBSTONE_DAYS = float(os.getenv('CHANGE_LOG_TOMBSTONE_DAYS', '30'))  # 0 keeps deletes forever
+
+_SOURCES = {source.table: source for source in CHANGE_SOURCES}
+_PUBLIC_TABLES = tuple(source.table for source in CHANGE_SOURCES if source.public)
+
+def _head_version(c):
+    """Newest version ever handed out, including compacted ones"""
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+    row = c.fetchone()
+    return row[0] if row else 0
+
+def _floor_version(c):
+    """Clients that synced before this version may have missed a delete"""
+    c.execute("SELECT COALESCE(MAX(through_version), 0) FROM change_log_compactions")
+    return c.fetchone()[0]
+
+def _load_rows(c, source, ids):
+    """Map id -> (row, visible) for the rows of ``source`` that still exist"""
+    columns = ', '.join(f"t.{name}" for name in source.columns) if source.columns else "t.*"
+    parent_status = (f"(SELECT status FROM {source.parent} WHERE id = t.{source.parent_key})"
+                     if source.parent else "'active'")
+    placeholders = ', '.join('?' * len(ids))
+    c.execute(f"SELECT {columns}, {parent_status} FROM {source.table} t WHERE t.id IN ({placeholders})", ids)
+    names = [column[0] for column in c.description[:-1]]
+    rows = {}
+    for values in c.fetchall():
+        row = dict(zip(names, values[:-1]))
+        visible = row.get('status', 'active') == 'active' and values[-1] == 'active'
+        rows[row['id']] = (row, visible)
+    return rows
+
+def get_changes(since=None, limit=CHANGES_PAGE_SIZE, include_private=False):
+    """Return the rows changed after version ``since``, oldest change first.
+
+    Each change names the section, table and row id and carries the row as it
+    is now, so a row written several times is listed once. Rows that were
+    deleted, or that the public can no longer see, come back as ``delete``
+    with no data; ``include_private`` shows admins every row, users included.
+    ``version`` is the value to pass as ``since`` next time and ``more`` says
+    whether another page is waiting. ``reset`` means the client has no
+    usable starting point and has to re-download full documents first.
+    """
+    tables = None if include_private else _PUBLIC_TABLES
+    with read_connection() as conn:
+        c = conn.cursor()
+        # One snapshot, so compaction cannot drop entries between the reads
+        c.execute("BEGIN")
+        try:
+            head = _head_version(c)
+            if since is None or since < _floor_version(c) or since > head:
+                return {'version': head, 'reset': True, 'more': False, 'changes': []}
+
+            where, params = "version > ? AND version <= ?", [since, head]
+            if tables is not None:
+                # Unary + keeps the planner on the version range rather than
+                # idx_change_log_row, which would sort the whole log
+                where += f" AND +table_name IN ({', '.join('?' * len(tables))})"
+                params += tables
+            c.execute(f"""
+                SELECT version, table_name, row_id FROM change_log
+                WHERE {where} ORDER BY version LIMIT ?
+            """, params + [limit + 1])
+            entries = c.fetchall()
+            more = len(entries) > limit
+            entries = entries[:limit]
+
+            latest = {}
+            for version, table_name, row_id in entries:
+                latest[(table_name, row_id)] = version
+            ids = defaultdict(list)
+            for table_name, row_id in latest:
+                ids[table_name].append(row_id)
+            rows = {table_name: _load_rows(c, _SOURCES[table_name], row_ids) for table_name, row_ids in ids.items()}
+        finally:
+            conn.commit()
+
+    changes = []
+    for (table_name, row_id), version in sorted(latest.items(), key=lambda item: item[1]):
+        row, visible = rows[table_name].get(row_id, (None, False))
+        if not (visible or include_private):
+            row = None
+        changes.append({
+            'version': version,
+            'section': _SOURCES[table_name].section,
+            'table': table_name,
+            'id': row_id,
+            'op': 'delete' if row is None else 'upsert',
+            'data': row
+        })
+    return {
+        'version': entries[-1][0] if more else head,
+        'reset': False,
+        'more': more,
+        'changes': changes
+    }
+
+def compact_change_log(tombstone_days=CHANGE_LOG_TOMBSTONE_DAYS, batch_size=1000):
+    """Drop change log entries no client needs; returns (superseded, expired).
+
+    An entry is superseded once a newer one exists for the same row, since
+    the feed returns rows as they are now. That keeps the log at about one
+    entry per row however often rows are written, without affecting any
+    client. Delete entries older than ``tombstone_days`` go as well; clients
+    that synced before the newest of them are sent ``reset`` from then on.
+    """
+    superseded = 0
+    last_version = 0
+    while True:
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT version FROM change_log old
+                WHERE version > ? AND EXISTS (
+                    SELECT 1 FROM change_log new
+                    WHERE new.table_name = old.table_name AND new.row_id = old.row_id
+                      AND new.version > old.version
+                )
+                ORDER BY version LIMIT ?
+            """, (last_version, batch_size))
+            versions = [row[0] for row in c.fetchall()]
+            if not versions:
+                break
+            c.execute(f"DELETE FROM change_log WHERE version IN ({', '.join('?' * len(versions))})", versions)
+        superseded += len(versions)
+        last_version = versions[-1]
+
+    expired = 0
+    if tombstone_days > 0:
+        with write_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT MAX(version) FROM change_log
+                WHERE op = 'delete' AND changed_at < datetime('now', ?)
+            """, (f'-{tombstone_days} days',))
+            through_version = c.fetchone()[0]
+            if through_version is not None:
+                c.execute("DELETE FROM change_log WHERE op = 'delete' AND version <= ?", (through_version,))
+                expired = c.rowcount
+                c.execute("INSERT INTO change_log_compactions (through_version, removed) VALUES (?, ?)",
+                          (through_version, expired))
+    return superseded, expired
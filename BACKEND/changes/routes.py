@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Header, Query
+from typing import Optional
+from .models import get_changes, CHANGES_PAGE_SIZE, CHANGES_MAX_PAGE_SIZE
+from auth.routes import get_current_user
+from db import run_in_db
+from responses import FastJSONResponse
+
+router = APIRouter()
+
+@router.get("")
+async def list_changes(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(CHANGES_PAGE_SIZE, ge=1, le=CHANGES_MAX_PAGE_SIZE),
+    authorization: Optional[str] = Header(None)
+):
+    """Content rows changed since version ``since``.
+
+    Call without ``since`` to get the current version, download the full
+    documents, then poll with the returned ``version``. Keep following
+    ``version`` while ``more`` is true; on ``reset`` start over. Admins also
+    see inactive rows and user accounts.
+    """
+    include_private = False
+    if authorization:
+        current_user = await get_current_user(authorization)
+        include_private = current_user["role"] == "admin"
+    feed = await run_in_db(get_changes, since, limit, include_private)
+    return FastJSONResponse(feed)
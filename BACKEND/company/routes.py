@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from .models import (
@@ -9,6 +9,8 @@ from .models import (
     update_social_links
 )
 from auth.routes import require_auth
+from db import run_in_db
+from cache import Snapshot, bump_version, snapshot_response
 
 router = APIRouter()
 
@@ -60,15 +62,19 @@ class SocialLink(BaseModel):
 class SocialLinksUpdate(BaseModel):
     socialLinks: List[SocialLink]
 
+# The footer lists service titles, so service edits invalidate it too
+company_snapshot = Snapshot(('company', 'services'), get_company_details)
+
 @router.get("")
-async def get_details():
+async def get_details(request: Request):
     """Get all company details"""
-    return get_company_details()
+    return await snapshot_response(request, company_snapshot)
 
 @router.put("/about")
 async def update_about(data: AboutUpdate, current_user = Depends(require_auth)):
     """Update about us section"""
-    update_about_us(data.title, data.description)
+    await run_in_db(update_about_us, data.title, data.description)
+    bump_version('company')
     return {'message': 'About us section updated'}
 
 @router.put("/contact")
@@ -83,13 +89,15 @@ async def update_contact(data: ContactUpdate, current_user = Depends(require_aut
             "isAddress": item.isAddress,
             "isContact": item.isContact
         })
-    update_contact_us(data.title, items)
+    await run_in_db(update_contact_us, data.title, items)
+    bump_version('company')
     return {'message': 'Contact us section updated'}
 
 @router.put("/useful-links")
 async def update_links(data: UsefulLinksUpdate, current_user = Depends(require_auth)):
     """Update useful links section"""
-    update_useful_links(data.title, [dict(item) for item in data.items])
+    await run_in_db(update_useful_links, data.title, [dict(item) for item in data.items])
+    bump_version('company')
     return {'message': 'Useful links section updated'}
 
 @router.put("/social-links")
@@ -103,5 +111,6 @@ async def update_social(data: SocialLinksUpdate, current_user = Depends(require_
             "icon": link.icon,
             "ariaLabel": link.ariaLabel
         })
-    update_social_links(links)
+    await run_in_db(update_social_links, links)
+    bump_version('company')
     return {'message': 'Social links updated'} 
\ No newline at end of file
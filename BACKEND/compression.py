@@ -0,0 +1,72 @@
+import gzip
+import os
+import brotli
+from starlette.middleware.gzip import GZipMiddleware
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+# Levels for snapshot variants, which are compressed once per content version
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '9'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '9'))
+# Level for other responses, compressed on every request by GZipMiddleware
+DYNAMIC_GZIP_LEVEL = int(os.getenv('DYNAMIC_GZIP_LEVEL', '5'))
+# Supported encodings, preferred first when a client accepts several equally
+ENCODINGS = ('br', 'gzip')
+
+def compress(body, encoding):
+    """Compress ``body`` with one of ``ENCODINGS``"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output identical for the same body
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def _parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    weights = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    return weights
+
+def negotiate_encoding(accept_encoding, size):
+    """Pick the encoding for a ``size``-byte body, or None to send it as is"""
+    if not accept_encoding or size < COMPRESSION_MIN_SIZE:
+        return None
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get('*', 0.0)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class StreamingGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves long-lived streams under ``exclude_paths`` alone.
+
+    Streamed bodies sit in the compressor until it fills or the response
+    ends, which would hold server-sent events back, and every open stream
+    would keep its own compressor alive.
+    """
+
+    def __init__(self, app, exclude_paths=(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
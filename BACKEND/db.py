@@ -1,15 +1,67 @@
 import sqlite3
 from pathlib import Path
-from datetime import datetime
-import shutil
+from datetime import date, datetime, timedelta
+from contextlib import contextmanager
+from collections import deque, namedtuple
 import os
 import json
+import base64
 import hashlib
+import threading
+import time
+import asyncio
+import contextvars
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+from metrics import DbCall, current_request, record_statement
 
 # Database configuration
 DB_NAME = 'clcorgtz.db'
-DB_PATH = Path(__file__).parent / DB_NAME
-BACKUP_DIR = Path(__file__).parent / 'backup'
+DB_PATH = Path(os.getenv('DB_PATH', Path(__file__).parent / DB_NAME))
+BACKUP_DIR = Path(os.getenv('BACKUP_DIR', Path(__file__).parent / 'backup'))
+# Held by the process migrating the schema, so workers booting together
+# migrate one at a time
+MIGRATION_LOCK_PATH = DB_PATH.with_name(DB_PATH.name + '.migrate.lock')
+
+# SQLite tuning (see https://www.sqlite.org/pragma.html)
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-16000'))  # negative = KiB
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_TEMP_STORE = os.getenv('DB_TEMP_STORE', 'MEMORY')
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+
+# Connection pool configuration
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+# One thread per pooled reader plus one for the writer, so executor threads
+# never queue on the pools themselves
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', str(POOL_SIZE + 1)))
+# Statements taking at least this long (execution plus fetching) are logged
+# with their query plan; 0 turns the slow-query log off
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '100'))
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+    f"PRAGMA synchronous = {DB_SYNCHRONOUS}",
+    f"PRAGMA cache_size = {DB_CACHE_SIZE}",
+    f"PRAGMA mmap_size = {DB_MMAP_SIZE}",
+    f"PRAGMA temp_store = {DB_TEMP_STORE}",
+)
+
+logger = logging.getLogger(__name__)
+
+# Readers can never take the write lock, so an admin save only ever waits on
+# the single writer connection and never on public page loads.
+READ_PRAGMAS = CONNECTION_PRAGMAS + ("PRAGMA query_only = ON",)
+WRITE_PRAGMAS = CONNECTION_PRAGMAS
 
 # Define all table schemas in a central dictionary
 TABLE_SCHEMAS = {
@@ -38,13 +90,37 @@ TABLE_SCHEMAS = {
         CREATE TABLE IF NOT EXISTS tokens (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER NOT NULL,
-            token TEXT NOT NULL UNIQUE,
+            token_hash BLOB NOT NULL UNIQUE,
             expires_at TIMESTAMP NOT NULL,
             is_valid INTEGER DEFAULT 1,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (id)
         )
     ''',
+    'login_keys': '''
+        CREATE TABLE IF NOT EXISTS login_keys (
+            login_key TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''',
+    'token_epochs': '''
+        CREATE TABLE IF NOT EXISTS token_epochs (
+            user_id INTEGER PRIMARY KEY,
+            epoch INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''',
+    # Stateless access tokens revoked by logout, kept until they expire
+    'revoked_tokens': '''
+        CREATE TABLE IF NOT EXISTS revoked_tokens (
+            jti TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            expires_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        ) WITHOUT ROWID
+    ''',
     'services': '''
         CREATE TABLE IF NOT EXISTS services (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -182,7 +258,9 @@ TABLE_SCHEMAS = {
             is_new BOOLEAN DEFAULT 1,
             status TEXT CHECK(status IN ('active', 'pending','ongoing', 'inactive')) DEFAULT 'active',
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            image TEXT,
+            published_on TEXT
         )
     ''',
     'how': '''
@@ -206,10 +284,272 @@ TABLE_SCHEMAS = {
             FOREIGN KEY (how_id) REFERENCES how(id)
         )
     ''',
+    # Write counter per table, bumped by the versions_* triggers
+    'table_versions': '''
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,
+            changed_at REAL
+        ) WITHOUT ROWID
+    ''',
+    # Row changes behind the /changes feed, written by the changes_* triggers.
+    # AUTOINCREMENT keeps versions growing even after compaction deletes the
+    # newest entries.
+    'change_log': '''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT CHECK(op IN ('insert', 'update', 'delete')) NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+    # Compaction runs that dropped delete entries; clients behind
+    # through_version have to re-download everything
+    'change_log_compactions': '''
+        CREATE TABLE IF NOT EXISTS change_log_compactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            through_version INTEGER NOT NULL,
+            removed INTEGER NOT NULL,
+            compacted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''',
+}
+# Secondary indexes, created after the tables in init_db
+INDEX_SCHEMAS = {
+    'idx_offerings_service_id': '''
+        CREATE INDEX IF NOT EXISTS idx_offerings_service_id ON offerings (service_id)
+    ''',
+    'idx_hero_options_hero_id': '''
+        CREATE INDEX IF NOT EXISTS idx_hero_options_hero_id ON hero_options (hero_id)
+    ''',
+    'idx_how_steps_how_id': '''
+        CREATE INDEX IF NOT EXISTS idx_how_steps_how_id ON how_steps (how_id, step_id)
+    ''',
+    # Keyset pagination: equality filter first, then the sort key
+    'idx_announcements_published': '''
+        CREATE INDEX IF NOT EXISTS idx_announcements_published ON announcements (status, published_on, id)
+    ''',
+    'idx_testimonials_status_created': '''
+        CREATE INDEX IF NOT EXISTS idx_testimonials_status_created ON testimonials (status, created_at, id)
+    ''',
+    'idx_users_created': '''
+        CREATE INDEX IF NOT EXISTS idx_users_created ON users (created_at, id)
+    ''',
+    'idx_users_status_created': '''
+        CREATE INDEX IF NOT EXISTS idx_users_status_created ON users (status, created_at, id)
+    ''',
+    'idx_hero_created': '''
+        CREATE INDEX IF NOT EXISTS idx_hero_created ON hero (created_at, id)
+    ''',
+    'idx_hero_status_created': '''
+        CREATE INDEX IF NOT EXISTS idx_hero_status_created ON hero (status, created_at, id)
+    ''',
+    'idx_how_status_created': '''
+        CREATE INDEX IF NOT EXISTS idx_how_status_created ON how (status, created_at, id)
+    ''',
+    'idx_tokens_user_id': '''
+        CREATE INDEX IF NOT EXISTS idx_tokens_user_id ON tokens (user_id)
+    ''',
+    'idx_tokens_expires_at': '''
+        CREATE INDEX IF NOT EXISTS idx_tokens_expires_at ON tokens (expires_at)
+    ''',
+    # Partial index so the reaper finds invalidated rows without a table scan
+    'idx_tokens_invalid': '''
+        CREATE INDEX IF NOT EXISTS idx_tokens_invalid ON tokens (id) WHERE is_valid = 0
+    ''',
+    'idx_revoked_tokens_expires_at': '''
+        CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens (expires_at)
+    ''',
+    # Compaction looks for newer entries of the same row, and old deletes
+    'idx_change_log_row': '''
+        CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_id, version)
+    ''',
+    'idx_change_log_deletes': '''
+        CREATE INDEX IF NOT EXISTS idx_change_log_deletes ON change_log (changed_at) WHERE op = 'delete'
+    ''',
 }
+# Triggers that keep derived columns, the table versions and the change log
+# up to date, including for rows written outside the models, e.g. by ad-hoc
+# SQL. init_db recreates them on every schema change.
+TRIGGER_SCHEMAS = {
+    # Same fallback as an unparseable date: the day the row was created
+    'announcements_default_published_on': '''
+        CREATE TRIGGER announcements_default_published_on AFTER INSERT ON announcements
+        WHEN NEW.published_on IS NULL BEGIN
+            UPDATE announcements SET published_on = COALESCE(date(NEW.created_at), date('now'))
+            WHERE id = NEW.id;
+        END
+    ''',
+}
+# Tables whose writes are counted in table_versions, so every worker can
+# tell which of its cached content and sessions went stale
+VERSIONED_TABLES = (
+    'hero', 'hero_options', 'services', 'offerings', 'testimonials', 'announcements', 'how', 'how_steps',
+    'about_us', 'contact_us', 'contact_items', 'useful_links', 'useful_link_items', 'social_links',
+    'users', 'token_epochs', 'tokens', 'revoked_tokens',
+)
+
+# Unix time with sub-second precision, in SQL
+UNIX_NOW_SQL = "((julianday('now') - 2440587.5) * 86400.0)"
+
+def _version_triggers():
+    # changed_at never moves backwards, even if the clock does
+    triggers = {}
+    for table in VERSIONED_TABLES:
+        for event in ('insert', 'update', 'delete'):
+            triggers[f'versions_{table}_{event}'] = f'''
+                CREATE TRIGGER versions_{table}_{event} AFTER {event.upper()} ON {table} BEGIN
+                    INSERT INTO table_versions (table_name, version, changed_at) VALUES ('{table}', 1, {UNIX_NOW_SQL})
+                    ON CONFLICT (table_name) DO UPDATE SET
+                        version = version + 1,
+                        changed_at = MAX(COALESCE(changed_at, 0), excluded.changed_at);
+                END
+            '''
+    return triggers
+
+TRIGGER_SCHEMAS.update(_version_triggers())
+
+# Tables logged to change_log, the section each belongs to and, for child
+# rows, the parent whose status also decides whether the public sees them.
+# ``columns`` limits what the feed returns; None returns every column.
+# Sources that are not ``public`` are only shown to admins.
+ChangeSource = namedtuple('ChangeSource', ['table', 'section', 'parent', 'parent_key', 'columns', 'public'],
+                          defaults=(None, None, None, True))
+CHANGE_SOURCES = (
+    ChangeSource('hero', 'hero'),
+    ChangeSource('hero_options', 'hero', 'hero', 'hero_id'),
+    ChangeSource('services', 'services'),
+    ChangeSource('offerings', 'services', 'services', 'service_id'),
+    ChangeSource('testimonials', 'testimonials'),
+    ChangeSource('announcements', 'announcements'),
+    ChangeSource('how', 'how'),
+    ChangeSource('how_steps', 'how', 'how', 'how_id'),
+    ChangeSource('about_us', 'company'),
+    ChangeSource('contact_us', 'company'),
+    ChangeSource('contact_items', 'company', 'contact_us', 'contact_id'),
+    ChangeSource('useful_links', 'company'),
+    ChangeSource('useful_link_items', 'company', 'useful_links', 'useful_links_id'),
+    ChangeSource('social_links', 'company'),
+    ChangeSource('users', 'users', columns=('id', 'username', 'email', 'role', 'status', 'created_at', 'updated_at'),
+                 public=False),
+)
+
+def _change_log_triggers():
+    triggers = {}
+    for source in CHANGE_SOURCES:
+        table = source.table
+        for event, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            triggers[f'changes_{table}_{event}'] = f'''
+                CREATE TRIGGER changes_{table}_{event} AFTER {event.upper()} ON {table} BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{event}');
+                END
+            '''
+        if source.parent:
+            # Children appear and disappear with their parent, so log them again
+            triggers[f'changes_{source.parent}_{table}_status'] = f'''
+                CREATE TRIGGER changes_{source.parent}_{table}_status AFTER UPDATE OF status ON {source.parent}
+                WHEN OLD.status IS NOT NEW.status BEGIN
+                    INSERT INTO change_log (table_name, row_id, op)
+                    SELECT '{table}', id, 'update' FROM {table} WHERE {source.parent_key} = NEW.id;
+                END
+            '''
+    return triggers
+
+TRIGGER_SCHEMAS.update(_change_log_triggers())
+
+# Full-text search over public content. Rows are keyed by
+# ``id * SEARCH_ROWID_STRIDE + code`` so triggers can find a document's
+# entry by rowid instead of scanning the UNINDEXED columns.
+SEARCH_INDEX_SCHEMA = '''
+    CREATE VIRTUAL TABLE search_index USING fts5(
+        title,
+        body,
+        doc_type UNINDEXED,
+        doc_id UNINDEXED,
+        parent_id UNINDEXED,
+        tokenize = 'porter unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+SEARCH_ROWID_STRIDE = 8
+SearchSource = namedtuple('SearchSource', ['doc_type', 'code', 'table', 'title', 'body', 'parent', 'condition'])
+# Expressions are written against ``{row}``, the source row
+SEARCH_SOURCES = (
+    SearchSource('announcement', 1, 'announcements', "{row}.title", "{row}.description", "NULL",
+                 "{row}.status = 'active'"),
+    SearchSource('service', 2, 'services', "{row}.title", "{row}.description", "NULL",
+                 "{row}.status = 'active'"),
+    # Offerings are listed under their service, so they follow its title and status
+    SearchSource('offering', 3, 'offerings', "(SELECT title FROM services WHERE id = {row}.service_id)",
+                 "{row}.text", "{row}.service_id",
+                 "EXISTS (SELECT 1 FROM services WHERE id = {row}.service_id AND status = 'active')"),
+    SearchSource('testimonial', 4, 'testimonials', "{row}.name", "{row}.text", "NULL",
+                 "{row}.status = 'active'"),
+)
+
+def _search_insert_sql(source, row, where=''):
+    """INSERT ... SELECT adding the search entries for ``source`` rows named ``row``"""
+    def expr(template):
+        return template.format(row=row)
+    from_clause = f"FROM {source.table}" if row == source.table else ""
+    return f"""
+        INSERT INTO search_index (rowid, title, body, doc_type, doc_id, parent_id)
+        SELECT {row}.id * {SEARCH_ROWID_STRIDE} + {source.code}, {expr(source.title)}, {expr(source.body)},
+               '{source.doc_type}', {row}.id, {expr(source.parent)}
+        {from_clause}
+        WHERE {expr(source.condition)}{where}
+    """
+
+def _search_triggers():
+    triggers = {}
+    for source in SEARCH_SOURCES:
+        table, stride, code = source.table, SEARCH_ROWID_STRIDE, source.code
+        triggers[f'search_{table}_insert'] = f"""
+            CREATE TRIGGER search_{table}_insert AFTER INSERT ON {table} BEGIN
+                {_search_insert_sql(source, 'NEW')};
+            END
+        """
+        triggers[f'search_{table}_update'] = f"""
+            CREATE TRIGGER search_{table}_update AFTER UPDATE ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = OLD.id * {stride} + {code};
+                {_search_insert_sql(source, 'NEW')};
+            END
+        """
+        triggers[f'search_{table}_delete'] = f"""
+            CREATE TRIGGER search_{table}_delete AFTER DELETE ON {table} BEGIN
+                DELETE FROM search_index WHERE rowid = OLD.id * {stride} + {code};
+            END
+        """
+    # Re-index offerings when their service changes or goes away
+    offerings = next(source for source in SEARCH_SOURCES if source.table == 'offerings')
+    triggers['search_services_offerings_update'] = f"""
+        CREATE TRIGGER search_services_offerings_update AFTER UPDATE ON services BEGIN
+            DELETE FROM search_index WHERE rowid IN (
+                SELECT id * {SEARCH_ROWID_STRIDE} + {offerings.code} FROM offerings WHERE service_id = OLD.id
+            );
+            {_search_insert_sql(offerings, 'offerings', ' AND offerings.service_id = NEW.id')};
+        END
+    """
+    triggers['search_services_offerings_delete'] = f"""
+        CREATE TRIGGER search_services_offerings_delete AFTER DELETE ON services BEGIN
+            DELETE FROM search_index WHERE rowid IN (
+                SELECT id * {SEARCH_ROWID_STRIDE} + {offerings.code} FROM offerings WHERE service_id = OLD.id
+            );
+        END
+    """
+    return triggers
+
+SEARCH_TRIGGERS = _search_triggers()
+
+# schema_versions entry holding the fingerprint of the whole schema
+SCHEMA_FINGERPRINT_KEY = '__schema__'
 # Define table dependencies (child -> parent relationships)
 TABLE_DEPENDENCIES = {
     'tokens': ['users'],
+    'token_epochs': ['users'],
+    'revoked_tokens': ['users'],
+    'login_keys': ['users'],
     'offerings': ['services'],
     'hero_options': ['hero'],
     'contact_items': ['contact_us'],
@@ -217,16 +557,13 @@ TABLE_DEPENDENCIES = {
 }
 
 def backup_database():
-    """Create a backup of the database with timestamp"""
-    if not BACKUP_DIR.exists():
-        BACKUP_DIR.mkdir()
-    
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_path = BACKUP_DIR / f'clcorgtz_backup_{timestamp}.db'
-    
-    if DB_PATH.exists():
-        shutil.copy2(DB_PATH, backup_path)
-        print(f"Database backed up to {backup_path}")
+    """Create a compressed online backup of the database with timestamp"""
+    if not DB_PATH.exists():
+        return None
+    from backups import create_backup
+    backup_path = create_backup()
+    print(f"Database backed up to {backup_path}")
+    return backup_path
 
 def get_table_schema(cursor, table_name):
     """Get the schema of a table"""
@@ -238,77 +575,674 @@ def calculate_schema_hash(schema_sql):
     """Calculate a hash of the schema SQL"""
     return hashlib.sha256(schema_sql.encode('utf-8')).hexdigest()
 
+def _clean_schema(schema_sql):
+    return ''.join(schema_sql.lower().split())
+
+def table_schema_hash(schema_sql):
+    """Hash of a definition, ignoring case and whitespace"""
+    return calculate_schema_hash(_clean_schema(schema_sql))
+
+def _hash_matches(stored_hash, schema_sql):
+    # Tables created by older versions of init_db recorded the raw SQL hash
+    return stored_hash in (table_schema_hash(schema_sql), calculate_schema_hash(schema_sql))
+
+def _search_index_hash():
+    """Hash of the search table, its triggers and the sources it indexes"""
+    parts = [SEARCH_INDEX_SCHEMA, *SEARCH_TRIGGERS.values()]
+    parts += [_search_insert_sql(source, source.table) for source in SEARCH_SOURCES]
+    return table_schema_hash('\n'.join(parts))
+
+def schema_fingerprint():
+    """Hash of every table, index and trigger definition and the data migrations"""
+    parts = [f"table:{name}:{_clean_schema(sql)}" for name, sql in TABLE_SCHEMAS.items()]
+    parts += [f"index:{name}:{_clean_schema(sql)}" for name, sql in INDEX_SCHEMAS.items()]
+    parts += [f"trigger:{name}:{_clean_schema(sql)}" for name, sql in TRIGGER_SCHEMAS.items()]
+    parts += [f"migration:{migration.__name__}" for migration in DATA_MIGRATIONS]
+    parts.append(f"search:{_search_index_hash()}")
+    return calculate_schema_hash('\n'.join(parts))
+
+def read_schema_state(cursor):
+    """Read the live schema with one query each on sqlite_master and schema_versions.
+
+    Returns ``(tables, indexes, hashes)``: the names of the existing tables,
+    of the existing indexes and triggers, and the latest recorded hash per
+    ``schema_versions`` entry.
+    """
+    cursor.execute("SELECT type, name FROM sqlite_master WHERE type IN ('table', 'index', 'trigger')")
+    objects = cursor.fetchall()
+    tables = {name for kind, name in objects if kind == 'table'}
+    indexes = {name for kind, name in objects if kind != 'table'}
+    hashes = {}
+    if 'schema_versions' in tables:
+        cursor.execute("""
+            SELECT table_name, schema_hash
+            FROM schema_versions
+            WHERE id IN (SELECT MAX(id) FROM schema_versions GROUP BY table_name)
+        """)
+        hashes = dict(cursor.fetchall())
+    return tables, indexes, hashes
+
 def check_schema_changes():
     """Check if there are schema changes in any table"""
     if not DB_PATH.exists():
         return True, []
     
     conn = get_connection()
-    c = conn.cursor()
-    
-    changed_tables = []
-    
     try:
-        # Create schema_versions table if it doesn't exist
-        c.execute(TABLE_SCHEMAS['schema_versions'])
-        conn.commit()
-        
-        # Check each table's schema
-        for table_name, expected_schema in TABLE_SCHEMAS.items():
-            if table_name == 'schema_versions':
-                continue
-                
-            # Clean up schema SQL for comparison
-            expected_clean = ''.join(expected_schema.lower().split())
-            expected_hash = calculate_schema_hash(expected_clean)
-            
-            # Get current schema version
-            c.execute("""
-                SELECT schema_hash 
-                FROM schema_versions 
-                WHERE table_name = ? 
-                ORDER BY id DESC LIMIT 1
-            """, (table_name,))
-            result = c.fetchone()
-            
-            current_schema = get_table_schema(c, table_name)
-            if current_schema:
-                current_clean = ''.join(current_schema.lower().split())
-                current_hash = calculate_schema_hash(current_clean)
-                
-                if not result or result[0] != expected_hash:
-                    changed_tables.append(table_name)
-            else:
-                changed_tables.append(table_name)
-        
-        conn.close()
+        tables, _, hashes = read_schema_state(conn.cursor())
+        changed_tables = [
+            table_name for table_name, schema in TABLE_SCHEMAS.items()
+            if table_name != 'schema_versions'
+            and (table_name not in tables or not _hash_matches(hashes.get(table_name), schema))
+        ]
         return len(changed_tables) > 0, changed_tables
     except Exception as e:
         print(f"Error checking schema changes: {e}")
-        conn.close()
         return True, list(TABLE_SCHEMAS.keys())
+    finally:
+        conn.close()
+
+def _record_schema_version(cursor, table_name, schema_sql, schema_hash=None):
+    cursor.execute("""
+        INSERT INTO schema_versions (table_name, schema_hash, schema_definition)
+        VALUES (?, ?, ?)
+    """, (table_name, schema_hash or table_schema_hash(schema_sql), schema_sql))
 
 def update_schema_version(table_name, schema_sql):
     """Update the schema version for a table"""
     conn = get_connection()
-    c = conn.cursor()
-    
-    schema_hash = calculate_schema_hash(''.join(schema_sql.lower().split()))
-    
-    c.execute("""
-        INSERT INTO schema_versions (table_name, schema_hash, schema_definition)
-        VALUES (?, ?, ?)
-    """, (table_name, schema_hash, schema_sql))
-    
+    _record_schema_version(conn.cursor(), table_name, schema_sql)
     conn.commit()
     conn.close()
 
-def get_connection():
-    """Get a connection to the SQLite database."""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.execute("PRAGMA foreign_keys = ON")
+def apply_pragmas(conn, pragmas=CONNECTION_PRAGMAS):
+    """Apply connection-level pragmas to a fresh connection"""
+    # A plain cursor keeps connection setup out of the query metrics
+    cursor = conn.cursor(sqlite3.Cursor)
+    for pragma in pragmas:
+        cursor.execute(pragma)
     return conn
 
+# Statements EXPLAIN QUERY PLAN accepts
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times its statements and counts the rows they touch.
+
+    A statement's time covers ``execute`` and every fetch after it, since
+    SQLite produces most rows while they are fetched. Its rows are the rows
+    fetched, or the rows changed for writes; rows read by iterating the
+    cursor directly are not counted. Inside a ``run_in_db`` call each
+    statement is added to the call's per-statement totals. Anywhere, a
+    statement that reaches ``DB_SLOW_QUERY_MS`` is logged once with its
+    query plan.
+    """
+
+    _totals = None
+    _elapsed = 0.0
+    _rows = 0
+    _slow_logged = True
+
+    def _start(self, sql, parameters):
+        self._sql = sql
+        self._parameters = parameters
+        self._totals = record_statement(sql)
+        self._elapsed = 0.0
+        self._rows = 0
+        self._slow_logged = False
+
+    def _finish(self, started, rows):
+        elapsed = time.perf_counter() - started
+        self._elapsed += elapsed
+        self._rows += rows
+        totals = self._totals
+        if totals is not None:
+            totals[1] += elapsed
+            totals[2] += rows
+        if not self._slow_logged and DB_SLOW_QUERY_MS and self._elapsed * 1000 >= DB_SLOW_QUERY_MS:
+            self._slow_logged = True
+            self._log_slow()
+
+    def _log_slow(self):
+        sql = ' '.join(self._sql.split())
+        plan = ''
+        if sql.upper().startswith(EXPLAINABLE) and isinstance(self._parameters, (tuple, list, dict)):
+            try:
+                # A plain cursor, so the EXPLAIN is neither counted nor timed
+                rows = self.connection.cursor(sqlite3.Cursor).execute(
+                    'EXPLAIN QUERY PLAN ' + self._sql, self._parameters).fetchall()
+                plan = ''.join(f"\n    {row[3]}" for row in rows)
+            except sqlite3.Error as e:
+                plan = f"\n    (no query plan: {e})"
+        logger.warning(f"Slow query ({self._elapsed * 1000:.1f} ms, {self._rows} rows): {sql}{plan}")
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._finish(started, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Only the statement text is kept; the parameters may be a generator
+        self._start(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._finish(started, max(self.rowcount, 0))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._finish(started, 0 if row is None else 1)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._finish(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._finish(started, len(rows))
+        return rows
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including the ones ``execute`` makes, are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def get_connection():
+    """Get a new, unpooled connection to the SQLite database."""
+    conn = sqlite3.connect(str(DB_PATH), factory=InstrumentedConnection)
+    return apply_pragmas(conn)
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """Hold an exclusive lock on ``path`` shared by every process on this host.
+
+    Yields True once the lock is held. With ``blocking`` false it yields
+    False straight away if another process holds it. The operating system
+    releases the lock if its holder dies.
+    """
+    with open(path, 'a+b') as handle:
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                while True:
+                    try:
+                        msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            raise
+                        time.sleep(0.1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+class PoolTimeout(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes available in time"""
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of SQLite connections.
+
+    Connections are created lazily up to ``max_size`` with the pragmas in
+    ``CONNECTION_PRAGMAS`` already applied. A thread that re-enters
+    ``connection()`` while it holds a connection gets the same one back, so
+    nested model calls (e.g. ``get_company_details`` -> ``get_all_services``)
+    never take a second slot. Connections idle for longer than
+    ``health_check_interval`` are probed before being handed out again.
+    """
+
+    def __init__(self, db_path, max_size=POOL_SIZE, timeout=POOL_TIMEOUT,
+                 pragmas=CONNECTION_PRAGMAS, health_check_interval=POOL_HEALTH_CHECK_INTERVAL):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = pragmas
+        self.health_check_interval = health_check_interval
+        self._idle = deque()
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False, factory=InstrumentedConnection)
+        return apply_pragmas(conn, self.pragmas)
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def acquire(self):
+        """Take a connection out of the pool, waiting up to ``timeout`` seconds"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise sqlite3.ProgrammingError("Connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._created < self.max_size:
+                        self._created += 1
+                        conn, last_used = None, None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+
+            if conn is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(conn):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                self._created -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Yield a pooled connection, committing on success and rolling back on error"""
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self.acquire()
+        local.conn = conn
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            local.conn = None
+            self.release(conn)
+
+    def stats(self):
+        """Return a snapshot of pool usage"""
+        with self._cond:
+            return {
+                'size': self._created,
+                'idle': len(self._idle),
+                'in_use': self._created - len(self._idle),
+                'max_size': self.max_size
+            }
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._created -= 1
+                conn.close()
+            self._cond.notify_all()
+
+_read_pool = None
+_write_pool = None
+_pool_lock = threading.Lock()
+
+def get_read_pool():
+    """Return the process-wide pool of read-only connections"""
+    global _read_pool
+    if _read_pool is None:
+        with _pool_lock:
+            if _read_pool is None:
+                _read_pool = ConnectionPool(DB_PATH, max_size=POOL_SIZE, pragmas=READ_PRAGMAS)
+    return _read_pool
+
+def get_write_pool():
+    """Return the process-wide single-connection writer pool"""
+    global _write_pool
+    if _write_pool is None:
+        with _pool_lock:
+            if _write_pool is None:
+                _write_pool = ConnectionPool(DB_PATH, max_size=1, pragmas=WRITE_PRAGMAS)
+    return _write_pool
+
+def read_connection():
+    """Context manager yielding a pooled, read-only database connection.
+
+    Usage::
+
+        with read_connection() as conn:
+            c = conn.cursor()
+            ...
+    """
+    return get_read_pool().connection()
+
+def write_connection():
+    """Context manager yielding the serialized writer connection.
+
+    Only one thread holds the writer at a time; the transaction is committed
+    when the block exits cleanly and rolled back if it raises.
+    """
+    return get_write_pool().connection()
+
+def pool_stats():
+    """Return usage snapshots for the read and write pools"""
+    return {
+        'read': get_read_pool().stats(),
+        'write': get_write_pool().stats()
+    }
+
+def pools_open():
+    """Whether this process has opened the connection pools, i.e. is serving"""
+    return _read_pool is not None or _write_pool is not None
+
+def close_pool():
+    """Close the process-wide connection pools"""
+    global _read_pool, _write_pool
+    with _pool_lock:
+        for pool in (_read_pool, _write_pool):
+            if pool is not None:
+                pool.close()
+        _read_pool = None
+        _write_pool = None
+
+_db_executor = None
+_executor_lock = threading.Lock()
+
+def get_db_executor():
+    """Return the process-wide executor that runs blocking database calls"""
+    global _db_executor
+    if _db_executor is None:
+        with _executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+    return _db_executor
+
+async def run_in_db(func, *args, **kwargs):
+    """Run a blocking database call on the DB executor and await its result.
+
+    Async routes use this for every model call so sqlite never blocks the
+    event loop. At most ``DB_EXECUTOR_WORKERS`` calls run at once; the rest
+    wait in the executor queue. Context variables are copied into the worker.
+    During a request the call's queries, run time and queue wait are added
+    to the request's metrics.
+    """
+    loop = asyncio.get_running_loop()
+    request = current_request()
+    if request is None:
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await loop.run_in_executor(get_db_executor(), call)
+    db_call = DbCall()
+    call = functools.partial(contextvars.copy_context().run, db_call.run, func, *args, **kwargs)
+    try:
+        return await loop.run_in_executor(get_db_executor(), call)
+    finally:
+        request.add_db_call(db_call)
+
+def shutdown_db_executor():
+    """Stop the DB executor, letting queued calls finish"""
+    global _db_executor
+    with _executor_lock:
+        executor, _db_executor = _db_executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+# Stay well under SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+MAX_BATCH_PARAMS = 500
+
+def fetch_children(cursor, table, foreign_key, parent_ids, columns, order_by='id'):
+    """Fetch child rows for many parents at once, grouped by parent id.
+
+    Returns ``{parent_id: [row, ...]}`` where each row holds ``columns`` in
+    order. Every id in ``parent_ids`` gets an entry, even when it has no
+    children, and up to ``MAX_BATCH_PARAMS`` parents are loaded per query.
+    """
+    children = {parent_id: [] for parent_id in parent_ids}
+    ids = list(children)
+    for start in range(0, len(ids), MAX_BATCH_PARAMS):
+        batch = ids[start:start + MAX_BATCH_PARAMS]
+        placeholders = ', '.join('?' * len(batch))
+        cursor.execute(f"""
+            SELECT {foreign_key}, {', '.join(columns)}
+            FROM {table}
+            WHERE {foreign_key} IN ({placeholders})
+            ORDER BY {foreign_key}, {order_by}
+        """, batch)
+        for row in cursor.fetchall():
+            children[row[0]].append(row[1:])
+    return children
+
+# Page size bounds for keyset-paginated list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv('DEFAULT_PAGE_SIZE', '20'))
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '100'))
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+def encode_cursor(values):
+    """Opaque cursor holding the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, size):
+    """Return the sort key stored in ``cursor``, which must hold ``size`` values"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid pagination cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid pagination cursor")
+    # Values are bound as query parameters, so only types SQLite accepts
+    for value in values:
+        if not (value is None or isinstance(value, (str, float))
+                or (isinstance(value, int) and -2**63 <= value < 2**63)):
+            raise InvalidCursor("Invalid pagination cursor")
+    return values
+
+def date_range(column, since=None, until=None):
+    """WHERE conditions and params for an inclusive date range on a timestamp column"""
+    conditions, params = [], []
+    if since is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(since.isoformat())
+    if until is not None and until < date.max:
+        # Timestamps sort as text, so "before the next day" covers the whole day
+        conditions.append(f"{column} < ?")
+        params.append((until + timedelta(days=1)).isoformat())
+    return conditions, params
+
+def fetch_page(cursor, table, columns, sort_key, where=(), params=(),
+               limit=DEFAULT_PAGE_SIZE, after=None, descending=True):
+    """Fetch one page of rows ordered by ``sort_key`` using keyset pagination.
+
+    ``sort_key`` must be unique (end it with ``id``) and ideally match an
+    index after any equality filters in ``where``. Returns ``(rows,
+    next_cursor)``; each row holds ``columns`` in order and ``next_cursor``
+    is None on the last page.
+    """
+    conditions, args = list(where), list(params)
+    if after is not None:
+        conditions.append(f"({', '.join(sort_key)}) {'<' if descending else '>'} ({', '.join('?' * len(sort_key))})")
+        args.extend(decode_cursor(after, len(sort_key)))
+    direction = 'DESC' if descending else 'ASC'
+    where_sql = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cursor.execute(f"""
+        SELECT {', '.join(sort_key)}, {', '.join(columns)}
+        FROM {table}
+        {where_sql}
+        ORDER BY {', '.join(f'{column} {direction}' for column in sort_key)}
+        LIMIT ?
+    """, args + [limit + 1])
+    rows = cursor.fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][:len(sort_key)]) if len(rows) > limit else None
+    return [row[len(sort_key):] for row in rows[:limit]], next_cursor
+
+def _column_names(cursor, table_name):
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table_name})")]
+
+def migrate_token_hashes(conn):
+    """Rebuild a pre-digest ``tokens`` table to store SHA-256 token digests.
+
+    Existing sessions survive: each stored token is replaced by the same
+    digest ``auth.session_cache.token_key`` computes for lookups. Runs inside
+    the caller's transaction and returns True if the table was migrated.
+    """
+    c = conn.cursor()
+    if 'token' not in _column_names(c, 'tokens'):
+        return False
+
+    from auth.session_cache import token_key
+    conn.create_function('token_key', 1, token_key, deterministic=True)
+    schema = TABLE_SCHEMAS['tokens']
+    c.execute("ALTER TABLE tokens RENAME TO tokens_legacy")
+    c.execute(schema)
+    c.execute("""
+        INSERT INTO tokens (id, user_id, token_hash, expires_at, is_valid, created_at)
+        SELECT id, user_id, token_key(token), expires_at, is_valid, created_at
+        FROM tokens_legacy
+    """)
+    c.execute("DROP TABLE tokens_legacy")
+    _record_schema_version(c, 'tokens', schema)
+    return True
+
+def backfill_login_keys(conn):
+    """Add ``login_keys`` rows for users created before the table existed.
+
+    Runs inside the caller's transaction and returns True if any user was
+    missing keys. Keys that collide once case-folded are skipped and
+    reported, so the first user keeps them.
+    """
+    c = conn.cursor()
+    c.execute("""
+        SELECT id, username, email
+        FROM users
+        WHERE id NOT IN (SELECT user_id FROM login_keys)
+    """)
+    missing = c.fetchall()
+    if not missing:
+        return False
+
+    from auth.models import login_keys_for
+    rows = [(key, user_id) for user_id, username, email in missing for key in login_keys_for(username, email)]
+    c.executemany("INSERT OR IGNORE INTO login_keys (login_key, user_id) VALUES (?, ?)", rows)
+    if c.rowcount < len(rows):
+        print(f"Skipped {len(rows) - c.rowcount} login keys that collide case-insensitively")
+    return True
+
+def backfill_published_on(conn):
+    """Fill ``announcements.published_on`` from the day/month/year text columns.
+
+    Adds the column to tables created before it existed and drops the index
+    that sorted on the text columns. Runs inside the caller's transaction and
+    returns True if any row was updated. Dates that cannot be parsed fall
+    back to the day the row was created and are reported.
+    """
+    c = conn.cursor()
+    if 'published_on' not in _column_names(c, 'announcements'):
+        c.execute("ALTER TABLE announcements ADD COLUMN published_on TEXT")
+    c.execute("DROP INDEX IF EXISTS idx_announcements_status_date")
+    c.execute("SELECT id, day, month, year FROM announcements WHERE published_on IS NULL")
+    missing = c.fetchall()
+    if not missing:
+        return False
+
+    from announcements.models import publication_date
+    rows = [(publication_date(day, month, year), row_id) for row_id, day, month, year in missing]
+    c.executemany("UPDATE announcements SET published_on = COALESCE(?, date(created_at)) WHERE id = ?", rows)
+    unparsed = sum(1 for published_on, _ in rows if published_on is None)
+    if unparsed:
+        print(f"Could not parse the date of {unparsed} announcements, using their creation date")
+    return True
+
+# Data migrations run by init_db, in order, once every table exists and
+# before the indexes are (re)created
+DATA_MIGRATIONS = (migrate_token_hashes, backfill_login_keys, backfill_published_on)
+
+def sync_search_index(cursor, tables, hashes, rebuilt=()):
+    """Recreate the search triggers, and the search index itself if stale.
+
+    Runs inside the caller's transaction after any table rebuilds, since
+    dropping a table drops its triggers. The index is rebuilt from
+    ``SEARCH_SOURCES`` when it is missing, its definition changed, or one of
+    its source tables was rebuilt while the triggers were gone.
+    """
+    for name in SEARCH_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+    stale = (
+        'search_index' not in tables
+        or hashes.get('search_index') != _search_index_hash()
+        or any(source.table in rebuilt for source in SEARCH_SOURCES)
+    )
+    if stale:
+        print("Rebuilding search index")
+        cursor.execute("DROP TABLE IF EXISTS search_index")
+        cursor.execute(SEARCH_INDEX_SCHEMA)
+        for source in SEARCH_SOURCES:
+            cursor.execute(_search_insert_sql(source, source.table))
+        _record_schema_version(cursor, 'search_index', SEARCH_INDEX_SCHEMA, _search_index_hash())
+
+    for schema in SEARCH_TRIGGERS.values():
+        cursor.execute(schema)
+
 def get_drop_order():
     """Get the correct order to drop tables based on dependencies"""
     drop_order = []
@@ -332,42 +1266,102 @@ def get_drop_order():
     # Reverse to get correct drop order (children first)
     return drop_order[::-1]
 
-def init_db():
-    """Initialize the database with required tables"""
-    conn = get_connection()
-    c = conn.cursor()
+def _schema_current(cursor, fingerprint):
+    """Whether the stored fingerprint matches and every table, index and trigger exists"""
+    tables, indexes, hashes = read_schema_state(cursor)
+    return (
+        hashes.get(SCHEMA_FINGERPRINT_KEY) == fingerprint
+        and tables.issuperset(TABLE_SCHEMAS)
+        and indexes.issuperset(INDEX_SCHEMAS)
+        and indexes.issuperset(TRIGGER_SCHEMAS)
+        and indexes.issuperset(SEARCH_TRIGGERS)
+    )
 
-    # Create schema_versions table first
-    c.execute(TABLE_SCHEMAS['schema_versions'])
-    conn.commit()
+def _migrate_schema(conn, fingerprint):
+    """Bring the schema up to date; the caller holds ``MIGRATION_LOCK_PATH``"""
+    from migrations import migrate_in_place, rebuild_table
 
-    # Initialize all other tables from the schema
+    c = conn.cursor()
+    tables, _, hashes = read_schema_state(c)
+    c.execute("BEGIN IMMEDIATE")
+    # schema_versions comes first in TABLE_SCHEMAS, so it exists
+    # before any other table records its version
     for table_name, schema in TABLE_SCHEMAS.items():
-        if table_name == 'schema_versions':
+        if table_name in tables:
             continue
+        print(f"Creating table: {table_name}")
+        c.execute(schema)
+        if table_name != 'schema_versions':
+            _record_schema_version(c, table_name, schema)
 
-        # Check if table exists
-        c.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-        table_exists = c.fetchone() is not None
+    for migration in DATA_MIGRATIONS:
+        if migration(conn):
+            print(f"Applied migration: {migration.__name__}")
 
-        if not table_exists:
-            print(f"Creating table: {table_name}")
-            c.execute(schema)
-            conn.commit()
+    rebuilds = migrate_in_place(c, tables, hashes)
+    conn.commit()
 
-            # Store schema version
-            schema_hash = calculate_schema_hash(schema)
-            c.execute("""
-                INSERT INTO schema_versions (table_name, schema_hash, schema_definition)
-                VALUES (?, ?, ?)
-            """, (table_name, schema_hash, schema))
-            conn.commit()
+    # Rebuilds commit once per batch, so they run outside the
+    # transaction above, after a backup to fall back on
+    if rebuilds:
+        backup_database()
+    for table_name in rebuilds:
+        rebuild_table(conn, table_name)
+
+    c.execute("BEGIN IMMEDIATE")
+    for schema in INDEX_SCHEMAS.values():
+        c.execute(schema)
+    # Rebuilt tables lose their triggers, so always recreate them
+    for name, schema in TRIGGER_SCHEMAS.items():
+        c.execute(f"DROP TRIGGER IF EXISTS {name}")
+        c.execute(schema)
+    sync_search_index(c, tables, hashes, rebuilds)
+
+    _record_schema_version(c, SCHEMA_FINGERPRINT_KEY, '', fingerprint)
+    conn.commit()
+
+def init_db():
+    """Initialize the database with required tables.
+
+    Boot reads ``sqlite_master`` and ``schema_versions`` once. If the stored
+    schema fingerprint matches and every table and index exists, no DDL runs
+    at all. Otherwise missing tables, data migrations and in-place changes
+    from ``migrations.migrate_in_place`` are applied in one transaction, any
+    table that must be rebuilt is copied over in batches, and the indexes
+    and new fingerprint are written last. All of that happens under a file
+    lock, and the schema is checked again once it is held, so of several
+    processes starting at once only the first migrates.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+
+    # WAL is persistent in the database file, so it only needs setting once
+    journal_mode = c.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}").fetchone()[0]
+    print(f"Database journal mode: {journal_mode}")
+
+    fingerprint = schema_fingerprint()
+    if _schema_current(c, fingerprint):
+        print("Database schema is up to date")
+    else:
+        try:
+            # Workers booting together against an old schema would otherwise
+            # rebuild the same tables at once and drop each other's copies
+            with file_lock(MIGRATION_LOCK_PATH):
+                if _schema_current(c, fingerprint):
+                    print("Database schema was migrated by another process")
+                else:
+                    _migrate_schema(conn, fingerprint)
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.close()
+            raise
 
     # Check if users table is empty and needs default users
-    c.execute("SELECT COUNT(*) FROM users")
-    user_count = c.fetchone()[0]
+    c.execute("SELECT EXISTS (SELECT 1 FROM users)")
+    has_users = c.fetchone()[0]
 
-    if user_count == 0:
+    if not has_users:
         # Create default users
         from auth.models import hash_password
         
@@ -381,6 +1375,12 @@ def init_db():
                 INSERT INTO users (username, email, password_hash, role, status)
                 VALUES (?, ?, ?, ?, ?)
             """, ('admin', 'admin@clc.tz', admin_password_hash, 'admin', 'active'))
+            admin_id = c.lastrowid
+            from auth.models import login_keys_for
+            c.executemany(
+                "INSERT INTO login_keys (login_key, user_id) VALUES (?, ?)",
+                [(key, admin_id) for key in login_keys_for('admin', 'admin@clc.tz')]
+            )
             print(f"Created admin user - username: admin, password: {admin_password}")
 
             
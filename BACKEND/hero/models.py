@@ -1,81 +1,94 @@
 import sqlite3
-from db import get_connection
+from db import read_connection, write_connection, fetch_children, fetch_page, date_range, DEFAULT_PAGE_SIZE
+
+HERO_COLUMNS = ('id', 'headline', 'subheadline', 'ctaText', 'userMessage', 'botResponse', 'userName', 'status')
 
 def add_hero(headline, subheadline, ctaText, userMessage, botResponse, userName, options, status):
     """Adds a new hero section to the database."""
-    conn = get_connection()
-    c = conn.cursor()
+    with write_connection() as conn:
+        c = conn.cursor()
     
-    try:
-        # Insert hero data
-        c.execute("""
-            INSERT INTO hero (headline, subheadline, ctaText, userMessage, botResponse, userName, status) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (headline, subheadline, ctaText, userMessage, botResponse, userName, status))
+        try:
+            # Insert hero data
+            c.execute("""
+                INSERT INTO hero (headline, subheadline, ctaText, userMessage, botResponse, userName, status) 
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (headline, subheadline, ctaText, userMessage, botResponse, userName, status))
         
-        hero_id = c.lastrowid
+            hero_id = c.lastrowid
         
-        # Insert options
-        for option in options:
-            c.execute("""
-                INSERT INTO hero_options (hero_id, text, icon) 
-                VALUES (?, ?, ?)
-            """, (hero_id, option['text'], option['icon']))
+            # Insert options
+            for option in options:
+                c.execute("""
+                    INSERT INTO hero_options (hero_id, text, icon) 
+                    VALUES (?, ?, ?)
+                """, (hero_id, option['text'], option['icon']))
         
-        conn.commit()
-        return hero_id
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+            conn.commit()
+            return hero_id
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            raise
 
 def get_all_heroes():
     """Retrieves all hero sections with their options."""
-    conn = get_connection()
-    c = conn.cursor()
+    with read_connection() as conn:
+        c = conn.cursor()
     
-    try:
         # Get all hero data
         c.execute("SELECT * FROM hero ORDER BY id DESC")
         heroes = c.fetchall()
-        
-        results = []
-        for hero in heroes:
-            hero_id = hero[0]
-            # Get options for this hero
-            c.execute("SELECT id, text, icon FROM hero_options WHERE hero_id=?", (hero_id,))
-            options = [{"id": row[0], "text": row[1], "icon": row[2]} for row in c.fetchall()]
-            
-            results.append({
-                "id": hero_id,
-                "headline": hero[1],
-                "subheadline": hero[2],
-                "ctaText": hero[3],
-                "status": hero[7],
-                "chatData": {
-                    "userMessage": hero[4],
-                    "botResponse": hero[5],
-                    "userName": hero[6],
-                    "options": options
-                }
-            })
-        
-        return results
-    finally:
-        conn.close()
+    
+        return _heroes_with_options(c, heroes)
+
+def get_heroes_page(limit=DEFAULT_PAGE_SIZE, after=None, status=None, since=None, until=None):
+    """Retrieves one page of hero sections, newest first, and the next page's cursor."""
+    where, params = date_range('created_at', since, until)
+    if status is not None:
+        where.insert(0, "status = ?")
+        params.insert(0, status)
+    with read_connection() as conn:
+        c = conn.cursor()
+        heroes, next_cursor = fetch_page(
+            c, 'hero', HERO_COLUMNS, ('created_at', 'id'), where, params, limit=limit, after=after
+        )
+        return _heroes_with_options(c, heroes), next_cursor
+
+def _heroes_with_options(c, heroes):
+    """Format hero rows with their options, fetched in one query"""
+    options_by_hero = fetch_children(c, 'hero_options', 'hero_id', [hero[0] for hero in heroes], ('id', 'text', 'icon'))
+
+    results = []
+    for hero in heroes:
+        hero_id = hero[0]
+        options = [{"id": row[0], "text": row[1], "icon": row[2]} for row in options_by_hero[hero_id]]
+
+        results.append({
+            "id": hero_id,
+            "headline": hero[1],
+            "subheadline": hero[2],
+            "ctaText": hero[3],
+            "status": hero[7],
+            "chatData": {
+                "userMessage": hero[4],
+                "botResponse": hero[5],
+                "userName": hero[6],
+                "options": options
+            }
+        })
+
+    return results
 
 def get_hero():
     """Retrieves the hero section data."""
-    conn = get_connection()
-    c = conn.cursor()
+    with read_connection() as conn:
+        c = conn.cursor()
     
-    try:
         # Get hero data where status is active
         c.execute("SELECT * FROM hero WHERE status = 'active' ORDER BY id DESC LIMIT 1")
         hero = c.fetchone()
-        
+    
         if not hero:
             # Return default data if no hero exists
             return {
@@ -101,11 +114,11 @@ def get_hero():
                     ]
                 }
             }
-        
+    
         # Get options for this hero
         c.execute("SELECT id, text, icon FROM hero_options WHERE hero_id=?", (hero[0],))
         options = [{"id": row[0], "text": row[1], "icon": row[2]} for row in c.fetchall()]
-        
+    
         return {
             "id": hero[0],
             "headline": hero[1],
@@ -118,67 +131,61 @@ def get_hero():
                 "options": options
             }
         }
-    finally:
-        conn.close()
 
 def update_hero(hero_id, headline, subheadline, ctaText, userMessage, botResponse, userName, options, status):
     """Updates an existing hero section."""
-    conn = get_connection()
-    c = conn.cursor()
+    with write_connection() as conn:
+        c = conn.cursor()
     
-    try:
-        # Start transaction
-        c.execute("BEGIN TRANSACTION")
+        try:
+            # Start transaction
+            c.execute("BEGIN TRANSACTION")
         
-        # Verify hero exists
-        c.execute("SELECT id FROM hero WHERE id=?", (hero_id,))
-        if not c.fetchone():
-            raise ValueError(f"Hero with ID {hero_id} not found")
+            # Verify hero exists
+            c.execute("SELECT id FROM hero WHERE id=?", (hero_id,))
+            if not c.fetchone():
+                raise ValueError(f"Hero with ID {hero_id} not found")
         
-        # Update hero data
-        c.execute("""
-            UPDATE hero 
-            SET headline=?, subheadline=?, ctaText=?, userMessage=?, botResponse=?, userName=?, status=?, updated_at=CURRENT_TIMESTAMP 
-            WHERE id=?
-        """, (headline, subheadline, ctaText, userMessage, botResponse, userName, status, hero_id))
+            # Update hero data
+            c.execute("""
+                UPDATE hero 
+                SET headline=?, subheadline=?, ctaText=?, userMessage=?, botResponse=?, userName=?, status=?, updated_at=CURRENT_TIMESTAMP 
+                WHERE id=?
+            """, (headline, subheadline, ctaText, userMessage, botResponse, userName, status, hero_id))
         
-        # Delete existing options
-        c.execute("DELETE FROM hero_options WHERE hero_id=?", (hero_id,))
+            # Delete existing options
+            c.execute("DELETE FROM hero_options WHERE hero_id=?", (hero_id,))
         
-        # Insert new options
-        for option in options:
-            c.execute("""
-                INSERT INTO hero_options (hero_id, text, icon) 
-                VALUES (?, ?, ?)
-            """, (hero_id, option['text'], option['icon']))
+            # Insert new options
+            for option in options:
+                c.execute("""
+                    INSERT INTO hero_options (hero_id, text, icon) 
+                    VALUES (?, ?, ?)
+                """, (hero_id, option['text'], option['icon']))
         
-        # Commit transaction
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
+            # Commit transaction
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            raise
 
 def delete_hero(hero_id):
     """Deletes a hero section."""
-    conn = get_connection()
-    c = conn.cursor()
+    with write_connection() as conn:
+        c = conn.cursor()
     
-    try:
-        # Start transaction
-        c.execute("BEGIN TRANSACTION")
+        try:
+            # Start transaction
+            c.execute("BEGIN TRANSACTION")
         
-        # Delete options first due to foreign key constraint
-        c.execute("DELETE FROM hero_options WHERE hero_id=?", (hero_id,))
-        c.execute("DELETE FROM hero WHERE id=?", (hero_id,))
+            # Delete options first due to foreign key constraint
+            c.execute("DELETE FROM hero_options WHERE hero_id=?", (hero_id,))
+            c.execute("DELETE FROM hero WHERE id=?", (hero_id,))
         
-        # Commit transaction
-        conn.commit()
-    except sqlite3.Error as e:
-        print(f"Database error: {e}")
-        conn.rollback()
-        raise
-    finally:
-        conn.close() 
\ No newline at end of file
+            # Commit transaction
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            conn.rollback()
+            raise
\ No newline at end of file
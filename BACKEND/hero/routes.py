@@ -1,14 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import date
 from .models import (
     add_hero,
     get_hero,
     get_all_heroes,
+    get_heroes_page,
     update_hero,
     delete_hero
 )
 from auth.routes import require_auth
+from db import run_in_db, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+from cache import Snapshot, bump_version, snapshot_response
+from responses import FastJSONResponse
 
 router = APIRouter()
 
@@ -35,19 +40,34 @@ class HeroCreate(HeroBase):
 class HeroUpdate(HeroBase):
     pass
 
+hero_snapshot = Snapshot(('hero',), get_hero)
+
 @router.get("")
-async def get_hero_route():
-    return get_hero()
+async def get_hero_route(request: Request):
+    return await snapshot_response(request, hero_snapshot)
 
 @router.get("/all")
-async def get_all_heroes_route():
-    return get_all_heroes()
+async def get_all_heroes_route(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None
+):
+    # Without paging or filters keep returning the bare list
+    if limit is None and after is None and status is None and since is None and until is None:
+        return FastJSONResponse(await run_in_db(get_all_heroes))
+    heroes, next_cursor = await run_in_db(
+        get_heroes_page, limit or DEFAULT_PAGE_SIZE, after, status, since, until
+    )
+    return FastJSONResponse({"heroes": heroes, "next_cursor": next_cursor})
 
 @router.post("")
 async def create_hero(hero: HeroCreate, current_user = Depends(require_auth)):
     chat_data = hero.chatData
     
-    hero_id = add_hero(
+    hero_id = await run_in_db(
+        add_hero,
         hero.headline,
         hero.subheadline,
         hero.ctaText,
@@ -57,13 +77,15 @@ async def create_hero(hero: HeroCreate, current_user = Depends(require_auth)):
         [{"text": opt.text, "icon": opt.icon} for opt in chat_data.options],
         hero.status
     )
+    bump_version('hero')
     return {'id': hero_id, 'message': 'Hero added'}
 
 @router.put("/{hero_id}")
 async def update_hero_route(hero_id: int, hero: HeroUpdate, current_user = Depends(require_auth)):
     chat_data = hero.chatData
     
-    update_hero(
+    await run_in_db(
+        update_hero,
         hero_id,
         hero.headline,
         hero.subheadline,
@@ -74,9 +96,11 @@ async def update_hero_route(hero_id: int, hero: HeroUpdate, current_user = Depen
         [{"text": opt.text, "icon": opt.icon} for opt in chat_data.options],
         hero.status
     )
+    bump_version('hero')
     return {'message': 'Hero updated'}
 
 @router.delete("/{hero_id}")
 async def delete_hero_route(hero_id: int, current_user = Depends(require_auth)):
-    delete_hero(hero_id)
+    await run_in_db(delete_hero, hero_id)
+    bump_version('hero')
     return {'message': 'Hero deleted'}    
\ No newline at end of file
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Union
+from datetime import datetime, date
 from .models import (
     add_how,
     get_how,
     get_all_hows,
+    get_hows_page,
     update_how,
     delete_how
 )
 from auth.routes import require_auth
+from db import run_in_db, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+from cache import Snapshot, bump_version, snapshot_response
 
 router = APIRouter()
 
@@ -36,42 +40,66 @@ class HowResponse(HowBase):
     created_at: datetime
     updated_at: datetime
 
-@router.get("", response_model=HowResponse)
-async def get_how_route():
+class HowPage(BaseModel):
+    hows: List[HowResponse]
+    next_cursor: Optional[str]
+
+def build_how():
     result = get_how()
     if not result:
-        raise HTTPException(status_code=404, detail="How section not found")
-    return result
+        return None
+    # Keep the HowResponse serialization now that the route returns raw bytes
+    return jsonable_encoder(HowResponse(**result))
+
+how_snapshot = Snapshot(('how',), build_how, not_found="How section not found")
+
+@router.get("", response_model=HowResponse)
+async def get_how_route(request: Request):
+    return await snapshot_response(request, how_snapshot)
 
-@router.get("/all", response_model=List[HowResponse])
-async def get_all_hows_route():
-    return get_all_hows()
+@router.get("/all", response_model=Union[List[HowResponse], HowPage])
+async def get_all_hows_route(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None
+):
+    # Without paging or filters keep returning the bare list
+    if limit is None and after is None and since is None and until is None:
+        return await run_in_db(get_all_hows)
+    hows, next_cursor = await run_in_db(get_hows_page, limit or DEFAULT_PAGE_SIZE, after, since, until)
+    return {"hows": hows, "next_cursor": next_cursor}
 
 @router.post("")
 async def create_how(how: HowCreate, current_user = Depends(require_auth)):
-    how_id = add_how(
+    how_id = await run_in_db(
+        add_how,
         how.title,
         how.subtitle,
         [step.dict() for step in how.steps],
         how.status
     )
+    bump_version('how')
     return {'id': how_id, 'message': 'How section added'}
 
 @router.put("/{how_id}")
 async def update_how_route(how_id: int, how: HowUpdate, current_user = Depends(require_auth)):
     try:
-        update_how(
+        await run_in_db(
+            update_how,
             how_id,
             how.title,
             how.subtitle,
             [step.dict() for step in how.steps],
             how.status
         )
+        bump_version('how')
         return {'message': 'How section updated'}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.delete("/{how_id}")
 async def delete_how_route(how_id: int, current_user = Depends(require_auth)):
-    delete_how(how_id)
+    await run_in_db(delete_how, how_id)
+    bump_version('how')
     return {'message': 'How section deleted'} 
\ No newline at end of file
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import namedtuple
+from cache import SECTION_TABLES
+from responses import encode_json
+from table_versions import table_versions
+
+# Live update configuration
+LIVE_POLL_INTERVAL = float(os.getenv('LIVE_POLL_INTERVAL', '0.25'))  # seconds between version probes
+LIVE_HEARTBEAT = float(os.getenv('LIVE_HEARTBEAT', '15'))  # seconds between wake-ups with nothing new
+LIVE_MAX_SUBSCRIBERS = int(os.getenv('LIVE_MAX_SUBSCRIBERS', '20000'))
+# Sections announced to everyone; user accounts are not public
+LIVE_SECTIONS = tuple(section for section in SECTION_TABLES if section != 'users')
+
+logger = logging.getLogger(__name__)
+
+# One event, serialized once and shared by every subscriber: ``text`` for
+# WebSocket frames, ``event`` for the SSE stream. ``sequence`` orders events
+# across sections.
+LiveMessage = namedtuple('LiveMessage', ['section', 'version', 'sequence', 'text', 'event'])
+
+class Subscriber:
+    """A connected client: the sequence number of the newest event it was sent"""
+
+    __slots__ = ('seen',)
+
+    def __init__(self):
+        self.seen = 0
+
+class LiveHub:
+    """Fans "section X is now at version N" events out to live clients.
+
+    Every ``interval`` seconds the hub reads the table versions, which also
+    catches writes handled by other workers. A section's version is the sum
+    of its tables' counters, so it only ever goes up.
+
+    Nothing is queued per client. The hub keeps the newest event for each
+    section and wakes every waiting client through one shared
+    ``asyncio.Event``; each client then sends whatever it has not seen yet.
+    A client that falls behind therefore skips straight to the newest
+    version of each section, and its memory use stays flat however slowly it
+    reads. Stuck WebSocket clients are closed by uvicorn's ping timeout.
+    """
+
+    def __init__(self, interval=LIVE_POLL_INTERVAL, heartbeat=LIVE_HEARTBEAT, max_subscribers=LIVE_MAX_SUBSCRIBERS):
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._messages = {}
+        self._sequence = 0
+        self._changed = None
+        self._task = None
+        self._lock = threading.Lock()
+        self.broadcasts = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    def _section_versions(self):
+        versions = table_versions.check()
+        return {
+            section: sum(versions.get(table, 0) for table in SECTION_TABLES[section])
+            for section in LIVE_SECTIONS
+        }
+
+    def _wake(self):
+        """Wake every waiting client and start a fresh event for the next round"""
+        changed, self._changed = self._changed, asyncio.Event()
+        if changed is not None:
+            changed.set()
+
+    def poll(self):
+        """Publish an event for each section whose version moved; returns how many"""
+        published = 0
+        for section, version in self._section_versions().items():
+            current = self._messages.get(section)
+            if current is None or current.version != version:
+                self._sequence += 1
+                body = encode_json({'section': section, 'version': version})
+                self._messages[section] = LiveMessage(section, version, self._sequence,
+                                                      body.decode('utf-8'), b'data: ' + body + b'\n\n')
+                published += 1
+        if published:
+            with self._lock:
+                self.broadcasts += published
+            self._wake()
+        return published
+
+    def subscribe(self):
+        """Register a client, or return None when the hub is full.
+
+        Its first ``next`` returns the current version of every section.
+        """
+        if len(self._subscribers) >= self.max_subscribers:
+            with self._lock:
+                self.rejected += 1
+            return None
+        if not self._messages:
+            self.poll()
+        subscriber = Subscriber()
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self._subscribers.discard(subscriber)
+
+    async def next(self, subscriber):
+        """Wait for events ``subscriber`` has not seen and return them.
+
+        Returns an empty list when woken by the heartbeat with nothing new.
+        """
+        if subscriber.seen == self._sequence:
+            if self._changed is None:
+                self._changed = asyncio.Event()
+            await self._changed.wait()
+        messages = [message for message in self._messages.values() if message.sequence > subscriber.seen]
+        skipped = self._sequence - subscriber.seen - len(messages)
+        if skipped and subscriber.seen:
+            with self._lock:
+                self.coalesced += skipped
+        subscriber.seen = self._sequence
+        return messages
+
+    async def _loop(self):
+        since_wake = 0.0
+        while True:
+            try:
+                if self.poll():
+                    since_wake = 0.0
+                elif since_wake >= self.heartbeat:
+                    self._wake()
+                    since_wake = 0.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Live update poll failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+            since_wake += self.interval
+
+    def start(self):
+        """Start polling on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self):
+        """Stop polling and wait for the task to finish"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def stats(self):
+        """Return a snapshot of fan-out activity"""
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'broadcasts': self.broadcasts,
+                'coalesced': self.coalesced,
+                'rejected': self.rejected,
+                'versions': {section: message.version for section, message in self._messages.items()}
+            }
+
+live_hub = LiveHub()
@@ -0,0 +1,59 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, WebSocket
+from fastapi.responses import StreamingResponse
+from .hub import live_hub
+
+router = APIRouter()
+
+async def _send_events(websocket, subscriber):
+    try:
+        while True:
+            for message in await live_hub.next(subscriber):
+                await websocket.send_text(message.text)
+    except Exception:
+        # The socket is gone; live_socket notices and cleans up
+        pass
+
+@router.websocket("")
+async def live_socket(websocket: WebSocket):
+    """Push ``{"section": ..., "version": ...}`` whenever a content section changes.
+
+    The current version of every section is sent on connect. Clients only
+    listen; anything they send is ignored.
+    """
+    subscriber = live_hub.subscribe()
+    if subscriber is None:
+        # 1013: try again later
+        await websocket.close(code=1013)
+        return
+    await websocket.accept()
+    sender = asyncio.create_task(_send_events(websocket, subscriber))
+    try:
+        # Receiving is only how a disconnect is noticed
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        sender.cancel()
+        live_hub.unsubscribe(subscriber)
+
+@router.get("/events")
+async def live_events():
+    """Server-sent events version of the ``/live`` socket.
+
+    Sends the same events, plus a comment line whenever the hub's heartbeat
+    passes with nothing new, so proxies keep the stream open.
+    """
+    subscriber = live_hub.subscribe()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many live connections", headers={"Retry-After": "5"})
+
+    async def stream():
+        try:
+            while True:
+                messages = await live_hub.next(subscriber)
+                yield b''.join(message.event for message in messages) if messages else b': keep-alive\n\n'
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
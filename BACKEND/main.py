@@ -1,7 +1,18 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from db import init_db
+from fastapi.responses import JSONResponse, Response
+from responses import FastJSONResponse
+from compression import COMPRESSION_MIN_SIZE, DYNAMIC_GZIP_LEVEL, StreamingGZipMiddleware
+from db import init_db, close_pool, shutdown_db_executor, run_in_db, pool_stats, InvalidCursor
+from cache import SNAPSHOTS
+from metrics import PROMETHEUS_CONTENT_TYPE, MetricsMiddleware, metric_family, metrics
+from auth.passwords import PasswordQueueFull, password_pool
+from auth.token_reaper import token_reaper
+from auth.token_epochs import token_epochs
+from auth.session_cache import session_cache
+from backups import backup_scheduler
+from table_versions import table_versions
+from auth.models import AUTH_MODE
 from auth.routes import router as auth_router
 from service.routes import router as services_router
 from testimonial.routes import router as testimonials_router
@@ -10,6 +21,11 @@ from company.routes import router as company_router
 from announcements.routes import router as announcements_router
 from how.routes import router as how_router
 from webpages.routes import router as webpages_router
+from search.routes import router as search_router
+from changes.routes import router as changes_router
+from changes.compactor import change_log_compactor
+from live.routes import router as live_router
+from live.hub import live_hub
 import json
 import os
 import asyncio
@@ -84,7 +100,7 @@ def verify_token(token: str) -> Optional[dict]:
         logger.error(f"Error verifying token: {str(e)}")
         return None
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Initialize SQLite database
 init_db()
@@ -108,6 +124,14 @@ app.add_middleware(
     allow_headers=["Authorization", "Content-Type", "Accept", "Origin", "X-Requested-With"],
 )
 
+# Snapshot responses arrive already compressed and pass through untouched;
+# this covers everything else except the live event stream
+app.add_middleware(StreamingGZipMiddleware, exclude_paths=("/live",),
+                   minimum_size=COMPRESSION_MIN_SIZE, compresslevel=DYNAMIC_GZIP_LEVEL)
+
+# Added last so it is outermost and times the whole stack
+app.add_middleware(MetricsMiddleware, exclude_paths=("/live",))
+
 # Include all routes
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
 app.include_router(services_router, prefix="/services", tags=["services"])
@@ -117,6 +141,49 @@ app.include_router(company_router, prefix="/company-details", tags=["company-det
 app.include_router(announcements_router, prefix="/announcements", tags=["announcements"])
 app.include_router(how_router, prefix="/how", tags=["how"])
 app.include_router(webpages_router, prefix="/webpages", tags=["webpages"])
+app.include_router(search_router, prefix="/search", tags=["search"])
+app.include_router(changes_router, prefix="/changes", tags=["changes"])
+app.include_router(live_router, prefix="/live", tags=["live"])
+
+@app.exception_handler(InvalidCursor)
+async def invalid_cursor_handler(request, exc):
+    """Reject pagination cursors that were not issued by this API"""
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(PasswordQueueFull)
+async def password_queue_full_handler(request, exc):
+    """Shed load when the bcrypt pool is saturated"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many authentication requests, please retry shortly"},
+        headers={"Retry-After": "1"}
+    )
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Start the expired-token reaper, change log compaction, live updates and scheduled backups"""
+    token_reaper.start()
+    change_log_compactor.start()
+    live_hub.start()
+    backup_scheduler.start()
+
+@app.on_event("startup")
+async def load_token_epochs():
+    """Load the token epoch map before the first stateless request arrives"""
+    if AUTH_MODE == 'stateless':
+        await run_in_db(token_epochs.reload)
+
+@app.on_event("shutdown")
+async def shutdown_db_pool():
+    """Close pooled database connections on shutdown"""
+    await token_reaper.stop()
+    await change_log_compactor.stop()
+    await live_hub.stop()
+    await backup_scheduler.stop()
+    shutdown_db_executor()
+    close_pool()
+    table_versions.close()
+    password_pool.shutdown()
 
 @app.get("/generate-test-token")
 async def generate_test_token():
@@ -148,6 +215,49 @@ async def root():
 
     return status
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Request, database, cache and worker pool metrics for this worker process,
+    in the Prometheus text format
+    """
+    pools = pool_stats()
+    passwords = password_pool.stats()
+    sessions = session_cache.stats()
+    versions = table_versions.stats()
+    snapshots = [(snapshot.name, snapshot.stats()) for snapshot in SNAPSHOTS]
+    body = ''.join((
+        metrics.render(),
+        metric_family('db_pool_connections', 'gauge', 'Pooled SQLite connections by state',
+                      [({'pool': pool, 'state': state}, stats[state])
+                       for pool, stats in pools.items() for state in ('idle', 'in_use')]),
+        metric_family('db_pool_max_connections', 'gauge', 'Most connections each pool may open',
+                      [({'pool': pool}, stats['max_size']) for pool, stats in pools.items()]),
+        metric_family('cache_requests_total', 'counter', 'Cache lookups by result',
+                      [({'cache': 'session', 'result': 'hit'}, sessions['hits']),
+                       ({'cache': 'session', 'result': 'miss'}, sessions['misses'])]
+                      + [({'cache': f'snapshot:{name}', 'result': result}, stats[key])
+                         for name, stats in snapshots for result, key in (('hit', 'hits'), ('miss', 'rebuilds'))]),
+        metric_family('cache_entries', 'gauge', 'Entries held by the session cache',
+                      [({'cache': 'session'}, sessions['size'])]),
+        metric_family('table_version_probes_total', 'counter', 'Checks for writes by any worker, by result',
+                      [({'result': 'unchanged'}, versions['probes'] - versions['reloads']),
+                       ({'result': 'reload'}, versions['reloads']),
+                       ({'result': 'skipped'}, versions['skipped'])]),
+        metric_family('password_queue_depth', 'gauge', 'bcrypt operations waiting for a worker',
+                      [({}, passwords['queued'])]),
+        metric_family('password_workers_active', 'gauge', 'bcrypt operations running',
+                      [({}, passwords['active'])]),
+        metric_family('password_workers', 'gauge', 'bcrypt worker threads',
+                      [({}, passwords['workers'])]),
+        metric_family('password_operations_total', 'counter', 'bcrypt operations by outcome',
+                      [({'result': 'completed'}, passwords['completed']),
+                       ({'result': 'rejected'}, passwords['rejected'])]),
+        metric_family('live_subscribers', 'gauge', 'Open /live connections',
+                      [({}, live_hub.stats()['subscribers'])]),
+    ))
+    return Response(body, media_type=PROMETHEUS_CONTENT_TYPE)
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -162,6 +272,9 @@ if __name__ == "__main__":
         timeout_keep_alive=30,
         ws_ping_interval=20,
         ws_ping_timeout=30,
+        # Live events are a few dozen bytes; a deflate context per socket
+        # costs ~100 KiB for nothing
+        ws_per_message_deflate=False,
         reload=True,  # Enable auto-reload for development
         reload_dirs=["BACKEND"],  # Watch the BACKEND directory for changes
         reload_includes=["*.py", "*.json"],  # Watch Python and JSON files
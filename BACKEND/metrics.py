@@ -0,0 +1,272 @@
+import bisect
+import contextvars
+import logging
+import os
+import time
+
+# Upper bounds of the request latency buckets, in seconds
+METRICS_LATENCY_BUCKETS = tuple(
+    float(bound) for bound in os.getenv('METRICS_LATENCY_BUCKETS', '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10').split(',')
+)
+# Upper bounds of the queries-per-request buckets
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# A request running the same SQL text this many times is flagged as an N+1
+# pattern; 0 turns the check off
+REPEATED_QUERY_THRESHOLD = int(os.getenv('REPEATED_QUERY_THRESHOLD', '5'))
+# Development aid: add an X-SQL-Queries header summarizing each request's SQL
+SQL_DEBUG_HEADER = os.getenv('SQL_DEBUG_HEADER', '').lower() in ('1', 'true', 'yes')
+# Route label for requests that matched no route, so stray paths add no series
+UNMATCHED_ROUTE = '<unmatched>'
+# Starlette appends the charset
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+logger = logging.getLogger(__name__)
+
+_request = contextvars.ContextVar('metrics_request', default=None)
+_db_call = contextvars.ContextVar('metrics_db_call', default=None)
+
+class DbCall:
+    """Counters for one ``run_in_db`` call.
+
+    Only the worker thread running the call writes to it; the event loop
+    reads it once the call has returned.
+    """
+
+    __slots__ = ('queries', 'statements', 'seconds', 'wait', '_submitted')
+
+    def __init__(self):
+        self.queries = 0
+        # SQL text -> [executions, seconds, rows]
+        self.statements = {}
+        self.seconds = 0.0
+        self.wait = 0.0
+        self._submitted = time.perf_counter()
+
+    def run(self, func, *args, **kwargs):
+        """Run ``func`` on the current worker thread, counting its queries"""
+        started = time.perf_counter()
+        self.wait = started - self._submitted
+        _db_call.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.seconds = time.perf_counter() - started
+
+class RequestStats:
+    """Database work done for one request so far"""
+
+    __slots__ = ('queries', 'statements', 'db_seconds', 'db_wait')
+
+    def __init__(self):
+        self.queries = 0
+        self.statements = {}
+        self.db_seconds = 0.0
+        self.db_wait = 0.0
+
+    def add_db_call(self, call):
+        self.queries += call.queries
+        self.db_seconds += call.seconds
+        self.db_wait += call.wait
+        for sql, (count, seconds, rows) in call.statements.items():
+            totals = self.statements.get(sql)
+            if totals is None:
+                self.statements[sql] = [count, seconds, rows]
+            else:
+                totals[0] += count
+                totals[1] += seconds
+                totals[2] += rows
+
+    def repeated(self, threshold=REPEATED_QUERY_THRESHOLD):
+        """``{sql: executions}`` for statements run at least ``threshold`` times"""
+        if threshold <= 0:
+            return {}
+        return {sql: totals[0] for sql, totals in self.statements.items() if totals[0] >= threshold}
+
+    def summary(self):
+        """One-line summary for the X-SQL-Queries header"""
+        seconds = sum(totals[1] for totals in self.statements.values())
+        rows = sum(totals[2] for totals in self.statements.values())
+        return (f"queries={self.queries}; distinct={len(self.statements)}; rows={rows}; "
+                f"sql_ms={seconds * 1000:.2f}; repeated={len(self.repeated())}")
+
+def current_request():
+    """Stats of the request being handled, or None outside a request"""
+    return _request.get()
+
+def record_statement(sql):
+    """Count one statement against the DB call running on this thread.
+
+    Returns the statement's ``[executions, seconds, rows]`` totals so the
+    cursor can add its timing and row count, or None outside a DB call.
+    """
+    call = _db_call.get()
+    if call is None:
+        return None
+    call.queries += 1
+    totals = call.statements.get(sql)
+    if totals is None:
+        totals = call.statements[sql] = [0, 0.0, 0]
+    totals[0] += 1
+    return totals
+
+class RouteStats:
+    __slots__ = ('latency', 'latency_sum', 'queries', 'queries_sum', 'db_seconds', 'db_wait', 'db_rows',
+                 'repeated', 'statuses')
+
+    def __init__(self, latency_buckets, query_buckets):
+        # Per-bucket counts plus a final +Inf bucket; made cumulative on render
+        self.latency = [0] * (len(latency_buckets) + 1)
+        self.latency_sum = 0.0
+        self.queries = [0] * (len(query_buckets) + 1)
+        self.queries_sum = 0
+        self.db_seconds = 0.0
+        self.db_wait = 0.0
+        self.db_rows = 0
+        self.repeated = 0
+        self.statuses = {}
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def metric_family(name, kind, help_text, samples):
+    """Prometheus text for one metric: ``samples`` holds ``(labels, value)`` pairs"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+    lines += [f'{name}{_labels(labels)} {_number(value)}' for labels, value in samples]
+    return '\n'.join(lines) + '\n'
+
+def _histogram(name, help_text, bounds, series):
+    """Histogram text; ``series`` holds ``(labels, counts, total)`` per label set"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for labels, counts, total in series:
+        cumulative = 0
+        for bound, count in zip(tuple(bounds) + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels({**labels, "le": _number(bound)})} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {_number(total)}')
+        lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+class Metrics:
+    """Per-route request metrics for this worker process.
+
+    Requests are recorded by ``MetricsMiddleware`` and rendered by the
+    ``/metrics`` endpoint, both on the event loop thread, so plain counters
+    are enough and nothing on the request path takes a lock. DB worker
+    threads only write to their own ``DbCall``. Each worker process keeps
+    its own numbers; Prometheus sums them across scrapes of each worker.
+    """
+
+    def __init__(self, latency_buckets=METRICS_LATENCY_BUCKETS, query_buckets=METRICS_QUERY_BUCKETS):
+        self.latency_buckets = latency_buckets
+        self.query_buckets = query_buckets
+        self.routes = {}
+        self.in_flight = 0
+        # (method, route, sql) already logged as repeated, so a hot route
+        # does not log the same warning on every request
+        self._reported = set()
+
+    def record(self, method, route, status, seconds, request):
+        """Add one finished request"""
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = RouteStats(self.latency_buckets, self.query_buckets)
+        stats.latency[bisect.bisect_left(self.latency_buckets, seconds)] += 1
+        stats.latency_sum += seconds
+        stats.queries[bisect.bisect_left(self.query_buckets, request.queries)] += 1
+        stats.queries_sum += request.queries
+        stats.db_seconds += request.db_seconds
+        stats.db_wait += request.db_wait
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if request.statements:
+            stats.db_rows += sum(totals[2] for totals in request.statements.values())
+            for sql, count in request.repeated().items():
+                stats.repeated += 1
+                if (method, route, sql) not in self._reported:
+                    self._reported.add((method, route, sql))
+                    logger.warning(f"{method} {route} ran the same statement {count} times in one request "
+                                   f"(possible N+1 query): {' '.join(sql.split())}")
+
+    def render(self):
+        """Prometheus text for the request metrics"""
+        routes = sorted(self.routes.items())
+        labels = [({'method': method, 'route': route}, stats) for (method, route), stats in routes]
+        return ''.join((
+            metric_family('http_requests_total', 'counter', 'Requests handled, by route template and status',
+                          [({**key, 'status': status}, count)
+                           for key, stats in labels for status, count in sorted(stats.statuses.items())]),
+            metric_family('http_requests_in_flight', 'gauge', 'Requests being handled right now',
+                          [({}, self.in_flight)]),
+            _histogram('http_request_duration_seconds', 'Time to handle a request, by route template',
+                       self.latency_buckets, [(key, stats.latency, stats.latency_sum) for key, stats in labels]),
+            _histogram('http_request_db_queries', 'SQL statements executed per request, by route template',
+                       self.query_buckets, [(key, stats.queries, stats.queries_sum) for key, stats in labels]),
+            metric_family('http_request_db_seconds_total', 'counter',
+                          'Time spent running database calls, by route template',
+                          [(key, stats.db_seconds) for key, stats in labels]),
+            metric_family('http_request_db_wait_seconds_total', 'counter',
+                          'Time database calls waited for a DB executor thread, by route template',
+                          [(key, stats.db_wait) for key, stats in labels]),
+            metric_family('http_request_db_rows_total', 'counter',
+                          'Rows fetched or changed by SQL statements, by route template',
+                          [(key, stats.db_rows) for key, stats in labels]),
+            metric_family('http_request_repeated_statements_total', 'counter',
+                          f'Statements run {REPEATED_QUERY_THRESHOLD} or more times within one request, '
+                          'by route template',
+                          [(key, stats.repeated) for key, stats in labels]),
+        ))
+
+metrics = Metrics()
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request into ``metrics``.
+
+    Requests are labelled with the template of the route they matched, e.g.
+    ``/hero/{hero_id}``. Long-lived streams under ``exclude_paths`` are
+    left out so they do not swamp the latency buckets. With
+    ``SQL_DEBUG_HEADER`` set, each response carries an ``X-SQL-Queries``
+    header summarizing the SQL run before its headers were sent.
+    """
+
+    def __init__(self, app, exclude_paths=()):
+        self.app = app
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exclude_paths):
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        request = RequestStats()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if SQL_DEBUG_HEADER:
+                    message["headers"] = [*message.get("headers", ()),
+                                          (b"x-sql-queries", request.summary().encode("latin-1"))]
+            await send(message)
+
+        token = _request.set(request)
+        metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - start
+            metrics.in_flight -= 1
+            _request.reset(token)
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            metrics.record(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status, seconds, request)
@@ -0,0 +1,265 @@
+import os
+import re
+from collections import namedtuple
+from db import (
+    TABLE_SCHEMAS,
+    get_drop_order,
+    _clean_schema,
+    _hash_matches,
+    _record_schema_version,
+)
+
+# Rows copied per transaction when a table has to be rebuilt
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '5000'))
+
+_CONSTRAINT_KEYWORDS = ('constraint', 'primary', 'unique', 'check', 'foreign')
+# Defaults that ALTER TABLE ADD COLUMN refuses
+_NON_CONSTANT_DEFAULT = re.compile(r"default(current_|\()")
+
+TableShape = namedtuple('TableShape', ['columns', 'constraints', 'options'])
+
+def _split_top_level(body):
+    """Split a column list on commas that are not inside parens or quotes"""
+    items, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(body):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            items.append(body[start:i])
+            start = i + 1
+    items.append(body[start:])
+    return [item.strip() for item in items if item.strip()]
+
+def parse_table_sql(sql):
+    """Break a CREATE TABLE statement into columns, table constraints and options.
+
+    ``columns`` maps each column name to ``(definition, normalized)`` in
+    declaration order; ``normalized`` ignores case and whitespace.
+    """
+    start = sql.index('(')
+    depth = 0
+    for end in range(start, len(sql)):
+        if sql[end] == '(':
+            depth += 1
+        elif sql[end] == ')':
+            depth -= 1
+            if depth == 0:
+                break
+    columns = {}
+    constraints = []
+    for item in _split_top_level(sql[start + 1:end]):
+        normalized = _clean_schema(item)
+        first_word = item.split(None, 1)[0].lower()
+        if first_word in _CONSTRAINT_KEYWORDS:
+            constraints.append(normalized)
+        else:
+            columns[first_word.strip('"`[]')] = (item, normalized)
+    return TableShape(columns, tuple(sorted(constraints)), _clean_schema(sql[end + 1:]))
+
+def _can_add_column(normalized):
+    """Whether ALTER TABLE ADD COLUMN accepts this column definition"""
+    if 'primarykey' in normalized or 'unique' in normalized:
+        return False
+    if _NON_CONSTANT_DEFAULT.search(normalized):
+        return False
+    if 'notnull' in normalized and ('default' not in normalized or 'defaultnull' in normalized):
+        return False
+    return True
+
+def extra_columns(live, expected):
+    """Definitions of live columns that ``expected`` does not declare, in table order"""
+    return [definition for name, (definition, _) in live.columns.items() if name not in expected.columns]
+
+def diff_table(live_sql, expected_sql):
+    """Compare a live table with its definition in ``TABLE_SCHEMAS``.
+
+    Returns ``('same', [])`` when they match, ``('add', definitions)`` when
+    the only change is new trailing columns that ``ADD COLUMN`` can append,
+    and ``('rebuild', [])`` otherwise. Live columns the definition does not
+    declare are left alone; they never force a rebuild.
+    """
+    live = parse_table_sql(live_sql)
+    expected = parse_table_sql(expected_sql)
+    if live.constraints != expected.constraints or live.options != expected.options:
+        return 'rebuild', []
+
+    expected_names = list(expected.columns)
+    shared = [name for name in live.columns if name in expected.columns]
+    # Column order matters to models that read rows by position, and
+    # ADD COLUMN can only append
+    if expected_names[:len(shared)] != shared:
+        return 'rebuild', []
+    if any(live.columns[name][1] != expected.columns[name][1] for name in shared):
+        return 'rebuild', []
+
+    added = [expected.columns[name] for name in expected_names[len(shared):]]
+    if not added:
+        return 'same', []
+    if not all(_can_add_column(normalized) for _, normalized in added):
+        return 'rebuild', []
+    return 'add', [definition for definition, _ in added]
+
+def migration_order():
+    """Tables ordered parents first"""
+    return get_drop_order()[::-1]
+
+def migrate_in_place(cursor, tables, hashes):
+    """Apply every change that does not need a table rebuild.
+
+    Runs inside the caller's transaction. Existing tables whose recorded
+    hash no longer matches ``TABLE_SCHEMAS`` are diffed against the live
+    definition; new trailing columns are added with ``ALTER TABLE ADD
+    COLUMN`` and the new version is recorded. Returns the tables that still
+    need ``rebuild_table``, parents first.
+    """
+    stale = [
+        table_name for table_name in migration_order()
+        if table_name in tables and not _hash_matches(hashes.get(table_name), TABLE_SCHEMAS[table_name])
+    ]
+    if not stale:
+        return []
+
+    placeholders = ', '.join('?' * len(stale))
+    cursor.execute(f"SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})", stale)
+    live_sql = dict(cursor.fetchall())
+
+    rebuilds = []
+    for table_name in stale:
+        schema = TABLE_SCHEMAS[table_name]
+        action, definitions = diff_table(live_sql[table_name], schema)
+        if action == 'rebuild':
+            rebuilds.append(table_name)
+            continue
+        for definition in definitions:
+            print(f"Adding column to {table_name}: {definition}")
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {definition}")
+        _record_schema_version(cursor, table_name, schema)
+    return rebuilds
+
+def _drop_rebuild_objects(cursor, table_name):
+    for event in ('insert', 'update', 'delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}__capture_{event}")
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}__rebuild")
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}__changes")
+
+def rebuild_table(conn, table_name, batch_size=MIGRATION_BATCH_SIZE):
+    """Rebuild a table to match ``TABLE_SCHEMAS`` without one long write lock.
+
+    Rows are copied into ``<table>__rebuild`` ``batch_size`` at a time, one
+    transaction per batch, while triggers log the rowids of rows written in
+    the meantime. A final transaction re-copies the logged rows, swaps the
+    tables and records the new version. New columns take their defaults.
+    Live columns the definition does not declare are kept, appended after
+    the declared ones; if one cannot be appended the rebuild is refused
+    rather than drop its data. Indexes are not carried over and are
+    recreated from ``INDEX_SCHEMAS`` by ``init_db``. ``init_db`` backs the
+    database up before calling this, and holds the migration lock
+    throughout, since the scratch tables have fixed names.
+    """
+    schema = TABLE_SCHEMAS[table_name]
+    c = conn.cursor()
+    c.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,))
+    live = parse_table_sql(c.fetchone()[0])
+    expected = parse_table_sql(schema)
+    extras = extra_columns(live, expected)
+    unsupported = [definition for definition in extras if not _can_add_column(_clean_schema(definition))]
+    if unsupported:
+        raise RuntimeError(f"Cannot rebuild {table_name} without losing columns not in its schema: "
+                           f"{', '.join(unsupported)}; add them to TABLE_SCHEMAS")
+    columns = ', '.join([name for name in expected.columns if name in live.columns]
+                        + [name for name in live.columns if name not in expected.columns])
+    new_table = f"{table_name}__rebuild"
+    changes = f"{table_name}__changes"
+    new_schema = re.sub(rf"\b{table_name}\b", new_table, schema, count=1)
+    without_rowid = 'withoutrowid' in expected.options or 'withoutrowid' in live.options
+    print(f"Rebuilding table: {table_name}")
+
+    # Renaming the copy over a parent table needs foreign keys off
+    c.execute("PRAGMA foreign_keys = OFF")
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        _drop_rebuild_objects(c, table_name)
+        c.execute(new_schema)
+        for definition in extras:
+            print(f"Keeping column not in the schema of {table_name}: {definition}")
+            c.execute(f"ALTER TABLE {new_table} ADD COLUMN {definition}")
+        if not without_rowid:
+            c.execute(f"CREATE TABLE {changes} (rid INTEGER PRIMARY KEY)")
+            c.execute(f"""
+                CREATE TRIGGER {table_name}__capture_insert AFTER INSERT ON {table_name}
+                BEGIN INSERT OR IGNORE INTO {changes} (rid) VALUES (NEW.rowid); END
+            """)
+            c.execute(f"""
+                CREATE TRIGGER {table_name}__capture_update AFTER UPDATE ON {table_name}
+                BEGIN
+                    INSERT OR IGNORE INTO {changes} (rid) VALUES (OLD.rowid);
+                    INSERT OR IGNORE INTO {changes} (rid) VALUES (NEW.rowid);
+                END
+            """)
+            c.execute(f"""
+                CREATE TRIGGER {table_name}__capture_delete AFTER DELETE ON {table_name}
+                BEGIN INSERT OR IGNORE INTO {changes} (rid) VALUES (OLD.rowid); END
+            """)
+        conn.commit()
+
+        copied = 0
+        if not without_rowid:
+            last_rowid = None
+            while True:
+                c.execute("BEGIN IMMEDIATE")
+                where = "" if last_rowid is None else "WHERE rowid > ?"
+                params = () if last_rowid is None else (last_rowid,)
+                c.execute(f"""
+                    SELECT MAX(rowid), COUNT(*) FROM (
+                        SELECT rowid FROM {table_name} {where} ORDER BY rowid LIMIT ?
+                    )
+                """, params + (batch_size,))
+                batch_end, count = c.fetchone()
+                if not count:
+                    conn.commit()
+                    break
+                c.execute(f"""
+                    INSERT OR REPLACE INTO {new_table} (rowid, {columns})
+                    SELECT rowid, {columns} FROM {table_name}
+                    WHERE {'rowid > ? AND ' if last_rowid is not None else ''}rowid <= ?
+                """, params + (batch_end,))
+                conn.commit()
+                copied += count
+                last_rowid = batch_end
+
+        c.execute("BEGIN IMMEDIATE")
+        if without_rowid:
+            c.execute(f"INSERT INTO {new_table} ({columns}) SELECT {columns} FROM {table_name}")
+        else:
+            # Catch up on rows written since their batch was copied
+            c.execute(f"DELETE FROM {new_table} WHERE rowid IN (SELECT rid FROM {changes})")
+            c.execute(f"""
+                INSERT INTO {new_table} (rowid, {columns})
+                SELECT rowid, {columns} FROM {table_name}
+                WHERE rowid IN (SELECT rid FROM {changes})
+            """)
+        c.execute(f"DROP TABLE {table_name}")
+        c.execute(f"DROP TABLE IF EXISTS {changes}")
+        c.execute(f"ALTER TABLE {new_table} RENAME TO {table_name}")
+        _record_schema_version(c, table_name, schema)
+        conn.commit()
+        print(f"Rebuilt table {table_name} ({copied} rows copied in batches of {batch_size})")
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        _drop_rebuild_objects(c, table_name)
+        conn.commit()
+        raise
+    finally:
+        c.execute("PRAGMA foreign_keys = ON")
+
+    violations = c.execute(f"PRAGMA foreign_key_check({table_name})").fetchall()
+    if violations:
+        print(f"Warning: {len(violations)} foreign key violations in {table_name} after rebuild")
@@ -0,0 +1,20 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+# Integer dict keys are written as strings, as the json module does
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def encode_json(payload):
+    """Serialize a payload to compact UTF-8 JSON bytes"""
+    return orjson.dumps(payload, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    Used as the application's default response class. Routes that build
+    plain dicts, lists, strings and numbers can return one directly, which
+    also skips FastAPI's ``jsonable_encoder`` pass over the payload.
+    """
+
+    def render(self, content) -> bytes:
+        return encode_json(content)
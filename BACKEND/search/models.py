@@ -0,0 +1,67 @@
+import re
+from db import read_connection, SEARCH_SOURCES, SEARCH_ROWID_STRIDE, DEFAULT_PAGE_SIZE
+
+SEARCH_TYPES = tuple(source.doc_type for source in SEARCH_SOURCES)
+_TYPE_CODES = {source.doc_type: source.code for source in SEARCH_SOURCES}
+# Markers around matched terms in snippets
+SNIPPET_OPEN = '<mark>'
+SNIPPET_CLOSE = '</mark>'
+SNIPPET_TOKENS = 24
+# bm25 column weights: a match in the title counts for more than one in the body
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+_TERM = re.compile(r'\w+\*?')
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query that matches every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in user input are
+    taken literally. A word ending in ``*`` matches as a prefix. Returns None
+    when the text has no words.
+    """
+    terms = []
+    for term in _TERM.findall(text):
+        word = term.rstrip('*')
+        terms.append(f'"{word}"*' if term.endswith('*') else f'"{word}"')
+    return ' '.join(terms) or None
+
+def search(text, types=None, limit=DEFAULT_PAGE_SIZE):
+    """Return the best matching documents for ``text``, best first.
+
+    ``types`` restricts the hits to some of ``SEARCH_TYPES``. Each hit has
+    the document type and id, the parent id (the service of an offering),
+    the title and a snippet of the body around the matches.
+    """
+    query = build_match_query(text)
+    if query is None:
+        return []
+
+    where, params = ["search_index MATCH ?"], [query]
+    if types:
+        # The type is encoded in the rowid; filtering on doc_type would read
+        # every matching row's stored content
+        where.append(f"rowid % {SEARCH_ROWID_STRIDE} IN ({', '.join('?' * len(types))})")
+        params.extend(_TYPE_CODES[doc_type] for doc_type in types)
+    with read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT doc_type, doc_id, parent_id, title,
+                   snippet(search_index, 1, ?, ?, '…', ?),
+                   bm25(search_index, ?, ?) AS score
+            FROM search_index
+            WHERE {' AND '.join(where)}
+            ORDER BY score
+            LIMIT ?
+        """, [SNIPPET_OPEN, SNIPPET_CLOSE, SNIPPET_TOKENS, TITLE_WEIGHT, BODY_WEIGHT, *params, limit]).fetchall()
+
+    return [
+        {
+            "type": doc_type,
+            "id": doc_id,
+            "parent_id": parent_id,
+            "title": title,
+            "snippet": snippet,
+            "score": -score
+        }
+        for doc_type, doc_id, parent_id, title, snippet, score in rows
+    ]
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Query
+from typing import List, Literal, Optional
+from .models import search, SEARCH_TYPES
+from db import run_in_db, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+from responses import FastJSONResponse
+
+router = APIRouter()
+
+@router.get("")
+async def search_route(
+    q: str = Query(..., min_length=1, max_length=200),
+    type: Optional[List[Literal[SEARCH_TYPES]]] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Full-text search over announcements, services, offerings and testimonials.
+
+    Words must all match; end a word with ``*`` to match it as a prefix.
+    Repeat ``type`` to search only some kinds of content.
+    """
+    hits = await run_in_db(search, q, type, limit)
+    return FastJSONResponse({"query": q, "results": hits})
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
 from typing import List, Optional
 from .models import (
@@ -8,6 +8,8 @@ from .models import (
     delete_service
 )
 from auth.routes import require_auth
+from db import run_in_db
+from cache import Snapshot, bump_version, snapshot_response
 
 router = APIRouter()
 
@@ -22,13 +24,16 @@ class ServiceCreate(BaseModel):
 class ServiceUpdate(ServiceCreate):
     pass
 
+services_snapshot = Snapshot(('services',), get_all_services)
+
 @router.get("")
-async def list_services():
-    return get_all_services()
+async def list_services(request: Request):
+    return await snapshot_response(request, services_snapshot)
 
 @router.post("")
 async def create_service(service: ServiceCreate, current_user = Depends(require_auth)):
-    service_id = add_service(
+    service_id = await run_in_db(
+        add_service,
         service.title,
         service.description,
         service.videoThumbnail,
@@ -36,11 +41,13 @@ async def create_service(service: ServiceCreate, current_user = Depends(require_
         service.offerings,
         service.status
     )
+    bump_version('services')
     return {'id': service_id, 'message': 'Service added'}
 
 @router.put("/{service_id}")
 async def update_service_route(service_id: int, service: ServiceUpdate, current_user = Depends(require_auth)):
-    update_service(
+    await run_in_db(
+        update_service,
         service_id,
         service.title,
         service.description,
@@ -49,9 +56,11 @@ async def update_service_route(service_id: int, service: ServiceUpdate, current_
         service.offerings,
         service.status
     )
+    bump_version('services')
     return {'message': 'Service updated'}
 
 @router.delete("/{service_id}")
 async def delete_service_route(service_id: int, current_user = Depends(require_auth)):
-    delete_service(service_id)
+    await run_in_db(delete_service, service_id)
+    bump_version('services')
     return {'message': 'Service deleted'}
@@ -14,6 +14,8 @@ setup(
         "pyjwt==2.8.0",
         "passlib[bcrypt]==1.7.4",
         "python-multipart==0.0.6",
-        "email-validator==2.1.0.post1"
+        "email-validator==2.1.0.post1",
+        "orjson==3.9.10",
+        "brotli==1.1.0"
     ],
 ) 
\ No newline at end of file
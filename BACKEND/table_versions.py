@@ -0,0 +1,122 @@
+import sqlite3
+import threading
+from db import DB_PATH, READ_PRAGMAS, apply_pragmas
+
+# The probe runs on the event loop, so it must never wait on a lock
+PROBE_PRAGMAS = READ_PRAGMAS + ("PRAGMA busy_timeout = 0",)
+
+class TableVersions:
+    """This worker's view of the ``table_versions`` registry.
+
+    Triggers bump a table's counter on every insert, update and delete, from
+    any process. ``check`` first probes ``PRAGMA data_version`` on a private
+    connection; it changes whenever any other connection, in this worker or
+    another one, commits. Only then is the registry re-read, and listeners
+    registered with ``on_change`` are called for the tables that moved.
+    Alongside each counter the registry keeps the time of the table's last
+    write, which every worker reads alike and which deletes move forward
+    too.
+
+    ``check`` is called on the event loop, so it never waits: if another
+    thread is already probing, or SQLite reports the database busy, it
+    returns the versions it last read and tries again on the next call.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._data_version = None
+        self._versions = {}
+        self._changed_at = {}
+        self._listeners = []
+        self.probes = 0
+        self.reloads = 0
+        self.skipped = 0
+
+    def _connection(self):
+        if self._conn is None:
+            # Probed from the event loop and DB worker threads alike, always
+            # under self._lock
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn = apply_pragmas(conn, PROBE_PRAGMAS)
+        return self._conn
+
+    def check(self):
+        """Return the current versions, re-reading them if anything committed"""
+        if not self._lock.acquire(blocking=False):
+            # Another thread is probing right now; its result is at most a
+            # moment newer than the last one. Counted without the lock, so
+            # the count is approximate.
+            self.skipped += 1
+            return self._versions
+        try:
+            conn = self._connection()
+            try:
+                data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+                self.probes += 1
+                if data_version == self._data_version:
+                    return self._versions
+                # Probe first: a commit between the two reads only causes one
+                # extra reload on the next check
+                rows = conn.execute("SELECT table_name, version, changed_at FROM table_versions").fetchall()
+            except sqlite3.OperationalError:
+                # Busy, e.g. while a checkpoint restarts the WAL; the data
+                # version is unchanged, so the next check retries
+                self.skipped += 1
+                return self._versions
+            first_load = self.reloads == 0
+            previous, self._versions = self._versions, {table: version for table, version, _ in rows}
+            self._changed_at = {table: changed_at for table, _, changed_at in rows if changed_at is not None}
+            self._data_version = data_version
+            self.reloads += 1
+            versions = self._versions
+        finally:
+            self._lock.release()
+
+        if not first_load:
+            changed = {table for table in versions.keys() | previous.keys()
+                       if versions.get(table) != previous.get(table)}
+            if changed:
+                for tables, callback in self._listeners:
+                    if changed & tables:
+                        callback()
+        return versions
+
+    def get(self, tables):
+        """Version tuple for ``tables``, current as of this call"""
+        versions = self.check()
+        return tuple(versions.get(table, 0) for table in tables)
+
+    def changed_at(self, tables):
+        """Unix time of the newest write to any of ``tables`` as of the last check, or None"""
+        times = [self._changed_at[table] for table in tables if table in self._changed_at]
+        return max(times) if times else None
+
+    def invalidate(self):
+        """Re-read the registry on the next check even if nothing committed"""
+        with self._lock:
+            self._data_version = None
+
+    def on_change(self, tables, callback):
+        """Call ``callback()`` when another connection changes any of ``tables``"""
+        self._listeners.append((frozenset(tables), callback))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._data_version = None
+
+    def stats(self):
+        """Return a snapshot of probe activity"""
+        with self._lock:
+            return {
+                'probes': self.probes,
+                'reloads': self.reloads,
+                'skipped': self.skipped,
+                'tables': len(self._versions)
+            }
+
+table_versions = TableVersions()
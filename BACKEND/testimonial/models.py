@@ -1,49 +1,49 @@
 import sqlite3
-from db import get_connection
+from db import read_connection, write_connection, fetch_page, date_range, DEFAULT_PAGE_SIZE
 
 # It's often better to centralize DB configuration, but for now,
 # we'll define it here. Assumes the same DB file as services.
 DB = 'services.db'
 
+TESTIMONIALS_TITLE = "Trusted by 4000+ Clients since 2024"
+TESTIMONIALS_SUBTITLE = "We have a reputation for helping clients around the world find success on their most important projects"
+
 def init_db():
     """Initializes the testimonials table if it doesn't exist."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS testimonials (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            location TEXT,
-            text TEXT NOT NULL,
-            image TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-    print("Testimonials table initialized.") # Optional: Add feedback
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute('''
+            CREATE TABLE IF NOT EXISTS testimonials (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                location TEXT,
+                text TEXT NOT NULL,
+                image TEXT
+            )
+        ''')
+        conn.commit()
+        print("Testimonials table initialized.") # Optional: Add feedback
 
 def add_testimonial(name, location, text, image, status):
     """Adds a new testimonial to the database."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("INSERT INTO testimonials (name, location, text, image, status) VALUES (?, ?, ?, ?, ?)",
-              (name, location, text, image, status))
-    testimonial_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    return testimonial_id
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute("INSERT INTO testimonials (name, location, text, image, status) VALUES (?, ?, ?, ?, ?)",
+                  (name, location, text, image, status))
+        testimonial_id = c.lastrowid
+        conn.commit()
+        return testimonial_id
 
 def get_all_testimonials():
     """Retrieves all testimonials and formats them as requested."""
-    conn = get_connection()
-    conn.row_factory = sqlite3.Row
-    c = conn.cursor()
-    c.execute("SELECT id, name, location, text, image, status FROM testimonials WHERE status = 'active'")
-    testimonials_raw = c.fetchall()
-    conn.close()
+    with read_connection() as conn:
+        c = conn.cursor()
+        c.row_factory = sqlite3.Row
+        c.execute("SELECT id, name, location, text, image, status FROM testimonials WHERE status = 'active'")
+        testimonials_raw = c.fetchall()
 
     testimonials_list = [dict(row) for row in testimonials_raw]
-    
+
     # If no testimonials in database, return default data
     if not testimonials_list:
         testimonials_list = [
@@ -71,29 +71,39 @@ def get_all_testimonials():
         ]
 
     return {
-        "title": "Trusted by 4000+ Clients since 2024",
-        "subtitle": "We have a reputation for helping clients around the world find success on their most important projects",
+        "title": TESTIMONIALS_TITLE,
+        "subtitle": TESTIMONIALS_SUBTITLE,
         "testimonials": testimonials_list
     }
 
+def get_testimonials_page(limit=DEFAULT_PAGE_SIZE, after=None, since=None, until=None):
+    """Retrieves one page of active testimonials, oldest first, and the next page's cursor."""
+    where, params = date_range('created_at', since, until)
+    where.insert(0, "status = 'active'")
+    with read_connection() as conn:
+        rows, next_cursor = fetch_page(
+            conn.cursor(), 'testimonials', ('id', 'name', 'location', 'text', 'image', 'status'),
+            ('created_at', 'id'), where, params, limit=limit, after=after, descending=False
+        )
+    keys = ('id', 'name', 'location', 'text', 'image', 'status')
+    return [dict(zip(keys, row)) for row in rows], next_cursor
+
 def update_testimonial(testimonial_id, name, location, text, image, status):
     """Updates an existing testimonial."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("UPDATE testimonials SET name=?, location=?, text=?, image=?, status=? WHERE id=?",
-              (name, location, text, image, status, testimonial_id))
-    conn.commit()
-    conn.close()
-    # Consider returning status or checking rowcount
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE testimonials SET name=?, location=?, text=?, image=?, status=? WHERE id=?",
+                  (name, location, text, image, status, testimonial_id))
+        conn.commit()
+        # Consider returning status or checking rowcount
 
 def delete_testimonial(testimonial_id):
     """Deletes a testimonial from the database."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM testimonials WHERE id=?", (testimonial_id,))
-    conn.commit()
-    conn.close()
-    # Consider returning status or checking rowcount
+    with write_connection() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM testimonials WHERE id=?", (testimonial_id,))
+        conn.commit()
+        # Consider returning status or checking rowcount
 
 # Note: You'll need to call init_db() once somewhere in your application's
 # startup sequence to ensure the table exists before you try to use it.
@@ -1,13 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
 from pydantic import BaseModel
 from typing import Optional
+from datetime import date
 from .models import (
     add_testimonial,
     get_all_testimonials,
+    get_testimonials_page,
     update_testimonial,
-    delete_testimonial
+    delete_testimonial,
+    TESTIMONIALS_TITLE,
+    TESTIMONIALS_SUBTITLE
 )
 from auth.routes import require_auth
+from db import run_in_db, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE
+from cache import Snapshot, bump_version, snapshot_response
+from responses import FastJSONResponse
 
 router = APIRouter()
 
@@ -24,24 +31,45 @@ class TestimonialCreate(TestimonialBase):
 class TestimonialUpdate(TestimonialBase):
     pass
 
+testimonials_snapshot = Snapshot(('testimonials',), get_all_testimonials)
+
 @router.get("")
-async def list_testimonials():
-    return get_all_testimonials()
+async def list_testimonials(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None
+):
+    if limit is None and after is None and since is None and until is None:
+        return await snapshot_response(request, testimonials_snapshot)
+    testimonials, next_cursor = await run_in_db(
+        get_testimonials_page, limit or DEFAULT_PAGE_SIZE, after, since, until
+    )
+    return FastJSONResponse({
+        "title": TESTIMONIALS_TITLE,
+        "subtitle": TESTIMONIALS_SUBTITLE,
+        "testimonials": testimonials,
+        "next_cursor": next_cursor
+    })
 
 @router.post("")
 async def create_testimonial(testimonial: TestimonialCreate, current_user = Depends(require_auth)):
-    testimonial_id = add_testimonial(
+    testimonial_id = await run_in_db(
+        add_testimonial,
         testimonial.name,
         testimonial.location,
         testimonial.text,
         testimonial.image,
         testimonial.status
     )
+    bump_version('testimonials')
     return {'id': testimonial_id, 'message': 'Testimonial added'}
 
 @router.put("/{testimonial_id}")
 async def update_testimonial_route(testimonial_id: int, testimonial: TestimonialUpdate, current_user = Depends(require_auth)):
-    update_testimonial(
+    await run_in_db(
+        update_testimonial,
         testimonial_id,
         testimonial.name,
         testimonial.location,
@@ -49,9 +77,11 @@ async def update_testimonial_route(testimonial_id: int, testimonial: Testimonial
         testimonial.image,
         testimonial.status
     )
+    bump_version('testimonials')
     return {'message': 'Testimonial updated'}
 
 @router.delete("/{testimonial_id}")
 async def delete_testimonial_route(testimonial_id: int, current_user = Depends(require_auth)):
-    delete_testimonial(testimonial_id)
+    await run_in_db(delete_testimonial, testimonial_id)
+    bump_version('testimonials')
     return {'message': 'Testimonial deleted'}
\ No newline at end of file
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# db and main read their configuration at import time, so point them at a
+# scratch database before any test imports them
+_scratch = Path(tempfile.mkdtemp())
+os.environ.setdefault('DB_PATH', str(_scratch / 'test.db'))
+os.environ.setdefault('BACKUP_DIR', str(_scratch / 'backup'))
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,35 @@
+import base64
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from db import InvalidCursor, decode_cursor, encode_cursor
+
+def crafted(values):
+    """A cursor holding ``values``, as a client could forge one"""
+    raw = json.dumps(values).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def test_round_trip():
+    assert decode_cursor(encode_cursor(['2024-01-31', 7]), 2) == ['2024-01-31', 7]
+    assert decode_cursor(encode_cursor([None, 1.5]), 2) == [None, 1.5]
+
+@pytest.mark.parametrize('cursor', [
+    'not base64!',
+    crafted({'id': 1}),
+    crafted([1]),
+    crafted([{}, 1]),
+    crafted([[1], 1]),
+    crafted(['2024-01-31', 2**63]),
+])
+def test_rejects_crafted_cursors(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, 2)
+
+def test_crafted_cursor_is_a_bad_request():
+    from main import app
+
+    response = TestClient(app).get('/announcements', params={'after': crafted([{}, 1])})
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid pagination cursor'}
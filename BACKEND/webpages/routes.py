@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
 from typing import Optional, List
 from pydantic import BaseModel
 from auth.models import (
@@ -22,6 +22,7 @@ from how.models import (
 from announcements.models import (
     get_all_announcements,
 )
+from cache import SECTIONS, Snapshot, snapshot_response
 
 
 from functools import wraps
@@ -50,65 +51,80 @@ class UsersUpdateRequest(BaseModel):
     users: List[UserUpdate]
 
 
+def build_web_data():
+    """
+    Build the full landing-page document from every content section.
+    """
+    users = get_all_users()
+    company = get_company_details()
+    hero = get_hero()
+    testimonials = get_all_testimonials()
+    services = get_all_services()
+    how = get_how()
+    announcements = get_all_announcements()
+
+    if users is None:
+        raise HTTPException(status_code=500, detail="Failed to fetch users")
+        
+    # Calculate statistics
+    stats = {
+        "testimonialCount": len(testimonials["testimonials"]) if testimonials and "testimonials" in testimonials else 0,
+        "serviceCount": len(services["packages"]) if services and "packages" in services else 0,
+        "userCount": len(users) if users else 0
+    }
+        
+    data = {
+        'headerData': 'success',
+        'footerData': company,
+        'headerData': {
+            "navigationLinks": company["usefulLinks"]["items"]
+        },
+        'heroData': hero,
+        'testimonialsData': testimonials,
+        'servicesData': services,
+        'howData': how,
+        'announcementsData': announcements,
+        'stats': stats
+    }
+    return data
+
+# The landing page depends on every section, so any content write rebuilds it
+web_data_snapshot = Snapshot(SECTIONS, build_web_data)
+
 @router.get("")
-async def web_data():
+async def web_data(request: Request):
     """
     Retrieve all webpages data.
     """
     try:
-        users = get_all_users()
-        company = get_company_details()
-        hero = get_hero()
-        testimonials = get_all_testimonials()
-        services = get_all_services()
-        how = get_how()
-        announcements = get_all_announcements()
-
-        if users is None:
-            raise HTTPException(status_code=500, detail="Failed to fetch users")
-            
-        # Calculate statistics
-        stats = {
-            "testimonialCount": len(testimonials["testimonials"]) if testimonials and "testimonials" in testimonials else 0,
-            "serviceCount": len(services["packages"]) if services and "packages" in services else 0,
-            "userCount": len(users) if users else 0
-        }
-            
-        data = {
-            'headerData': 'success',
-            'footerData': company,
-            'headerData': {
-                "navigationLinks": company["usefulLinks"]["items"]
-            },
-            'heroData': hero,
-            'testimonialsData': testimonials,
-            'servicesData': services,
-            'howData': how,
-            'announcementsData': announcements,
-            'stats': stats
-        }
-        return data
+        return await snapshot_response(request, web_data_snapshot)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def build_stats():
+    """
+    Count the published content behind the website.
+    """
+    users = get_all_users()
+    testimonials = get_all_testimonials()
+    services = get_all_services()
+    
+    return {
+        "testimonialCount": len(testimonials["testimonials"]) if testimonials and "testimonials" in testimonials else 0,
+        "serviceCount": len(services["packages"]) if services and "packages" in services else 0,
+        "userCount": len(users) if users else 0
+    }
+
+stats_snapshot = Snapshot(('users', 'testimonials', 'services'), build_stats)
+
 @router.get("/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """
     Get statistics about the website content.
     """
     try:
-        users = get_all_users()
-        testimonials = get_all_testimonials()
-        services = get_all_services()
-        
-        stats = {
-            "testimonialCount": len(testimonials["testimonials"]) if testimonials and "testimonials" in testimonials else 0,
-            "serviceCount": len(services["packages"]) if services and "packages" in services else 0,
-            "userCount": len(users) if users else 0
-        }
-        
-        return stats
+        return await snapshot_response(request, stats_snapshot)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))